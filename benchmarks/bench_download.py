@@ -0,0 +1,126 @@
+# -*- coding: utf-8 -*-
+"""
+下载写入基准 - Y2订单处理辅助工具
+从本机 HTTP 服务器（独立进程）下载同一个文件，对比每 MB 消耗的 CPU 时间：
+1. 原实现：iter_content(chunk_size=8192) 逐块写入，下载后重新读取文件计算哈希
+2. download_writer：预分配、自适应块大小、复用缓冲区，写入时同时计算哈希
+
+用法:
+    python benchmarks/bench_download.py [--size-mb 256] [--runs 3]
+"""
+
+import os
+import sys
+import time
+import shutil
+import socket
+import argparse
+import tempfile
+import subprocess
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import requests
+
+import hash_utils
+import download_writer
+
+
+def legacy_download(url, path):
+    """原实现：8 KB 循环写入，下载后再读取文件校验哈希"""
+    response = requests.get(url, stream=True, timeout=30)
+    response.raise_for_status()
+    with open(path, 'wb') as f:
+        for chunk in response.iter_content(chunk_size=8192):
+            if chunk:
+                f.write(chunk)
+    return hash_utils.file_digest(path)
+
+
+def writer_download(url, path):
+    """download_writer：写入时同时计算哈希"""
+    with requests.get(url, stream=True, timeout=30) as response:
+        response.raise_for_status()
+        size = int(response.headers.get('content-length', 0))
+        _, digest = download_writer.write_response(response, path, size, algorithm='sha256')
+    return digest
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def start_server(directory):
+    """在独立进程中启动 HTTP 服务器，使其 CPU 时间不计入本进程"""
+    port = free_port()
+    process = subprocess.Popen(
+        [sys.executable, '-m', 'http.server', str(port), '--bind', '127.0.0.1', '--directory', directory],
+        stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+    for _ in range(100):
+        try:
+            with socket.create_connection(('127.0.0.1', port), timeout=0.1):
+                return process, port
+        except OSError:
+            time.sleep(0.05)
+    process.kill()
+    raise RuntimeError("HTTP 服务器启动失败")
+
+
+def measure(func, url, path):
+    """返回 (墙钟时间, CPU 时间, 哈希)"""
+    wall = time.perf_counter()
+    cpu = time.process_time()
+    digest = func(url, path)
+    return time.perf_counter() - wall, time.process_time() - cpu, digest
+
+
+def main():
+    parser = argparse.ArgumentParser(description="下载写入基准")
+    parser.add_argument('--size-mb', type=int, default=256, help="下载文件大小（MB）")
+    parser.add_argument('--runs', type=int, default=3, help="重复次数（取 CPU 时间最小值）")
+    args = parser.parse_args()
+
+    root = tempfile.mkdtemp(prefix='Y2_download_bench_')
+    process = None
+    try:
+        serve_dir = os.path.join(root, 'serve')
+        os.makedirs(serve_dir)
+        source_path = os.path.join(serve_dir, 'package.zip')
+        block = os.urandom(1024 * 1024)
+        with open(source_path, 'wb') as f:
+            for _ in range(args.size_mb):
+                f.write(block)
+        expected = hash_utils.file_digest(source_path)
+
+        process, port = start_server(serve_dir)
+        url = f"http://127.0.0.1:{port}/package.zip"
+        output_path = os.path.join(root, 'download.zip')
+        print(f"文件大小: {args.size_mb} MB，重复 {args.runs} 次取 CPU 时间最小值")
+
+        results = {}
+        for label, func in (("8 KB iter_content + 重新哈希（原实现）", legacy_download),
+                            ("download_writer", writer_download)):
+            samples = []
+            for _ in range(args.runs):
+                wall, cpu, digest = measure(func, url, output_path)
+                assert digest == expected, "下载内容与源文件不一致"
+                samples.append((cpu, wall))
+            cpu, wall = min(samples)
+            results[label] = cpu
+            print(f"  {label:<36} CPU {cpu / args.size_mb * 1000:7.2f} ms/MB  "
+                  f"墙钟 {wall:6.2f} 秒  {args.size_mb / wall:8.1f} MB/s")
+
+        legacy_cpu, writer_cpu = results.values()
+        print(f"\nCPU 时间减少: {(1 - writer_cpu / legacy_cpu) * 100:.1f}%")
+    finally:
+        if process is not None:
+            process.kill()
+            process.wait()
+        shutil.rmtree(root, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
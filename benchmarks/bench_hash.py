@@ -0,0 +1,104 @@
+# -*- coding: utf-8 -*-
+"""
+文件哈希吞吐量基准 - Y2订单处理辅助工具
+对比原来的 8 KB 循环与 hash_utils 的单文件、并行和缓存模式。
+
+用法:
+    python benchmarks/bench_hash.py [--files 2000] [--file-kb 256] [--large-mb 128]
+"""
+
+import os
+import sys
+import time
+import shutil
+import hashlib
+import argparse
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import hash_utils
+
+
+def legacy_hash(file_path):
+    """原实现：8 KB 循环读取"""
+    sha256 = hashlib.sha256()
+    with open(file_path, 'rb') as f:
+        for chunk in iter(lambda: f.read(8192), b''):
+            sha256.update(chunk)
+    return sha256.hexdigest()
+
+
+def make_dataset(root, files, file_kb, large_mb):
+    """生成测试文件：大量小文件（类似安装目录）+ 一个大文件（类似发布包）"""
+    paths = []
+    block = os.urandom(64 * 1024)
+    for i in range(files):
+        path = os.path.join(root, f"f{i:05d}.bin")
+        with open(path, 'wb') as f:
+            for _ in range(max(1, file_kb // 64)):
+                f.write(block)
+            f.write(i.to_bytes(4, 'little'))
+        paths.append(path)
+
+    large_path = os.path.join(root, 'large.zip')
+    with open(large_path, 'wb') as f:
+        for _ in range(large_mb * 16):
+            f.write(block)
+    return paths, large_path
+
+
+def run(label, func, total_bytes):
+    """执行并打印吞吐量"""
+    start = time.perf_counter()
+    result = func()
+    elapsed = time.perf_counter() - start
+    throughput = total_bytes / 1024 / 1024 / elapsed if elapsed > 0 else float('inf')
+    print(f"  {label:<36} {elapsed:8.3f} 秒  {throughput:9.1f} MB/s")
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="文件哈希吞吐量基准")
+    parser.add_argument('--files', type=int, default=2000, help="小文件数量")
+    parser.add_argument('--file-kb', type=int, default=256, help="小文件大小（KB）")
+    parser.add_argument('--large-mb', type=int, default=128, help="大文件大小（MB）")
+    parser.add_argument('--workers', type=int, default=None, help="并行线程数")
+    args = parser.parse_args()
+
+    root = tempfile.mkdtemp(prefix='Y2_hash_bench_')
+    try:
+        paths, large_path = make_dataset(root, args.files, args.file_kb, args.large_mb)
+        small_bytes = sum(os.path.getsize(p) for p in paths)
+        large_bytes = os.path.getsize(large_path)
+
+        print(f"CPU 核心数: {os.cpu_count()}")
+        print(f"\n大文件 ({large_bytes / 1024 / 1024:.0f} MB):")
+        expected = run("8 KB 循环（原实现）", lambda: legacy_hash(large_path), large_bytes)
+        actual = run("hash_utils.file_digest", lambda: hash_utils.file_digest(large_path), large_bytes)
+        assert expected == actual
+
+        print(f"\n{len(paths)} 个小文件 ({small_bytes / 1024 / 1024:.0f} MB):")
+        expected = run("8 KB 循环（原实现，逐个）",
+                       lambda: {p: legacy_hash(p) for p in paths}, small_bytes)
+        actual = run("file_digest（逐个）",
+                     lambda: {p: hash_utils.file_digest(p) for p in paths}, small_bytes)
+        assert expected == actual
+        actual = run("hash_files（线程池）",
+                     lambda: hash_utils.hash_files(paths, max_workers=args.workers), small_bytes)
+        assert expected == actual
+
+        cache = hash_utils.HashCache(os.path.join(root, 'hash_cache.json'))
+        run("hash_files + 缓存（首次）",
+            lambda: hash_utils.hash_files(paths, max_workers=args.workers, cache=cache), small_bytes)
+        cache.save()
+        cache = hash_utils.HashCache(os.path.join(root, 'hash_cache.json'))
+        actual = run("hash_files + 缓存（文件未变化）",
+                     lambda: hash_utils.hash_files(paths, max_workers=args.workers, cache=cache), small_bytes)
+        assert expected == actual
+    finally:
+        shutil.rmtree(root, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
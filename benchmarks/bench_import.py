@@ -0,0 +1,127 @@
+# -*- coding: utf-8 -*-
+"""
+启动路径导入开销基准 - Y2订单处理辅助工具
+使用 `python -X importtime` 测量导入 update_module 的累计耗时，并检查
+启动路径上没有加载重量级模块（tkinter、requests、zipfile 等）。
+
+用法:
+    python benchmarks/bench_import.py [--module update_module] [--runs 5] [--budget-ms 100]
+
+超出预算或加载了禁止的模块时以退出码 1 结束，可直接用于 CI 守护。
+"""
+
+import os
+import sys
+import argparse
+import subprocess
+
+# 启动路径上不允许出现的模块（应在首次使用时再导入）
+FORBIDDEN_MODULES = [
+    'tkinter',
+    'requests',
+    'zipfile',
+    'subprocess',
+    'tempfile',
+    'hashlib',
+    'sqlite3',
+    'update_dialog',
+]
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def parse_importtime(stderr):
+    """
+    解析 -X importtime 输出
+    返回: [(module, self_us, cumulative_us, depth)]
+    """
+    records = []
+    for line in stderr.splitlines():
+        if not line.startswith('import time:'):
+            continue
+        parts = line[len('import time:'):].split('|')
+        if len(parts) != 3:
+            continue
+        try:
+            self_us = int(parts[0].strip())
+            cumulative_us = int(parts[1].strip())
+        except ValueError:
+            # 表头行
+            continue
+        name = parts[2].rstrip()
+        depth = (len(name) - len(name.lstrip())) // 2
+        records.append((name.strip(), self_us, cumulative_us, depth))
+    return records
+
+
+def measure_once(module):
+    """在干净的子进程中导入一次模块"""
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', f'import {module}'],
+        cwd=REPO_DIR,
+        capture_output=True,
+        text=True,
+        encoding='utf-8',
+        errors='replace'
+    )
+    if result.returncode != 0:
+        raise RuntimeError(f"导入 {module} 失败:\n{result.stderr}")
+
+    records = parse_importtime(result.stderr)
+    # 输出按导入完成顺序排列，目标模块之前、上一个顶层记录之后的都是它的子导入；
+    # site 等解释器启动时加载的模块不计入
+    for index in range(len(records) - 1, -1, -1):
+        if records[index][0] == module and records[index][3] == 0:
+            start = index
+            while start > 0 and records[start - 1][3] > 0:
+                start -= 1
+            return records[index][2], records[start:index + 1]
+    return 0, []
+
+
+def main():
+    parser = argparse.ArgumentParser(description="测量启动路径的导入开销")
+    parser.add_argument('--module', default='update_module', help="要测量的模块")
+    parser.add_argument('--runs', type=int, default=5, help="重复次数（取最小值）")
+    parser.add_argument('--budget-ms', type=float, default=100.0, help="累计导入耗时预算（毫秒，与 CI 一致）")
+    parser.add_argument('--top', type=int, default=10, help="显示耗时最多的模块数量")
+    args = parser.parse_args()
+
+    samples = []
+    records = []
+    for _ in range(args.runs):
+        cumulative_us, run_records = measure_once(args.module)
+        samples.append(cumulative_us)
+        if cumulative_us == min(samples):
+            records = run_records
+
+    best_ms = min(samples) / 1000
+    median_ms = sorted(samples)[len(samples) // 2] / 1000
+
+    print(f"模块: {args.module}")
+    print(f"累计导入耗时: 最小 {best_ms:.2f} ms, 中位数 {median_ms:.2f} ms ({args.runs} 次)")
+    print(f"预算: {args.budget_ms:.2f} ms")
+
+    print(f"\n自身耗时最多的 {args.top} 个模块:")
+    for name, self_us, cumulative_us, _ in sorted(records, key=lambda r: r[1], reverse=True)[:args.top]:
+        print(f"  {name:<40} 自身 {self_us / 1000:7.2f} ms  累计 {cumulative_us / 1000:7.2f} ms")
+
+    failed = False
+
+    loaded = {r[0] for r in records}
+    forbidden = [m for m in FORBIDDEN_MODULES if m in loaded]
+    if forbidden:
+        print(f"\n失败: 启动路径加载了重量级模块: {', '.join(forbidden)}")
+        failed = True
+
+    if best_ms > args.budget_ms:
+        print(f"\n失败: 导入耗时 {best_ms:.2f} ms 超出预算 {args.budget_ms:.2f} ms")
+        failed = True
+
+    if not failed:
+        print("\n通过")
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,126 @@
+# -*- coding: utf-8 -*-
+"""
+更新助手文件替换基准 - Y2订单处理辅助工具
+对比 updater.replace_files 在不同日志方式下的耗时：
+1. 原实现：每条日志打开、追加、关闭一次日志文件，逐个记录替换的文件
+2. 缓冲日志：后台线程批量写入，同样逐个记录替换的文件（与 1 只差日志写入方式）
+3. 缓冲日志 + 汇总：默认方式，只记录汇总（单独列出，不参与 1、2 的对比）
+
+各方式在每轮中轮流先后运行，避免磁盘缓存等顺序因素偏向某一方；报告最小值和中位数。
+
+用法:
+    python benchmarks/bench_replace_files.py [--files 3000] [--file-kb 4] [--runs 3]
+"""
+
+import os
+import sys
+import time
+import shutil
+import argparse
+import tempfile
+import statistics
+import contextlib
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import updater
+
+
+def make_package_tree(root, files, file_kb):
+    """生成解压后的更新包目录（多层子目录，类似 PyInstaller 的 _internal）"""
+    data = os.urandom(file_kb * 1024)
+    for i in range(files):
+        directory = os.path.join(root, '_internal', f"pkg{i % 50:02d}", f"sub{i % 7}")
+        os.makedirs(directory, exist_ok=True)
+        with open(os.path.join(directory, f"module{i:05d}.pyd"), 'wb') as f:
+            f.write(data)
+
+
+def legacy_log_factory(log_path):
+    """原实现的日志函数：每条日志单独打开文件"""
+    def log(message):
+        with open(log_path, 'a', encoding='utf-8') as f:
+            f.write(f"[{time.strftime('%Y-%m-%d %H:%M:%S')}] {message}\n")
+        print(message)
+    return log
+
+
+# (名称, 使用原实现的日志函数, 逐个记录文件)
+VARIANTS = (
+    ("逐条打开日志文件（原实现）", True, True),
+    ("缓冲日志", False, True),
+    ("缓冲日志 + 汇总（默认）", False, False),
+)
+
+
+def run_once(source_dir, work_dir, legacy, log_each_file):
+    """把 source_dir 替换到一个已有旧文件的目标目录，返回 replace_files 耗时"""
+    target_dir = os.path.join(work_dir, 'target')
+    shutil.rmtree(target_dir, ignore_errors=True)
+    shutil.copytree(source_dir, target_dir)
+    log_path = os.path.join(work_dir, 'Y2_updater.log')
+    if os.path.exists(log_path):
+        os.remove(log_path)
+
+    original_log = updater.log
+    original_writer = updater._log_writer
+    writer = updater.BufferedLogWriter(log_path)
+    if legacy:
+        updater.log = legacy_log_factory(log_path)
+    else:
+        updater._log_writer = writer
+    if log_each_file:
+        os.environ[updater.LOG_FILES_ENV] = '1'
+    else:
+        os.environ.pop(updater.LOG_FILES_ENV, None)
+
+    try:
+        with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+            start = time.perf_counter()
+            assert updater.replace_files(source_dir, target_dir, set())
+            # 缓冲日志的最后一次写入也计入耗时
+            writer.close()
+            elapsed = time.perf_counter() - start
+    finally:
+        updater.log = original_log
+        updater._log_writer = original_writer
+        os.environ.pop(updater.LOG_FILES_ENV, None)
+    return elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="更新助手文件替换基准")
+    parser.add_argument('--files', type=int, default=3000, help="更新包中的文件数量")
+    parser.add_argument('--file-kb', type=int, default=4, help="每个文件的大小（KB）")
+    parser.add_argument('--runs', type=int, default=5, help="每种方式的重复次数")
+    args = parser.parse_args()
+
+    work_dir = tempfile.mkdtemp(prefix='Y2_replace_bench_')
+    try:
+        source_dir = os.path.join(work_dir, 'source')
+        make_package_tree(source_dir, args.files, args.file_kb)
+        print(f"文件数: {args.files}，每个 {args.file_kb} KB，每种方式 {args.runs} 次（轮流先后运行）")
+
+        times = [[] for _ in VARIANTS]
+        for run in range(args.runs):
+            # 每轮换一个方式先运行
+            for i in range(len(VARIANTS)):
+                index = (run + i) % len(VARIANTS)
+                _, legacy, log_each_file = VARIANTS[index]
+                times[index].append(run_once(source_dir, work_dir, legacy, log_each_file))
+
+        for (label, _, _), samples in zip(VARIANTS, times):
+            best, median = min(samples), statistics.median(samples)
+            print(f"  {label:<22} 最小 {best:7.3f} 秒  中位数 {median:7.3f} 秒  {args.files / median:9.0f} 文件/秒")
+
+        legacy_median, buffered_median, summary_median = (statistics.median(t) for t in times)
+        spread = max(max(t) / min(t) for t in times[:2])
+        print(f"\n缓冲日志写入（同样逐个记录文件）相对原实现: {legacy_median / buffered_median:.2f}x（中位数）")
+        print(f"  同一方式多次运行的最大/最小耗时比最高 {spread:.2f}，差异小于此值时视为噪声")
+        print(f"只记录汇总相对逐个记录（均为缓冲日志）: {buffered_median / summary_median:.2f}x（中位数）")
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
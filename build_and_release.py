@@ -3,10 +3,19 @@
 构建和发布脚本 - Y2订单处理辅助工具
 功能：
 1. 构建 PyInstaller 打包
-2. 创建版本压缩包
+2. 创建版本压缩包（核心组件）和可选组件包
 3. 计算文件哈希
 4. 生成 version.json
 5. 输出发布文件到 release 目录
+
+用法:
+    python build_and_release.py                完整构建
+    python build_and_release.py --incremental  增量构建（输入未变化时复用上次的构建输出）
+    python build_and_release.py --clean        清理构建目录和构建缓存
+    python build_and_release.py --delta-from 1.9.0=old/Y2订单处理辅助工具1.9.0.zip
+                                               额外生成来自旧版本的增量包（可重复指定）
+    python build_and_release.py --previous-index docs/version.json
+                                               在已有发布索引的基础上追加本版本
 """
 
 import os
@@ -14,11 +23,17 @@ import sys
 import json
 import hashlib
 import shutil
+import fnmatch
+import argparse
+import platform
 import subprocess
-import zipfile
-from pathlib import Path
 from datetime import datetime
 
+import hash_utils
+import install_verify
+import release_index
+import release_packer
+
 # 配置
 APP_NAME = "Y2订单处理辅助工具"
 VERSION = "1.9.0"
@@ -26,6 +41,61 @@ SPEC_FILE = "Y2订单处理辅助工具1.9.spec"
 DIST_DIR = "dist"
 BUILD_DIR = "build"
 RELEASE_DIR = "release"
+MIN_VERSION = "1.8.0"
+# 发布文件下载地址，{version} 为版本号，{file} 为文件名
+DOWNLOAD_URL_TEMPLATE = "https://github.com/yourname/Y2Tool/releases/download/v{version}/{file}"
+# 发布索引中保留的历史版本数量
+RELEASE_HISTORY = 5
+
+# 打包配置
+COMPRESS_LEVEL = 9          # DEFLATE 压缩级别
+ALLOW_LZMA = True           # 允许对压缩率高的大文件使用 LZMA
+COMPRESS_WORKERS = None     # 并行压缩进程数，None 表示使用全部 CPU 核心
+
+# 可选组件：不放入完整包，客户端首次使用时才下载安装（见 update_components.py）
+# 组件名 -> 构建输出目录中的相对路径模式（按 PyInstaller 实际输出调整），其余文件属于核心组件
+OPTIONAL_COMPONENTS = {
+    "excel": [
+        "_internal/pandas/*",
+        "_internal/openpyxl/*",
+        "_internal/numpy/*",
+        "_internal/numpy.libs/*",
+    ],
+    "templates": [
+        "templates/*",
+    ],
+}
+
+# 增量构建缓存
+CACHE_DIR = ".build_cache"
+BUILD_FINGERPRINT_FILE = os.path.join(CACHE_DIR, "build_fingerprint.json")
+PACKAGE_CACHE_DIR = os.path.join(CACHE_DIR, "package_members")
+DIST_HASH_CACHE = os.path.join(CACHE_DIR, "dist_hashes.json")
+# 参与构建指纹的输入文件（按项目实际使用的数据文件调整）：
+# "**/<文件名模式>" 匹配任意目录下的文件，其他模式匹配相对项目根目录的路径
+BUILD_INPUT_PATTERNS = [
+    SPEC_FILE,
+    "**/*.py",
+    "**/*.json",
+    "**/*.ico",
+    "**/*.png",
+    "**/*.jpg",
+    "**/*.gif",
+    "**/*.xlsx",
+]
+# 不影响 PyInstaller 输出的文件和目录（glob 模式，匹配文件名、目录名或相对项目根目录的路径；
+# 目录匹配时跳过其下全部文件）。可用 --exclude-input 追加；
+# 含 pyvenv.cfg 的目录（任意名称的虚拟环境）总是跳过
+BUILD_INPUT_EXCLUDES = [
+    # 发布信息和构建脚本
+    "version.json", "build_and_release.py", "release_packer.py",
+    # 构建输出和缓存
+    BUILD_DIR, DIST_DIR, RELEASE_DIR, CACHE_DIR, "__pycache__",
+    # 不参与打包的目录
+    ".git", ".github", "docs", "benchmarks", "tests",
+    # 虚拟环境和前端依赖
+    ".venv", "venv", "env", "node_modules",
+]
 
 
 def log(message):
@@ -33,11 +103,13 @@ def log(message):
     print(f"[{datetime.now().strftime('%H:%M:%S')}] {message}")
 
 
-def clean_build():
+def clean_build(include_cache=False):
     """清理构建目录"""
     log("清理构建目录...")
     
     dirs_to_clean = [BUILD_DIR, DIST_DIR, RELEASE_DIR]
+    if include_cache:
+        dirs_to_clean.append(CACHE_DIR)
     for dir_name in dirs_to_clean:
         if os.path.exists(dir_name):
             shutil.rmtree(dir_name)
@@ -46,17 +118,23 @@ def clean_build():
     log("清理完成")
 
 
-def build_app():
-    """使用 PyInstaller 构建应用"""
+def build_app(clean=True):
+    """
+    使用 PyInstaller 构建应用
+    clean: 是否清理 PyInstaller 缓存（增量构建时保留，以复用分析结果）
+    """
     log("开始构建应用...")
     
     if not os.path.exists(SPEC_FILE):
         log(f"错误: 找不到 spec 文件 {SPEC_FILE}")
         return False
     
+    command = [sys.executable, "-m", "PyInstaller", SPEC_FILE]
+    command.append("--clean" if clean else "--noconfirm")
+    
     try:
         result = subprocess.run(
-            [sys.executable, "-m", "PyInstaller", SPEC_FILE, "--clean"],
+            command,
             capture_output=True,
             text=True,
             check=True
@@ -71,21 +149,11 @@ def build_app():
 
 def calculate_hash(file_path):
     """计算文件 SHA256 哈希"""
-    sha256 = hashlib.sha256()
-    with open(file_path, 'rb') as f:
-        for chunk in iter(lambda: f.read(8192), b''):
-            sha256.update(chunk)
-    return f"sha256:{sha256.hexdigest()}"
+    return hash_utils.format_hash(hash_utils.file_digest(file_path))
 
 
-def create_release_package():
-    """创建发布压缩包"""
-    log("创建发布压缩包...")
-    
-    # 确保发布目录存在
-    os.makedirs(RELEASE_DIR, exist_ok=True)
-    
-    # 源目录（PyInstaller 输出）
+def find_build_output():
+    """查找 PyInstaller 输出目录，找不到时返回 None"""
     source_dir = os.path.join(DIST_DIR, f"{APP_NAME}{VERSION}")
     if not os.path.exists(source_dir):
         # 尝试其他可能的目录名
@@ -100,30 +168,325 @@ def create_release_package():
                 source_dir = test_dir
                 break
     
-    if not os.path.exists(source_dir):
-        log(f"错误: 找不到构建输出目录")
+    return source_dir if os.path.exists(source_dir) else None
+
+
+def is_excluded_input(rel_path, excludes=None):
+    """相对路径（/ 分隔）的文件名、目录名或路径前缀匹配排除模式时返回 True"""
+    excludes = BUILD_INPUT_EXCLUDES if excludes is None else excludes
+    parts = rel_path.split('/')
+    for i, name in enumerate(parts):
+        prefix = '/'.join(parts[:i + 1])
+        if any(fnmatch.fnmatch(name, pattern) or fnmatch.fnmatch(prefix, pattern) for pattern in excludes):
+            return True
+    return False
+
+
+def _matches_input_pattern(rel_path, pattern):
+    """相对路径是否匹配 BUILD_INPUT_PATTERNS 中的一个模式"""
+    if pattern.startswith('**/'):
+        return fnmatch.fnmatch(rel_path.rsplit('/', 1)[-1], pattern[3:])
+    return fnmatch.fnmatch(rel_path, pattern)
+
+
+def collect_build_inputs(root='.', excludes=None):
+    """
+    收集参与构建指纹的输入文件，返回排序后的相对路径列表
+    遍历时不进入被排除的目录，项目内的虚拟环境不会被逐个扫描
+    """
+    excludes = BUILD_INPUT_EXCLUDES if excludes is None else excludes
+    inputs = []
+    for current, dirs, names in os.walk(root):
+        rel_dir = os.path.relpath(current, root).replace(os.sep, '/')
+        prefix = '' if rel_dir == '.' else rel_dir + '/'
+        dirs[:] = sorted(
+            name for name in dirs
+            if not is_excluded_input(prefix + name, excludes)
+            and not os.path.exists(os.path.join(current, name, 'pyvenv.cfg'))
+        )
+        for name in names:
+            rel_path = prefix + name
+            if is_excluded_input(rel_path, excludes):
+                continue
+            if any(_matches_input_pattern(rel_path, pattern) for pattern in BUILD_INPUT_PATTERNS):
+                inputs.append(rel_path)
+    return sorted(inputs)
+
+
+def compute_build_fingerprint():
+    """
+    计算构建指纹：spec 文件、源码和数据文件的哈希，
+    以及解释器和依赖包版本。任何一项变化都会得到不同的缓存键。
+    """
+    from importlib import metadata
+    
+    inputs = {
+        path: hash_utils.format_hash(digest)
+        for path, digest in hash_utils.hash_files(collect_build_inputs()).items()
+    }
+    environment = {
+        "python": sys.version,
+        "implementation": platform.python_implementation(),
+        "system": platform.system(),
+        "machine": platform.machine(),
+    }
+    dependencies = sorted({
+        f"{dist.metadata['Name']}=={dist.version}"
+        for dist in metadata.distributions()
+        if dist.metadata['Name']
+    })
+    
+    payload = json.dumps(
+        {"inputs": inputs, "environment": environment, "dependencies": dependencies},
+        sort_keys=True,
+        ensure_ascii=False
+    )
+    return {
+        "key": hashlib.sha256(payload.encode('utf-8')).hexdigest(),
+        "inputs": inputs,
+        "environment": environment,
+        "dependencies": dependencies,
+    }
+
+
+def load_build_fingerprint():
+    """读取上次成功构建的指纹"""
+    try:
+        with open(BUILD_FINGERPRINT_FILE, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
         return None
+
+
+def save_build_fingerprint(fingerprint):
+    """保存本次成功构建的指纹"""
+    os.makedirs(CACHE_DIR, exist_ok=True)
+    with open(BUILD_FINGERPRINT_FILE, 'w', encoding='utf-8') as f:
+        json.dump(fingerprint, f, ensure_ascii=False, indent=2)
+
+
+def describe_fingerprint_changes(previous, current):
+    """列出两次构建指纹之间的差异，用于构建日志"""
+    if not previous:
+        return ["没有上次构建的缓存记录"]
+    
+    changes = []
+    old_inputs = previous.get("inputs", {})
+    new_inputs = current["inputs"]
+    for path in sorted(set(old_inputs) | set(new_inputs)):
+        if path not in old_inputs:
+            changes.append(f"新增输入: {path}")
+        elif path not in new_inputs:
+            changes.append(f"删除输入: {path}")
+        elif old_inputs[path] != new_inputs[path]:
+            changes.append(f"修改输入: {path}")
+    if previous.get("environment") != current["environment"]:
+        changes.append("解释器或平台已变化")
+    if previous.get("dependencies") != current["dependencies"]:
+        old_deps = set(previous.get("dependencies", []))
+        new_deps = set(current["dependencies"])
+        for dep in sorted(new_deps - old_deps):
+            changes.append(f"依赖变化: {dep}")
+    return changes or ["缓存键不一致"]
+
+
+def incremental_build():
+    """
+    增量构建：构建指纹与上次一致且构建输出仍在时跳过 PyInstaller
+    返回: True 构建输出可用
+    """
+    log("计算构建指纹...")
+    fingerprint = compute_build_fingerprint()
+    previous = load_build_fingerprint()
+    
+    if previous and previous.get("key") == fingerprint["key"] and find_build_output():
+        log(f"构建缓存命中 ({fingerprint['key'][:12]})，跳过 PyInstaller")
+        return True
+    
+    log(f"构建缓存未命中 ({fingerprint['key'][:12]})")
+    changes = describe_fingerprint_changes(previous, fingerprint)
+    for change in changes[:20]:
+        log(f"  {change}")
+    if len(changes) > 20:
+        log(f"  ... 共 {len(changes)} 项变化")
+    
+    if not build_app(clean=False):
+        return False
+    
+    save_build_fingerprint(fingerprint)
+    return True
+
+
+def split_components(source_dir):
+    """
+    按 OPTIONAL_COMPONENTS 划分构建输出
+    返回: (core_files, {组件名: files})，files 为 [(file_path, arcname)]
+    """
+    core_files = []
+    components = {}
+    for file_path, arcname in release_packer.collect_files(source_dir):
+        for name, patterns in OPTIONAL_COMPONENTS.items():
+            if any(fnmatch.fnmatchcase(arcname, pattern) for pattern in patterns):
+                components.setdefault(name, []).append((file_path, arcname))
+                break
+        else:
+            core_files.append((file_path, arcname))
+    return core_files, components
+
+
+def _package_cache_dir(use_cache, name):
+    """每个压缩包使用单独的压缩结果缓存目录（打包后会清理本包未用到的缓存）"""
+    return os.path.join(PACKAGE_CACHE_DIR, name) if use_cache else None
+
+
+def create_component_packages(source_dir, components, use_cache=False):
+    """
+    为每个可选组件创建单独的压缩包
+    返回: {组件名: 制品信息}（用于发布索引）
+    """
+    artifacts = {}
+    for name, files in sorted(components.items()):
+        component_name = f"{APP_NAME}{VERSION}_{name}.zip"
+        component_path = os.path.join(RELEASE_DIR, component_name)
+        stats = release_packer.build_package(
+            source_dir,
+            component_path,
+            level=COMPRESS_LEVEL,
+            allow_lzma=ALLOW_LZMA,
+            max_workers=COMPRESS_WORKERS,
+            cache_dir=_package_cache_dir(use_cache, name),
+            files=files
+        )
+        log(f"组件包已创建: {component_path}")
+        log(f"  文件数: {stats['files']}，原始大小 {stats['input_size'] / 1024 / 1024:.2f} MB，"
+            f"大小 {stats['archive_size'] / 1024 / 1024:.2f} MB")
+        
+        artifacts[name] = {
+            "url": DOWNLOAD_URL_TEMPLATE.format(version=VERSION, file=component_name),
+            "size": stats['archive_size'],
+            "hash": calculate_hash(component_path),
+        }
+    return artifacts
+
+
+def create_release_package(use_cache=False):
+    """
+    创建发布压缩包（只包含核心组件）和可选组件包
+    use_cache: 复用上次打包的压缩结果，只重新压缩内容变化的文件
+    返回: (zip_path, components, component_artifacts)，失败时 zip_path 为 None；
+         components 为 split_components 的结果 {组件名: [(文件路径, 压缩包内路径)]}
+    """
+    log("创建发布压缩包...")
+    
+    # 确保发布目录存在
+    os.makedirs(RELEASE_DIR, exist_ok=True)
+    
+    source_dir = find_build_output()
+    if not source_dir:
+        log(f"错误: 找不到构建输出目录")
+        return None, {}, {}
+    
+    core_files, components = split_components(source_dir)
+    component_of = {
+        arcname: name for name, files in components.items() for _, arcname in files
+    }
+    
+    # 生成安装文件清单（随发布包安装，供客户端 verify 校验和按需安装组件）
+    hash_cache = hash_utils.HashCache(DIST_HASH_CACHE) if use_cache else None
+    manifest_path = install_verify.create_manifest(
+        source_dir, VERSION, cache=hash_cache, components=component_of
+    )
+    if hash_cache:
+        hash_cache.save()
+    log(f"文件清单已生成: {manifest_path}")
+    manifest_arcname = install_verify.INSTALL_MANIFEST
+    if not any(arcname == manifest_arcname for _, arcname in core_files):
+        core_files.append((manifest_path, manifest_arcname))
     
     # 创建压缩包
     zip_name = f"{APP_NAME}{VERSION}.zip"
     zip_path = os.path.join(RELEASE_DIR, zip_name)
     
-    with zipfile.ZipFile(zip_path, 'w', zipfile.ZIP_DEFLATED) as zipf:
-        for root, dirs, files in os.walk(source_dir):
-            for file in files:
-                file_path = os.path.join(root, file)
-                arcname = os.path.relpath(file_path, source_dir)
-                zipf.write(file_path, arcname)
+    stats = release_packer.build_package(
+        source_dir,
+        zip_path,
+        level=COMPRESS_LEVEL,
+        allow_lzma=ALLOW_LZMA,
+        max_workers=COMPRESS_WORKERS,
+        cache_dir=_package_cache_dir(use_cache, "core"),
+        files=core_files
+    )
+    extract_seconds = release_packer.measure_extraction(zip_path)
     
-    file_size = os.path.getsize(zip_path)
     log(f"压缩包已创建: {zip_path}")
-    log(f"  大小: {file_size / 1024 / 1024:.2f} MB")
+    log(f"  文件数: {stats['files']}")
+    log(f"  原始大小: {stats['input_size'] / 1024 / 1024:.2f} MB")
+    log(f"  大小: {stats['archive_size'] / 1024 / 1024:.2f} MB "
+        f"({stats['archive_size'] / max(stats['input_size'], 1) * 100:.1f}%)")
+    log(f"  压缩方式: " + ", ".join(f"{name} {count}" for name, count in stats['methods'].items()))
+    if use_cache:
+        log(f"  打包缓存: 命中 {stats['cache_hits']}，未命中 {stats['cache_misses']}")
+    log(f"  打包耗时: {stats['pack_seconds']:.2f} 秒")
+    log(f"  客户端解压耗时: {extract_seconds:.2f} 秒")
     
-    return zip_path
+    component_artifacts = create_component_packages(source_dir, components, use_cache)
+    return zip_path, components, component_artifacts
+
+
+def create_delta_packages(zip_path, delta_sources, keep=()):
+    """
+    生成来自旧版本的增量包
+    delta_sources: [(from_version, old_zip_path)]
+    keep: 可选组件中的文件，旧完整包中有但不应从客户端删除
+    返回: 增量包制品列表（用于发布索引）
+    """
+    artifacts = []
+    for from_version, old_zip_path in delta_sources:
+        if not os.path.exists(old_zip_path):
+            log(f"警告: 找不到旧版本压缩包 {old_zip_path}，跳过增量包")
+            continue
+        
+        delta_name = f"{APP_NAME}{VERSION}_from_{from_version}.zip"
+        delta_path = os.path.join(RELEASE_DIR, delta_name)
+        changed, removed = release_index.create_delta_package(
+            old_zip_path, zip_path, delta_path, from_version, VERSION, keep=keep
+        )
+        delta_size = os.path.getsize(delta_path)
+        log(f"增量包已创建: {delta_path}")
+        log(f"  {from_version} -> {VERSION}: 变化 {changed} 个文件，删除 {removed} 个文件，"
+            f"大小 {delta_size / 1024 / 1024:.2f} MB")
+        
+        artifacts.append({
+            "type": "delta",
+            "from": from_version,
+            "url": DOWNLOAD_URL_TEMPLATE.format(version=VERSION, file=delta_name),
+            "size": delta_size,
+            "hash": calculate_hash(delta_path),
+        })
+    return artifacts
+
+
+def load_previous_index(index_path):
+    """读取已有的发布索引，不存在时返回空索引"""
+    if not index_path or not os.path.exists(index_path):
+        return {}
+    try:
+        with open(index_path, 'r', encoding='utf-8-sig') as f:
+            return json.load(f)
+    except (OSError, ValueError) as e:
+        log(f"警告: 读取发布索引失败 {index_path}: {e}")
+        return {}
 
 
-def generate_version_json(zip_path, changelog=None):
-    """生成 version.json"""
+def generate_version_json(zip_path, changelog=None, delta_artifacts=None, previous_index=None,
+                          rollout=None, components=None):
+    """
+    生成 version.json（发布索引）
+    顶层字段描述最新版本的完整包，供旧版本客户端使用；
+    releases 列出最近几个版本的完整包和增量包，供客户端规划更新路径。
+    rollout: 分批发布配置（见 update_rollout.py），None 表示全量发布
+    components: 可选组件包 {组件名: 制品信息}
+    """
     log("生成 version.json...")
     
     if changelog is None:
@@ -133,16 +496,46 @@ def generate_version_json(zip_path, changelog=None):
             "修复已知问题"
         ]
     
+    zip_name = os.path.basename(zip_path)
+    download_url = DOWNLOAD_URL_TEMPLATE.format(version=VERSION, file=zip_name)
+    file_size = os.path.getsize(zip_path)
+    file_hash = calculate_hash(zip_path)
+    release_date = datetime.now().strftime("%Y-%m-%d")
+    
+    release = {
+        "version": VERSION,
+        "release_date": release_date,
+        "changelog": changelog,
+        "force_update": False,
+        "artifacts": [
+            {"type": "full", "url": download_url, "size": file_size, "hash": file_hash}
+        ] + list(delta_artifacts or []),
+    }
+    if components:
+        release["components"] = components
+    if rollout:
+        release["rollout"] = rollout
+    
+    # 合并历史版本（同版本号的旧记录被替换）
+    releases = [release]
+    for old_release in release_index.get_releases(previous_index or {}):
+        if release_index.compare_versions(old_release['version'], VERSION) != 0:
+            releases.append(old_release)
+    releases = releases[:RELEASE_HISTORY]
+    
     version_info = {
         "version": VERSION,
-        "min_version": "1.8.0",
-        "download_url": f"https://github.com/yourname/Y2Tool/releases/download/v{VERSION}/{APP_NAME}{VERSION}.zip",
+        "min_version": MIN_VERSION,
+        "download_url": download_url,
         "changelog": changelog,
         "force_update": False,
-        "file_size": os.path.getsize(zip_path),
-        "hash": calculate_hash(zip_path),
-        "release_date": datetime.now().strftime("%Y-%m-%d")
+        "file_size": file_size,
+        "hash": file_hash,
+        "release_date": release_date,
+        "releases": releases,
     }
+    if rollout:
+        version_info["rollout"] = rollout
     
     version_path = os.path.join(RELEASE_DIR, "version.json")
     with open(version_path, 'w', encoding='utf-8') as f:
@@ -193,6 +586,39 @@ def print_release_notes():
     print("=" * 60)
 
 
+def _percentage(value):
+    """argparse 类型：0~100 的发布比例"""
+    try:
+        percentage = float(value)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"不是有效的数字: {value}")
+    if not 0 <= percentage <= 100:
+        raise argparse.ArgumentTypeError(f"发布比例应在 0~100 之间: {value}")
+    return percentage
+
+
+def _positive_hours(value):
+    """argparse 类型：大于 0 的小时数"""
+    try:
+        hours = float(value)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"不是有效的数字: {value}")
+    if not 0 < hours < float("inf"):
+        raise argparse.ArgumentTypeError(f"时长应大于 0: {value}")
+    return hours
+
+
+def _rollout_start(value):
+    """argparse 类型：分批发布开始时间（按客户端的解析方式检查）"""
+    import update_rollout
+
+    try:
+        update_rollout.parse_time(value)
+    except (ValueError, OverflowError, OSError):
+        raise argparse.ArgumentTypeError(f"不是有效的 ISO 8601 时间: {value}")
+    return value
+
+
 def main():
     """主函数"""
     print("=" * 60)
@@ -200,24 +626,82 @@ def main():
     print("=" * 60)
     
     # 检查命令行参数
-    if len(sys.argv) > 1:
-        if sys.argv[1] == "--clean":
-            clean_build()
-            return
+    parser = argparse.ArgumentParser(description="构建并生成发布文件")
+    parser.add_argument("--clean", action="store_true", help="仅清理构建目录和构建缓存")
+    parser.add_argument("--incremental", action="store_true", help="增量构建")
+    parser.add_argument("--exclude-input", action="append", default=[], metavar="PATTERN",
+                        help="不参与构建指纹的文件或目录（glob 模式），可重复指定")
+    parser.add_argument("--delta-from", action="append", default=[], metavar="VERSION=ZIP",
+                        help="生成来自旧版本完整包的增量包，可重复指定")
+    parser.add_argument("--previous-index", default=None, metavar="PATH",
+                        help="已有的 version.json，用于保留历史版本记录")
+    parser.add_argument("--rollout", type=_percentage, default=None, metavar="PERCENT",
+                        help="分批发布比例（0~100），默认全量发布")
+    parser.add_argument("--rollout-start", type=_rollout_start, default=None, metavar="ISO_TIME",
+                        help="分批发布开始时间，如 2026-10-20T08:00:00+08:00")
+    parser.add_argument("--rollout-ramp-hours", type=_positive_hours, default=None, metavar="HOURS",
+                        help="从开始时间起在此时长内逐步增加到发布比例")
+    args = parser.parse_args()
     
-    # 完整构建流程
-    clean_build()
+    staged = args.rollout is not None and args.rollout < 100
+    if not staged and (args.rollout_start or args.rollout_ramp_hours):
+        parser.error("--rollout-start 和 --rollout-ramp-hours 需要与 --rollout（小于 100）一起使用")
     
-    if not build_app():
-        log("构建失败，退出")
-        sys.exit(1)
+    if args.clean:
+        clean_build(include_cache=True)
+        return
+    
+    BUILD_INPUT_EXCLUDES.extend(args.exclude_input)
+    
+    delta_sources = []
+    for item in args.delta_from:
+        if '=' not in item:
+            parser.error(f"--delta-from 格式应为 VERSION=ZIP: {item}")
+        from_version, old_zip_path = item.split('=', 1)
+        delta_sources.append((from_version.strip(), old_zip_path.strip()))
     
-    zip_path = create_release_package()
+    incremental = args.incremental
+    if incremental:
+        # 增量构建流程：保留 build/dist，只清理发布目录
+        if os.path.exists(RELEASE_DIR):
+            shutil.rmtree(RELEASE_DIR)
+        
+        if not incremental_build():
+            log("构建失败，退出")
+            sys.exit(1)
+    else:
+        # 完整构建流程
+        fingerprint = compute_build_fingerprint()
+        clean_build()
+        
+        if not build_app():
+            log("构建失败，退出")
+            sys.exit(1)
+        
+        save_build_fingerprint(fingerprint)
+    
+    zip_path, components, component_artifacts = create_release_package(use_cache=incremental)
     if not zip_path:
         log("创建压缩包失败，退出")
         sys.exit(1)
     
-    generate_version_json(zip_path)
+    rollout = None
+    if staged:
+        rollout = {"percentage": args.rollout}
+        if args.rollout_start:
+            rollout["start"] = args.rollout_start
+        if args.rollout_ramp_hours:
+            rollout["ramp_hours"] = args.rollout_ramp_hours
+    
+    component_files = [arcname for files in components.values() for _, arcname in files]
+    delta_artifacts = create_delta_packages(zip_path, delta_sources, keep=component_files)
+    generate_version_json(
+        zip_path,
+        delta_artifacts=delta_artifacts,
+        previous_index=load_previous_index(args.previous_index),
+        rollout=rollout,
+        components=component_artifacts
+    )
     copy_installer_files()
     
     print_release_notes()
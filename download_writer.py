@@ -0,0 +1,142 @@
+# -*- coding: utf-8 -*-
+"""
+下载写入器 - Y2订单处理辅助工具
+客户端（update_core）和局域网中继（update_relay）共用的下载写盘逻辑：
+1. 按预期大小预分配文件（posix_fallocate / truncate），减少磁盘碎片
+2. 按实测吞吐量在 64 KB ~ 4 MB 之间自适应调整每次读取的块大小
+3. 读取到复用的 bytearray 缓冲区（readinto），不为每个块分配新对象
+4. 写入的同时计算哈希，校验时不必重新读取整个文件
+5. 连接提前关闭导致实际大小与 Content-Length 不符时抛出 IncompleteDownload
+"""
+
+import os
+import time
+
+MIN_CHUNK_SIZE = 64 * 1024
+MAX_CHUNK_SIZE = 4 * 1024 * 1024
+# 期望每次读取耗时（秒），块大小按 吞吐量 × 此时间 调整
+TARGET_CHUNK_SECONDS = 0.05
+# 进度回调的最小间隔（秒），下载完成时总会回调一次
+PROGRESS_INTERVAL = 0.1
+
+
+class IncompleteDownload(OSError):
+    """收到的字节数与响应的 Content-Length 不一致（连接提前关闭）"""
+
+
+def preallocate(f, size):
+    """为文件预分配 size 字节，不支持时忽略"""
+    if size <= 0:
+        return
+    try:
+        if hasattr(os, 'posix_fallocate'):
+            os.posix_fallocate(f.fileno(), 0, size)
+        else:
+            f.truncate(size)
+    except OSError:
+        pass
+
+
+class AdaptiveChunkSize:
+    """根据最近一次读取的吞吐量选择下一次读取的块大小（2 的幂）"""
+
+    def __init__(self, minimum=MIN_CHUNK_SIZE, maximum=MAX_CHUNK_SIZE, target_seconds=TARGET_CHUNK_SECONDS):
+        self.minimum = minimum
+        self.maximum = maximum
+        self.target_seconds = target_seconds
+        self.size = minimum
+
+    def update(self, nbytes, seconds):
+        """记录一次读取，返回下一次的块大小"""
+        if nbytes <= 0:
+            return self.size
+        if seconds <= 0:
+            wanted = self.size * 2
+        else:
+            wanted = nbytes / seconds * self.target_seconds
+        size = self.minimum
+        while size < wanted and size < self.maximum:
+            size *= 2
+        self.size = size
+        return size
+
+
+def _content_length(response):
+    """未压缩响应的 Content-Length，压缩或未提供时返回 None"""
+    if response.headers.get('Content-Encoding', 'identity') != 'identity':
+        return None
+    try:
+        return int(response.headers['Content-Length'])
+    except (KeyError, ValueError):
+        return None
+
+
+def write_response(response, file_path, expected_size=0, progress_callback=None, algorithm=None):
+    """
+    把 requests 的流式响应写入文件
+
+    Args:
+        response: requests.get(..., stream=True) 的响应
+        file_path: 保存路径
+        expected_size: 预期大小，用于预分配和进度（0 表示未知）
+        progress_callback: 回调函数(current_size, total_size)
+        algorithm: 写入时同时计算的哈希算法，None 表示不计算
+
+    Returns:
+        (downloaded, hexdigest)：写入的字节数和哈希（未计算时为 None）
+
+    Raises:
+        IncompleteDownload: 未压缩响应的实际大小与 Content-Length 不一致
+    """
+    digest = None
+    if algorithm:
+        import hashlib
+        digest = hashlib.new(algorithm)
+
+    raw = response.raw
+    raw.decode_content = True
+    # 经过 urllib3 读取（不直接读 http.client），保留其 Content-Length 检查
+    readinto = raw.readinto
+    content_length = _content_length(response)
+    chunker = AdaptiveChunkSize()
+    buffer = bytearray(chunker.size)
+    downloaded = 0
+    reported = 0
+    last_progress = 0.0
+
+    with open(file_path, 'wb') as f:
+        preallocate(f, expected_size)
+        while True:
+            size = chunker.size
+            if len(buffer) < size:
+                buffer = bytearray(size)
+            view = memoryview(buffer)[:size]
+
+            start = time.perf_counter()
+            n = readinto(view)
+            if not n:
+                break
+            chunk = view[:n]
+            f.write(chunk)
+            if digest is not None:
+                digest.update(chunk)
+            downloaded += n
+            chunker.update(n, time.perf_counter() - start)
+
+            if progress_callback:
+                now = time.monotonic()
+                if now - last_progress >= PROGRESS_INTERVAL:
+                    last_progress = now
+                    reported = downloaded
+                    progress_callback(downloaded, expected_size)
+
+        # 实际大小小于预分配大小时截断多余部分
+        if expected_size > downloaded:
+            f.truncate(downloaded)
+
+    if content_length is not None and downloaded != content_length:
+        raise IncompleteDownload(f"下载不完整: 收到 {downloaded} 字节，应为 {content_length} 字节")
+
+    if progress_callback and reported != downloaded:
+        progress_callback(downloaded, expected_size or downloaded)
+    return downloaded, digest.hexdigest() if digest is not None else None
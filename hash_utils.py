@@ -0,0 +1,175 @@
+# -*- coding: utf-8 -*-
+"""
+文件哈希工具 - Y2订单处理辅助工具
+构建脚本（build_and_release）和客户端（update_core、updater）共用的哈希计算：
+1. 大缓冲区单文件哈希（hashlib.file_digest / mmap）
+2. 线程池并行计算多个文件的哈希（hashlib 在计算时释放 GIL）
+3. 可选的哈希缓存，按 (路径, 大小, 修改时间, inode) 判断文件是否变化
+"""
+
+import os
+import json
+import mmap
+import hashlib
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+DEFAULT_ALGORITHM = 'sha256'
+# 读取缓冲区大小
+BUFFER_SIZE = 1024 * 1024
+# 超过此大小的文件使用 mmap，一次性交给 hashlib 计算
+MMAP_THRESHOLD = 64 * 1024 * 1024
+
+
+def file_digest(file_path, algorithm=DEFAULT_ALGORITHM):
+    """计算单个文件的哈希，返回小写十六进制字符串"""
+    with open(file_path, 'rb') as f:
+        size = os.fstat(f.fileno()).st_size
+
+        if size >= MMAP_THRESHOLD:
+            digest = hashlib.new(algorithm)
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                digest.update(mm)
+            return digest.hexdigest()
+
+        if hasattr(hashlib, 'file_digest'):
+            return hashlib.file_digest(f, algorithm).hexdigest()
+
+        digest = hashlib.new(algorithm)
+        buffer = bytearray(BUFFER_SIZE)
+        view = memoryview(buffer)
+        while True:
+            n = f.readinto(buffer)
+            if not n:
+                break
+            digest.update(view[:n])
+        return digest.hexdigest()
+
+
+def format_hash(hexdigest, algorithm=DEFAULT_ALGORITHM):
+    """格式化为 version.json 使用的 "sha256:<hex>" 形式"""
+    return f"{algorithm}:{hexdigest}"
+
+
+def parse_hash(value):
+    """
+    解析 "sha256:<hex>" 或纯十六进制字符串
+    返回: (algorithm, hexdigest)，十六进制统一为小写
+    """
+    value = (value or '').strip()
+    if ':' in value:
+        algorithm, hexdigest = value.split(':', 1)
+        return algorithm.strip().lower() or DEFAULT_ALGORITHM, hexdigest.strip().lower()
+    return DEFAULT_ALGORITHM, value.lower()
+
+
+def hash_matches(expected, file_path):
+    """校验文件哈希是否与期望值一致（不区分大小写，兼容 PowerShell 输出的大写哈希）"""
+    algorithm, hexdigest = parse_hash(expected)
+    if not hexdigest:
+        return False
+    return file_digest(file_path, algorithm) == hexdigest
+
+
+class HashCache:
+    """
+    文件哈希缓存
+    以 (大小, 修改时间, inode) 作为文件指纹，指纹未变化时直接返回缓存的哈希。
+    path 为 None 时只在内存中缓存。
+    """
+
+    def __init__(self, path=None):
+        self.path = path
+        self._entries = {}
+        self._lock = threading.Lock()
+        self._dirty = False
+        if path:
+            self.load()
+
+    @staticmethod
+    def _fingerprint(st):
+        return [st.st_size, st.st_mtime_ns, st.st_ino]
+
+    def load(self):
+        """从磁盘读取缓存，文件损坏时忽略"""
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            if isinstance(data, dict):
+                self._entries = data
+        except (OSError, ValueError):
+            self._entries = {}
+
+    def save(self):
+        """写回磁盘（先写临时文件再替换）"""
+        if not self.path or not self._dirty:
+            return
+        with self._lock:
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+            temp_path = f"{self.path}.tmp"
+            with open(temp_path, 'w', encoding='utf-8') as f:
+                json.dump(self._entries, f, ensure_ascii=False)
+            os.replace(temp_path, self.path)
+            self._dirty = False
+
+    def get(self, file_path, algorithm=DEFAULT_ALGORITHM, st=None):
+        """返回缓存的哈希，文件已变化或未缓存时返回 None"""
+        key = os.path.abspath(file_path)
+        entry = self._entries.get(key)
+        if not entry or entry.get('algorithm') != algorithm:
+            return None
+        if st is None:
+            try:
+                st = os.stat(file_path)
+            except OSError:
+                return None
+        if entry.get('stat') != self._fingerprint(st):
+            return None
+        return entry.get('digest')
+
+    def put(self, file_path, digest, algorithm=DEFAULT_ALGORITHM, st=None):
+        """记录文件哈希"""
+        if st is None:
+            st = os.stat(file_path)
+        with self._lock:
+            self._entries[os.path.abspath(file_path)] = {
+                'stat': self._fingerprint(st),
+                'algorithm': algorithm,
+                'digest': digest,
+            }
+            self._dirty = True
+
+
+def cached_file_digest(file_path, algorithm=DEFAULT_ALGORITHM, cache=None):
+    """计算文件哈希，提供 cache 时先查缓存"""
+    if cache is None:
+        return file_digest(file_path, algorithm)
+
+    st = os.stat(file_path)
+    digest = cache.get(file_path, algorithm, st)
+    if digest is None:
+        digest = file_digest(file_path, algorithm)
+        cache.put(file_path, digest, algorithm, st)
+    return digest
+
+
+def hash_files(file_paths, algorithm=DEFAULT_ALGORITHM, max_workers=None, cache=None):
+    """
+    并行计算多个文件的哈希
+    返回: dict {file_path: hexdigest}
+    """
+    file_paths = list(file_paths)
+    if not file_paths:
+        return {}
+
+    if max_workers is None:
+        max_workers = min(32, (os.cpu_count() or 1) + 4)
+
+    def task(file_path):
+        return cached_file_digest(file_path, algorithm, cache)
+
+    if max_workers <= 1 or len(file_paths) == 1:
+        return {path: task(path) for path in file_paths}
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        return dict(zip(file_paths, executor.map(task, file_paths)))
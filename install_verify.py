@@ -0,0 +1,451 @@
+# -*- coding: utf-8 -*-
+"""
+安装校验与自修复 - Y2订单处理辅助工具
+功能：
+1. 构建时为发布内容生成文件清单 __manifest__.json（随发布包一起安装）
+2. 按清单校验安装目录：大小不符直接判定，未变化的文件（大小、修改时间、inode
+   与缓存一致）复用缓存的哈希，其余文件并行计算哈希
+3. 只重新获取缺失或损坏的文件：优先从本地已下载的同版本更新包中取，
+   否则通过 HTTP Range 请求从远程完整包中只读取需要的成员
+4. 清理替换失败时留下的 .old 文件
+
+清单格式：
+
+    {
+      "version": "1.9.0",
+      "files": {
+        "Y2订单处理辅助工具.exe": {"size": 123, "hash": "sha256:..."},
+        "_internal/base_library.zip": {"size": 456, "hash": "sha256:..."},
+        "_internal/pandas/...": {"size": 789, "hash": "sha256:...", "component": "excel"}
+      }
+    }
+
+带 component 的文件属于可选组件（见 update_components.py），组件未安装时不参与校验。
+"""
+
+import os
+import io
+import json
+import time
+
+import hash_utils
+from update_core import CONFIG_DIR
+
+# 安装目录中的文件清单（与发布包根目录下的文件同名）
+INSTALL_MANIFEST = '__manifest__.json'
+# 替换文件时重命名的旧文件后缀（见 updater.replace_files）
+STALE_SUFFIX = '.old'
+# 客户端校验时使用的哈希缓存
+HASH_CACHE_PATH = os.path.join(CONFIG_DIR, 'install_hash_cache.json')
+# 远程读取时每次 Range 请求的最小字节数
+RANGE_BUFFER_SIZE = 256 * 1024
+# 写入修复文件时的缓冲区大小
+COPY_BUFFER_SIZE = 1024 * 1024
+
+
+def create_manifest(source_dir, version, cache=None, max_workers=None, components=None):
+    """
+    为构建输出目录生成文件清单并写入 source_dir/__manifest__.json（构建端使用）
+    cache: 可选的 hash_utils.HashCache，增量构建时跳过未变化文件的哈希计算
+    components: {相对路径: 组件名}，标记属于可选组件的文件
+    返回: 清单文件路径
+    """
+    components = components or {}
+    files = []
+    for root, dirs, names in os.walk(source_dir):
+        for name in names:
+            file_path = os.path.join(root, name)
+            rel_path = os.path.relpath(file_path, source_dir).replace(os.sep, '/')
+            if rel_path != INSTALL_MANIFEST:
+                files.append((rel_path, file_path))
+    files.sort()
+
+    digests = hash_utils.hash_files([path for _, path in files], max_workers=max_workers, cache=cache)
+    manifest = {'version': version, 'files': {}}
+    for rel_path, file_path in files:
+        entry = {
+            'size': os.path.getsize(file_path),
+            'hash': hash_utils.format_hash(digests[file_path]),
+        }
+        if rel_path in components:
+            entry['component'] = components[rel_path]
+        manifest['files'][rel_path] = entry
+
+    manifest_path = os.path.join(source_dir, INSTALL_MANIFEST)
+    with open(manifest_path, 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, ensure_ascii=False, indent=1, sort_keys=True)
+    return manifest_path
+
+
+def load_manifest(install_dir):
+    """读取安装目录中的文件清单，不存在或损坏时返回 None"""
+    try:
+        with open(os.path.join(install_dir, INSTALL_MANIFEST), 'r', encoding='utf-8') as f:
+            manifest = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if not isinstance(manifest, dict) or not isinstance(manifest.get('files'), dict):
+        return None
+    return manifest
+
+
+def _safe_join(install_dir, rel_path):
+    """清单中的相对路径转为安装目录内的绝对路径，越界时返回 None"""
+    root = os.path.abspath(install_dir)
+    path = os.path.abspath(os.path.join(root, rel_path))
+    if os.path.commonpath([root, path]) != root:
+        return None
+    return path
+
+
+def verify_install(install_dir, manifest=None, cache=None, max_workers=None, installed_components=None):
+    """
+    按清单校验安装目录
+    cache: hash_utils.HashCache，文件指纹未变化时复用缓存的哈希；None 时全部重新计算
+    installed_components: 已安装的可选组件名集合，其他组件的文件跳过；None 时校验全部文件
+
+    返回: dict
+        version     清单中的版本号
+        files       清单中的文件数
+        hashed      实际计算哈希的文件数
+        cached      复用缓存哈希的文件数
+        hashed_size 实际读取的字节数
+        missing     缺失的文件
+        mismatched  大小或哈希不一致的文件
+        stale       残留的 .old 文件
+        seconds     校验耗时
+    """
+    start_time = time.perf_counter()
+    if manifest is None:
+        manifest = load_manifest(install_dir)
+    if manifest is None:
+        raise FileNotFoundError(f"找不到文件清单: {os.path.join(install_dir, INSTALL_MANIFEST)}")
+
+    files = {
+        rel_path: entry for rel_path, entry in manifest['files'].items()
+        if installed_components is None or not entry.get('component')
+        or entry['component'] in installed_components
+    }
+    result = {
+        'version': manifest.get('version'),
+        'files': len(files),
+        'hashed': 0,
+        'cached': 0,
+        'hashed_size': 0,
+        'missing': [],
+        'mismatched': [],
+        'stale': [],
+    }
+
+    # 先比较大小，大小一致的再按算法分组计算哈希
+    candidates = {}
+    for rel_path, entry in sorted(files.items()):
+        path = _safe_join(install_dir, rel_path)
+        if path is None:
+            continue
+        try:
+            st = os.stat(path)
+        except OSError:
+            result['missing'].append(rel_path)
+            continue
+        if st.st_size != entry.get('size'):
+            result['mismatched'].append(rel_path)
+            continue
+
+        algorithm, expected = hash_utils.parse_hash(entry.get('hash'))
+        if cache is not None and cache.get(path, algorithm, st) is not None:
+            result['cached'] += 1
+        else:
+            result['hashed'] += 1
+            result['hashed_size'] += st.st_size
+        candidates.setdefault(algorithm, []).append((rel_path, path, expected))
+
+    for algorithm, items in candidates.items():
+        digests = hash_utils.hash_files(
+            [path for _, path, _ in items], algorithm, max_workers=max_workers, cache=cache
+        )
+        for rel_path, path, expected in items:
+            if digests[path] != expected:
+                result['mismatched'].append(rel_path)
+    result['mismatched'].sort()
+
+    # 替换失败时留下的旧文件
+    for rel_path in files:
+        path = _safe_join(install_dir, rel_path)
+        if path is not None and os.path.exists(path + STALE_SUFFIX):
+            result['stale'].append(rel_path + STALE_SUFFIX)
+    result['stale'].sort()
+
+    if cache is not None:
+        try:
+            cache.save()
+        except OSError:
+            pass
+
+    result['seconds'] = time.perf_counter() - start_time
+    return result
+
+
+class HttpRangeFile(io.RawIOBase):
+    """
+    以 HTTP Range 请求实现的只读文件对象
+    交给 zipfile 使用时只会读取中央目录和需要的成员，而不是下载整个压缩包
+    """
+
+    def __init__(self, url, session=None, timeout=30):
+        import requests
+
+        self.url = url
+        self.session = session or requests.Session()
+        self.timeout = timeout
+        self.requests = 0
+        self._pos = 0
+
+        response = self.session.head(url, allow_redirects=True, timeout=timeout)
+        response.raise_for_status()
+        self.size = int(response.headers.get('Content-Length', 0))
+        # 跟随重定向后的地址（如 GitHub Releases 的下载地址）
+        self.url = response.url or url
+
+    def readable(self):
+        return True
+
+    def seekable(self):
+        return True
+
+    def tell(self):
+        return self._pos
+
+    def seek(self, offset, whence=io.SEEK_SET):
+        if whence == io.SEEK_SET:
+            self._pos = offset
+        elif whence == io.SEEK_CUR:
+            self._pos += offset
+        elif whence == io.SEEK_END:
+            self._pos = self.size + offset
+        else:
+            raise ValueError(f"无效的 whence: {whence}")
+        if self._pos < 0:
+            raise ValueError("seek 位置不能为负数")
+        return self._pos
+
+    def readinto(self, buffer):
+        if self._pos >= self.size or not len(buffer):
+            return 0
+        end = min(self._pos + len(buffer), self.size) - 1
+        response = self.session.get(
+            self.url, headers={'Range': f"bytes={self._pos}-{end}"}, timeout=self.timeout
+        )
+        self.requests += 1
+        if response.status_code != 206:
+            raise OSError(f"Range 请求失败 (HTTP {response.status_code}): {self.url}")
+        data = response.content
+        n = len(data)
+        buffer[:n] = data
+        self._pos += n
+        return n
+
+
+def _member_names(zip_ref):
+    """
+    压缩包成员名到安装目录相对路径的映射
+    与更新助手一致：只有一个外层目录且根目录下没有文件时去掉该目录
+    """
+    entries = zip_ref.namelist()
+    names = [name for name in entries if not name.endswith('/')]
+    # 外层目录按全部条目判断（包括目录条目），与 updater.extract_update 相同
+    roots = {name.split('/', 1)[0] for name in entries if '/' in name}
+    prefix = ''
+    if len(roots) == 1 and all('/' in name for name in entries):
+        prefix = roots.pop() + '/'
+    return {name[len(prefix):]: name for name in names if name.startswith(prefix)}
+
+
+def _find_local_package(version):
+    """状态存储中同版本且仍存在的已下载更新包"""
+    import sqlite3
+    import update_state
+    import release_index
+
+    try:
+        rows = update_state.get_store().get_completed_downloads()
+    except (OSError, sqlite3.Error):
+        return None
+    for path, package_version, _ in rows:
+        try:
+            if package_version and release_index.compare_versions(package_version, version) == 0:
+                if os.path.exists(path):
+                    return path
+        except ValueError:
+            continue
+    return None
+
+
+def find_remote_package_urls(version_info, version, components=()):
+    """
+    发布索引中指定版本完整包的下载地址
+    components: 同时返回这些可选组件包的地址
+    """
+    import release_index
+
+    urls = []
+    for release in release_index.get_releases(version_info or {}):
+        try:
+            if release_index.compare_versions(release['version'], version) != 0:
+                continue
+        except ValueError:
+            continue
+        for artifact in release.get('artifacts', []):
+            if artifact.get('type', 'full') == 'full':
+                urls.append(artifact.get('url'))
+        for name in components:
+            component = (release.get('components') or {}).get(name) or {}
+            urls.append(component.get('url'))
+
+    try:
+        if version_info and release_index.compare_versions(version_info.get('version'), version) == 0:
+            urls.append(version_info.get('download_url'))
+    except ValueError:
+        pass
+
+    unique = []
+    for url in urls:
+        if url and url not in unique:
+            unique.append(url)
+    return unique
+
+
+def restore_member(zip_ref, member_name, dst_path, expected_hash):
+    """从压缩包中取出一个文件，校验哈希后替换安装目录中的文件"""
+    import hashlib
+
+    algorithm, expected = hash_utils.parse_hash(expected_hash)
+    digest = hashlib.new(algorithm)
+    temp_path = f"{dst_path}.repair"
+
+    os.makedirs(os.path.dirname(dst_path), exist_ok=True)
+    try:
+        with zip_ref.open(member_name) as src, open(temp_path, 'wb') as dst:
+            while True:
+                chunk = src.read(COPY_BUFFER_SIZE)
+                if not chunk:
+                    break
+                digest.update(chunk)
+                dst.write(chunk)
+        if expected and digest.hexdigest() != expected:
+            raise ValueError(f"文件校验失败: {member_name}")
+
+        try:
+            os.replace(temp_path, dst_path)
+        except PermissionError:
+            # 文件正在使用：与更新助手相同，先把旧文件改名
+            stale_path = dst_path + STALE_SUFFIX
+            if os.path.exists(stale_path):
+                os.remove(stale_path)
+            os.rename(dst_path, stale_path)
+            os.replace(temp_path, dst_path)
+    finally:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+
+
+def _restore_from(zip_ref, install_dir, manifest, pending, repaired, errors):
+    """从一个压缩包中修复 pending 中能找到的文件"""
+    members = _member_names(zip_ref)
+    for rel_path in list(pending):
+        if rel_path not in members:
+            continue
+        try:
+            restore_member(
+                zip_ref, members[rel_path], _safe_join(install_dir, rel_path),
+                manifest['files'][rel_path].get('hash')
+            )
+        except Exception as e:
+            errors[rel_path] = str(e)
+            continue
+        pending.discard(rel_path)
+        errors.pop(rel_path, None)
+        repaired.append(rel_path)
+
+
+def repair_install(install_dir, verify_result, manifest=None, version_info=None, package_path=None,
+                   components=()):
+    """
+    修复校验发现的问题：逐个重新获取缺失或损坏的文件，删除残留的 .old 文件
+
+    Args:
+        install_dir: 安装目录
+        verify_result: verify_install 的返回值
+        manifest: 文件清单（默认读取安装目录中的清单）
+        version_info: 发布索引，用于定位远程完整包（没有时只使用本地更新包）
+        package_path: 指定本地更新包（默认查找同版本的已下载更新包）
+        components: 已安装的可选组件，其文件从对应的组件包中获取
+
+    返回: dict
+        repaired  已修复的文件
+        removed   已删除的 .old 文件
+        failed    {文件: 原因}，仍未修复的文件
+        sources   实际使用的来源
+        seconds   修复耗时
+    """
+    import zipfile
+
+    start_time = time.perf_counter()
+    if manifest is None:
+        manifest = load_manifest(install_dir)
+    version = manifest.get('version')
+
+    pending = set(verify_result['missing']) | set(verify_result['mismatched'])
+    repaired = []
+    errors = {}
+    sources = []
+
+    # 1. 本地已下载的同版本更新包
+    package_path = package_path or (version and _find_local_package(version))
+    if pending and package_path and os.path.exists(package_path):
+        try:
+            with zipfile.ZipFile(package_path, 'r') as zip_ref:
+                _restore_from(zip_ref, install_dir, manifest, pending, repaired, errors)
+            sources.append(package_path)
+        except (OSError, zipfile.BadZipFile) as e:
+            errors['<local>'] = str(e)
+
+    # 2. 远程完整包：只通过 Range 请求读取需要的成员
+    for url in (find_remote_package_urls(version_info, version, components) if pending and version else []):
+        try:
+            remote = HttpRangeFile(url)
+            with io.BufferedReader(remote, RANGE_BUFFER_SIZE) as fileobj, \
+                    zipfile.ZipFile(fileobj, 'r') as zip_ref:
+                _restore_from(zip_ref, install_dir, manifest, pending, repaired, errors)
+            sources.append(f"{url} ({remote.requests} 次 Range 请求)")
+        except Exception as e:
+            errors['<remote>'] = f"{url}: {e}"
+            continue
+        if not pending:
+            break
+
+    # 3. 清理 .old 文件（仍被占用时保留）
+    removed = []
+    for rel_path in verify_result['stale']:
+        path = _safe_join(install_dir, rel_path)
+        try:
+            os.remove(path)
+            removed.append(rel_path)
+        except OSError as e:
+            errors[rel_path] = str(e)
+
+    failed = {rel_path: errors.get(rel_path, "没有可用的来源") for rel_path in sorted(pending)}
+    if pending:
+        # 来源本身不可用的原因只在仍有文件未修复时才有意义
+        failed.update({key: value for key, value in errors.items() if key.startswith('<')})
+    for rel_path in verify_result['stale']:
+        if rel_path not in removed:
+            failed[rel_path] = errors.get(rel_path, '')
+
+    return {
+        'repaired': sorted(repaired),
+        'removed': removed,
+        'failed': failed,
+        'sources': sources,
+        'seconds': time.perf_counter() - start_time,
+    }
@@ -0,0 +1,295 @@
+# -*- coding: utf-8 -*-
+"""
+发布索引 - Y2订单处理辅助工具
+功能：
+1. 版本号解析与比较（支持 1.9.1、v1.9.1、1.9.1-beta.2、1.9.1rc1 等形式）
+2. 多版本发布索引：每个版本可提供完整包和来自某个旧版本的增量包
+3. 更新路径规划：从当前版本到最新版本，选择总下载字节数最少的路径
+4. 增量包的生成（构建端）与合并（客户端）
+
+version.json 在保留原有顶层字段（旧版本客户端只读取这些字段）的基础上增加 releases：
+
+    {
+      "version": "1.9.2",
+      "min_version": "1.8.0",
+      "download_url": "...", "file_size": 123, "hash": "sha256:...",
+      "releases": [
+        {
+          "version": "1.9.2",
+          "changelog": [...],
+          "force_update": false,
+          "artifacts": [
+            {"type": "full", "url": "...", "size": 123, "hash": "sha256:..."},
+            {"type": "delta", "from": "1.9.1", "url": "...", "size": 45, "hash": "sha256:..."}
+          ],
+          "components": {
+            "excel": {"url": "...", "size": 67, "hash": "sha256:..."}
+          }
+        }
+      ]
+    }
+
+增量包是只包含变化文件的普通 ZIP，另附 __delta__.json 记录需要删除的文件。
+完整包和增量包只包含核心组件，可选组件单独打包（见 update_components.py）。
+"""
+
+import re
+import heapq
+
+# 增量包中记录删除文件列表的清单文件
+DELTA_MANIFEST = '__delta__.json'
+
+_VERSION_RE = re.compile(r'^\s*v?(\d+(?:\.\d+)*)(?:[-_.]?([a-zA-Z]+)[-_.]?(\d*))?\s*$')
+# 预发布标记的先后顺序
+_PRE_RELEASE_ORDER = {
+    'dev': 0,
+    'a': 1, 'alpha': 1,
+    'b': 2, 'beta': 2,
+    'c': 3, 'rc': 3, 'pre': 3,
+}
+
+
+def parse_version(text):
+    """
+    解析版本号为可比较的元组
+    无法解析时抛出 ValueError
+    """
+    match = _VERSION_RE.match(str(text or ''))
+    if not match:
+        raise ValueError(f"无效的版本号: {text!r}")
+
+    numbers = [int(x) for x in match.group(1).split('.')]
+    # 1.9 与 1.9.0 视为相同版本
+    while len(numbers) > 1 and numbers[-1] == 0:
+        numbers.pop()
+
+    tag = (match.group(2) or '').lower()
+    if tag:
+        # 预发布版本排在正式版本之前
+        pre_release = (0, _PRE_RELEASE_ORDER.get(tag, 0), int(match.group(3) or 0))
+    else:
+        pre_release = (1, 0, 0)
+
+    return tuple(numbers), pre_release
+
+
+def compare_versions(a, b):
+    """比较两个版本号，返回 -1 / 0 / 1"""
+    key_a = parse_version(a)
+    key_b = parse_version(b)
+    return (key_a > key_b) - (key_a < key_b)
+
+
+def get_releases(index):
+    """
+    返回索引中的全部发布记录（按版本从新到旧）
+    旧格式的 version.json（没有 releases）视为只有一个完整包的发布
+    """
+    releases = list(index.get('releases') or [])
+    if not releases and index.get('version'):
+        artifacts = []
+        if index.get('download_url'):
+            artifacts.append({
+                'type': 'full',
+                'url': index['download_url'],
+                'size': index.get('file_size', 0),
+                'hash': index.get('hash', ''),
+            })
+        releases.append({
+            'version': index['version'],
+            'changelog': index.get('changelog', []),
+            'force_update': index.get('force_update', False),
+            'artifacts': artifacts,
+        })
+
+    valid = []
+    for release in releases:
+        try:
+            parse_version(release.get('version'))
+        except ValueError:
+            continue
+        valid.append(release)
+    valid.sort(key=lambda r: parse_version(r['version']), reverse=True)
+    return valid
+
+
+def get_latest_version(index):
+    """索引中的最新版本号"""
+    candidates = [r['version'] for r in get_releases(index)]
+    if index.get('version'):
+        candidates.append(index['version'])
+
+    latest = None
+    for version in candidates:
+        try:
+            if latest is None or compare_versions(version, latest) > 0:
+                latest = version
+        except ValueError:
+            continue
+    return latest
+
+
+def plan_update_path(index, current_version, target_version=None, exclude=()):
+    """
+    规划从 current_version 到 target_version（默认最新版本）的更新路径
+    每一步可以是完整包（可从任意版本应用）或来自指定版本的增量包，
+    选择总下载字节数最少的路径，字节数相同时选择步骤更少的路径。
+
+    exclude: 需要排除的制品 URL（例如下载失败或校验失败的增量包）
+    返回: [step, ...]，step 为制品 dict 加上 'to' 字段；没有可用路径时返回 None
+    """
+    target_version = target_version or get_latest_version(index)
+    if not target_version:
+        return None
+
+    current_key = parse_version(current_version)
+    target_key = parse_version(target_version)
+    if target_key <= current_key:
+        return []
+
+    # 可作为中间节点或终点的版本
+    edges = {}
+    for release in get_releases(index):
+        release_key = parse_version(release['version'])
+        if not current_key < release_key <= target_key:
+            continue
+        for artifact in release.get('artifacts', []):
+            if not artifact.get('url') or artifact['url'] in exclude:
+                continue
+            step = dict(artifact, to=release['version'])
+            if artifact.get('type') == 'delta':
+                try:
+                    source = parse_version(artifact.get('from'))
+                except ValueError:
+                    continue
+                edges.setdefault(source, []).append((release_key, step))
+            elif artifact.get('type', 'full') == 'full':
+                # 完整包可以从任意版本直接应用
+                edges.setdefault(None, []).append((release_key, step))
+
+    # Dijkstra：代价为 (总字节数, 步骤数)
+    best = {current_key: (0, 0)}
+    previous = {}
+    queue = [(0, 0, current_key)]
+    while queue:
+        size, steps, node = heapq.heappop(queue)
+        if best.get(node) != (size, steps):
+            continue
+        if node == target_key:
+            break
+        for next_key, step in edges.get(node, []) + edges.get(None, []):
+            if next_key <= node:
+                continue
+            cost = (size + int(step.get('size') or 0), steps + 1)
+            if next_key not in best or cost < best[next_key]:
+                best[next_key] = cost
+                previous[next_key] = (node, step)
+                heapq.heappush(queue, (cost[0], cost[1], next_key))
+
+    if target_key not in previous:
+        return None
+
+    path = []
+    node = target_key
+    while node != current_key:
+        node, step = previous[node]
+        path.append(step)
+    path.reverse()
+    return path
+
+
+def create_delta_package(old_zip_path, new_zip_path, delta_path, from_version, to_version,
+                         keep=()):
+    """
+    根据新旧两个完整包生成增量包（构建端使用）
+    keep: 不在新完整包中但不应删除的文件（如已拆分为可选组件的文件）
+    返回: (changed_count, removed_count)
+    """
+    import json
+    import shutil
+    import zipfile
+
+    with zipfile.ZipFile(old_zip_path, 'r') as old_zip:
+        old_members = {
+            info.filename: (info.CRC, info.file_size)
+            for info in old_zip.infolist() if not info.is_dir()
+        }
+
+    changed = 0
+    with zipfile.ZipFile(new_zip_path, 'r') as new_zip, \
+            zipfile.ZipFile(delta_path, 'w', zipfile.ZIP_DEFLATED) as delta_zip:
+        new_names = set()
+        for info in new_zip.infolist():
+            if info.is_dir():
+                continue
+            new_names.add(info.filename)
+            if old_members.get(info.filename) == (info.CRC, info.file_size):
+                continue
+            with new_zip.open(info) as src, delta_zip.open(info.filename, 'w') as dst:
+                shutil.copyfileobj(src, dst, 1024 * 1024)
+            changed += 1
+
+        removed = sorted(set(old_members) - new_names - set(keep))
+        delta_zip.writestr(DELTA_MANIFEST, json.dumps({
+            'from': from_version,
+            'to': to_version,
+            'removed': removed,
+        }, ensure_ascii=False, indent=2))
+
+    return changed, len(removed)
+
+
+def merge_packages(package_paths, output_path):
+    """
+    按顺序合并多个更新包（完整包或增量包）为一个更新包（客户端使用）
+    后面的包覆盖前面的同名文件，增量包中删除的文件从结果中去掉。
+    """
+    import json
+    import shutil
+    import zipfile
+
+    members = {}
+    removed = set()
+    first_from = None
+    last_to = None
+
+    for package_path in package_paths:
+        with zipfile.ZipFile(package_path, 'r') as zip_ref:
+            names = [info.filename for info in zip_ref.infolist() if not info.is_dir()]
+            if DELTA_MANIFEST in names:
+                manifest = json.loads(zip_ref.read(DELTA_MANIFEST).decode('utf-8'))
+                if first_from is None:
+                    first_from = manifest.get('from')
+                last_to = manifest.get('to')
+                for name in manifest.get('removed', []):
+                    members.pop(name, None)
+                    removed.add(name)
+            else:
+                # 完整包覆盖之前的全部内容
+                members = {}
+                removed = set()
+                first_from = None
+            for name in names:
+                if name == DELTA_MANIFEST:
+                    continue
+                members[name] = package_path
+                removed.discard(name)
+
+    with zipfile.ZipFile(output_path, 'w', zipfile.ZIP_STORED) as out_zip:
+        opened = {}
+        try:
+            for name, package_path in sorted(members.items()):
+                if package_path not in opened:
+                    opened[package_path] = zipfile.ZipFile(package_path, 'r')
+                with opened[package_path].open(name) as src, out_zip.open(name, 'w') as dst:
+                    shutil.copyfileobj(src, dst, 1024 * 1024)
+        finally:
+            for zip_ref in opened.values():
+                zip_ref.close()
+
+        if removed:
+            out_zip.writestr(DELTA_MANIFEST, json.dumps({
+                'from': first_from,
+                'to': last_to,
+                'removed': sorted(removed),
+            }, ensure_ascii=False, indent=2))
@@ -0,0 +1,325 @@
+# -*- coding: utf-8 -*-
+"""
+发布包打包引擎 - Y2订单处理辅助工具
+功能：
+1. 多进程并行压缩发布包中的文件
+2. 按实测压缩率为每个文件选择 STORE / DEFLATE / LZMA
+3. 按文件名顺序确定性地组装 ZIP 压缩包
+4. 统计打包耗时、压缩包大小和客户端解压耗时
+
+生成的压缩包是标准 ZIP 格式，可直接用 zipfile（更新助手）解压。
+"""
+
+import os
+import sys
+import time
+import zlib
+import shutil
+import struct
+import zipfile
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+
+# 采样大小：先压缩文件开头的一段，用于判断文件是否值得压缩
+SAMPLE_SIZE = 256 * 1024
+# 压缩后大小超过原大小的此比例时直接存储（已压缩的 PYZ、图片、压缩包等）
+STORE_RATIO = 0.95
+# 小于此大小的文件不尝试 LZMA
+LZMA_MIN_SIZE = 1024 * 1024
+# LZMA 结果需要比 DEFLATE 小到此比例以下才采用（LZMA 解压更慢）
+LZMA_GAIN = 0.90
+
+# ZIP 格式常量
+_LOCAL_HEADER = struct.Struct('<4s2B4HL2L2H')
+_CENTRAL_HEADER = struct.Struct('<4s4B4HL2L5H2L')
+_END_RECORD = struct.Struct('<4s4H2LH')
+_FLAG_UTF8 = 0x800
+_FLAG_LZMA_EOS = 0x02
+_VERSION_DEFAULT = 20
+_VERSION_LZMA = 63
+_ZIP32_LIMIT = 0xFFFFFFFF
+_ZIP32_COUNT_LIMIT = 0xFFFF
+
+METHOD_NAMES = {
+    zipfile.ZIP_STORED: 'STORE',
+    zipfile.ZIP_DEFLATED: 'DEFLATE',
+    zipfile.ZIP_LZMA: 'LZMA',
+}
+
+
+def _deflate(data, level):
+    """原始 DEFLATE 流（ZIP 格式不带 zlib 头）"""
+    compressor = zlib.compressobj(level, zlib.DEFLATED, -15)
+    return compressor.compress(data) + compressor.flush()
+
+
+def _lzma(data):
+    """ZIP 格式的 LZMA 流（带属性头）"""
+    compressor = zipfile.LZMACompressor()
+    return compressor.compress(data) + compressor.flush()
+
+
+def choose_compression(raw, level=6, allow_lzma=True):
+    """
+    按实测压缩率选择压缩方式
+    返回: (method, data)
+    """
+    method = zipfile.ZIP_STORED
+    data = raw
+
+    if len(raw) > 64:
+        sample = raw[:SAMPLE_SIZE]
+        deflated = _deflate(sample, level)
+
+        if len(deflated) < len(sample) * STORE_RATIO:
+            if len(raw) > len(sample):
+                deflated = _deflate(raw, level)
+            if len(deflated) < len(raw) * STORE_RATIO:
+                method, data = zipfile.ZIP_DEFLATED, deflated
+
+                if allow_lzma and len(raw) >= LZMA_MIN_SIZE:
+                    compressed = _lzma(raw)
+                    if len(compressed) < len(deflated) * LZMA_GAIN:
+                        method, data = zipfile.ZIP_LZMA, compressed
+
+    return method, data
+
+
+def _member_cache_key(raw, level, allow_lzma):
+    """压缩结果缓存键：由文件内容和压缩参数决定"""
+    import hashlib
+
+    digest = hashlib.blake2b(raw, digest_size=16).hexdigest()
+    return f"{digest}_{len(raw)}_{level}_{int(bool(allow_lzma))}"
+
+
+def _load_cached_member(cache_dir, key):
+    """读取缓存的压缩结果，返回 (method, data) 或 None"""
+    try:
+        with open(os.path.join(cache_dir, key), 'rb') as f:
+            blob = f.read()
+    except OSError:
+        return None
+    if not blob:
+        return None
+    return blob[0], blob[1:]
+
+
+def _store_cached_member(cache_dir, key, method, data):
+    """写入压缩结果缓存（先写临时文件再替换，避免留下半个文件）"""
+    path = os.path.join(cache_dir, key)
+    temp_path = f"{path}.{os.getpid()}.tmp"
+    try:
+        with open(temp_path, 'wb') as f:
+            f.write(bytes([method]))
+            f.write(data)
+        os.replace(temp_path, path)
+    except OSError:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+
+
+def compress_member(file_path, arcname, level=6, allow_lzma=True, cache_dir=None):
+    """
+    压缩单个文件（在工作进程中执行）
+    cache_dir: 压缩结果缓存目录，内容未变化的文件直接复用上次的压缩结果
+
+    返回: dict，包含 arcname、method、crc、file_size、data、mtime、mode、
+          cache_key、cache_hit
+    """
+    with open(file_path, 'rb') as f:
+        raw = f.read()
+    st = os.stat(file_path)
+
+    cache_key = None
+    cached = None
+    if cache_dir:
+        cache_key = _member_cache_key(raw, level, allow_lzma)
+        cached = _load_cached_member(cache_dir, cache_key)
+
+    if cached:
+        method, data = cached
+    else:
+        method, data = choose_compression(raw, level, allow_lzma)
+        if cache_dir:
+            _store_cached_member(cache_dir, cache_key, method, data)
+
+    return {
+        'arcname': arcname,
+        'method': method,
+        'crc': zlib.crc32(raw) & 0xFFFFFFFF,
+        'file_size': len(raw),
+        'data': data,
+        'mtime': st.st_mtime,
+        'mode': st.st_mode,
+        'cache_key': cache_key,
+        'cache_hit': cached is not None,
+    }
+
+
+def _compress_task(task):
+    """进程池任务包装"""
+    return compress_member(*task)
+
+
+def _dos_datetime(timestamp):
+    """转换为 ZIP 使用的 DOS 日期时间"""
+    year, month, day, hour, minute, second = time.localtime(timestamp)[0:6]
+    if year < 1980:
+        year, month, day, hour, minute, second = 1980, 1, 1, 0, 0, 0
+    dos_date = (year - 1980) << 9 | month << 5 | day
+    dos_time = hour << 11 | minute << 5 | second // 2
+    return dos_time, dos_date
+
+
+class ZipAssembler:
+    """
+    将已压缩的文件数据按顺序写入 ZIP 压缩包
+
+    zipfile 只能在单线程中边压缩边写入，这里直接写入本地文件头、
+    压缩数据和中央目录，使压缩可以在其他进程中完成。
+    """
+
+    def __init__(self, fileobj):
+        self.fp = fileobj
+        self.entries = []
+        self.create_system = 0 if sys.platform == 'win32' else 3
+
+    def add(self, member):
+        """追加一个已压缩的成员"""
+        name = member['arcname'].replace(os.sep, '/').encode('utf-8')
+        flags = 0 if name.isascii() else _FLAG_UTF8
+        version = _VERSION_DEFAULT
+        if member['method'] == zipfile.ZIP_LZMA:
+            flags |= _FLAG_LZMA_EOS
+            version = _VERSION_LZMA
+
+        offset = self.fp.tell()
+        compress_size = len(member['data'])
+        if max(offset, compress_size, member['file_size']) >= _ZIP32_LIMIT:
+            raise ValueError(f"文件过大，需要 ZIP64 格式: {member['arcname']}")
+
+        dos_time, dos_date = _dos_datetime(member['mtime'])
+        self.fp.write(_LOCAL_HEADER.pack(
+            b'PK\x03\x04', version, 0, flags, member['method'],
+            dos_time, dos_date, member['crc'], compress_size,
+            member['file_size'], len(name), 0
+        ))
+        self.fp.write(name)
+        self.fp.write(member['data'])
+
+        self.entries.append((
+            name, version, flags, member['method'], dos_time, dos_date,
+            member['crc'], compress_size, member['file_size'],
+            (member['mode'] & 0xFFFF) << 16, offset
+        ))
+
+    def close(self):
+        """写入中央目录和结束记录"""
+        if len(self.entries) >= _ZIP32_COUNT_LIMIT:
+            raise ValueError("文件数量过多，需要 ZIP64 格式")
+
+        start_dir = self.fp.tell()
+        for (name, version, flags, method, dos_time, dos_date,
+             crc, compress_size, file_size, external_attr, offset) in self.entries:
+            self.fp.write(_CENTRAL_HEADER.pack(
+                b'PK\x01\x02', version, self.create_system, version, 0,
+                flags, method, dos_time, dos_date, crc, compress_size,
+                file_size, len(name), 0, 0, 0, 0, external_attr, offset
+            ))
+            self.fp.write(name)
+
+        size_dir = self.fp.tell() - start_dir
+        if start_dir + size_dir >= _ZIP32_LIMIT:
+            raise ValueError("压缩包过大，需要 ZIP64 格式")
+
+        self.fp.write(_END_RECORD.pack(
+            b'PK\x05\x06', 0, 0, len(self.entries), len(self.entries),
+            size_dir, start_dir, 0
+        ))
+
+
+def collect_files(source_dir):
+    """收集待打包文件，返回按归档名排序的 [(file_path, arcname)]"""
+    files = []
+    for root, dirs, names in os.walk(source_dir):
+        for name in names:
+            file_path = os.path.join(root, name)
+            arcname = os.path.relpath(file_path, source_dir).replace(os.sep, '/')
+            files.append((file_path, arcname))
+    files.sort(key=lambda item: item[1])
+    return files
+
+
+def _prune_member_cache(cache_dir, used_keys):
+    """删除本次打包未用到的压缩结果缓存"""
+    for name in os.listdir(cache_dir):
+        if name not in used_keys:
+            try:
+                os.remove(os.path.join(cache_dir, name))
+            except OSError:
+                pass
+
+
+def build_package(source_dir, zip_path, level=6, allow_lzma=True, max_workers=None, cache_dir=None,
+                  files=None):
+    """
+    并行压缩 source_dir 下的所有文件并生成 zip_path
+    cache_dir: 压缩结果缓存目录，只重新压缩内容变化的文件
+    files: 只打包指定的 [(file_path, arcname)]（默认 collect_files(source_dir)）
+
+    返回: dict 统计信息（文件数、原始大小、压缩包大小、各压缩方式数量、
+          缓存命中数、耗时）
+    """
+    start_time = time.perf_counter()
+    if files is None:
+        files = collect_files(source_dir)
+    else:
+        files = sorted(files, key=lambda item: item[1])
+
+    stats = {
+        'files': len(files),
+        'input_size': 0,
+        'archive_size': 0,
+        'methods': {name: 0 for name in METHOD_NAMES.values()},
+        'cache_hits': 0,
+        'cache_misses': 0,
+        'pack_seconds': 0.0,
+    }
+
+    if cache_dir:
+        os.makedirs(cache_dir, exist_ok=True)
+    used_keys = set()
+
+    tasks = [(file_path, arcname, level, allow_lzma, cache_dir) for file_path, arcname in files]
+    with open(zip_path, 'wb') as f:
+        assembler = ZipAssembler(f)
+        with ProcessPoolExecutor(max_workers=max_workers) as executor:
+            # map 按提交顺序返回结果，保证压缩包内容与顺序确定
+            for member in executor.map(_compress_task, tasks, chunksize=4):
+                assembler.add(member)
+                stats['input_size'] += member['file_size']
+                stats['methods'][METHOD_NAMES[member['method']]] += 1
+                if cache_dir:
+                    used_keys.add(member['cache_key'])
+                    stats['cache_hits' if member['cache_hit'] else 'cache_misses'] += 1
+        assembler.close()
+
+    if cache_dir:
+        _prune_member_cache(cache_dir, used_keys)
+
+    stats['archive_size'] = os.path.getsize(zip_path)
+    stats['pack_seconds'] = time.perf_counter() - start_time
+    return stats
+
+
+def measure_extraction(zip_path):
+    """测量客户端解压耗时（与更新助手相同，使用 zipfile.extractall）"""
+    extract_dir = tempfile.mkdtemp(prefix='Y2_extract_bench_')
+    try:
+        start_time = time.perf_counter()
+        with zipfile.ZipFile(zip_path, 'r') as zip_ref:
+            zip_ref.extractall(extract_dir)
+        return time.perf_counter() - start_time
+    finally:
+        shutil.rmtree(extract_dir, ignore_errors=True)
@@ -0,0 +1,36 @@
+# -*- coding: utf-8 -*-
+"""
+测试公共配置 - Y2订单处理辅助工具
+模块位于仓库根目录（平铺结构），测试前把根目录加入 sys.path。
+"""
+
+import os
+import sys
+import socket
+import threading
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+@pytest.fixture
+def range_server(tmp_path):
+    """
+    支持 Range 请求的本机文件服务：局域网中继直接提供缓存目录中的文件（上游不可用）
+    返回: (缓存目录, 文件地址前缀)，把文件放入缓存目录后即可通过 前缀 + 文件名 访问
+    """
+    import update_relay
+
+    # 取得一个未被监听的端口作为不可用的上游
+    probe = socket.socket()
+    probe.bind(('127.0.0.1', 0))
+    upstream = f"http://127.0.0.1:{probe.getsockname()[1]}/version.json"
+    probe.close()
+
+    cache_dir = tmp_path / 'relay_cache'
+    server = update_relay.create_server('127.0.0.1', 0, str(cache_dir), [upstream])
+    threading.Thread(target=server.serve_forever, args=(0.05,), daemon=True).start()
+    yield cache_dir, f"http://127.0.0.1:{server.server_address[1]}/files/"
+    server.shutdown()
+    server.server_close()
@@ -0,0 +1,83 @@
+# -*- coding: utf-8 -*-
+"""build_and_release：构建指纹的输入收集与排除规则"""
+
+import os
+
+import build_and_release
+
+
+def touch(root, rel_path, data=b'x'):
+    path = os.path.join(root, *rel_path.split('/'))
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'wb') as f:
+        f.write(data)
+
+
+def make_project(root):
+    for rel_path in [
+        build_and_release.SPEC_FILE,
+        'main.py',
+        'ui/window.py',
+        'assets/icon.ico',
+        'version.json',
+        'build_and_release.py',
+        'release_packer.py',
+        'build/stage/cache.py',
+        'dist/app/_internal/lib.py',
+        '.venv/Lib/site-packages/requests/__init__.py',
+        'venv/lib/site.py',
+        'env/lib/site.py',
+        'web/node_modules/pkg/package.json',
+        'tests/test_main.py',
+        'notes.txt',
+    ]:
+        touch(root, rel_path)
+    # 任意名称的虚拟环境
+    touch(root, 'py311/pyvenv.cfg')
+    touch(root, 'py311/Lib/site-packages/six.py')
+
+
+def test_collects_sources_and_skips_excluded(tmp_path):
+    make_project(str(tmp_path))
+
+    inputs = build_and_release.collect_build_inputs(str(tmp_path))
+
+    assert inputs == sorted([
+        build_and_release.SPEC_FILE,
+        'assets/icon.ico',
+        'main.py',
+        'ui/window.py',
+    ])
+
+
+def test_extra_exclude_patterns(tmp_path):
+    make_project(str(tmp_path))
+    excludes = build_and_release.BUILD_INPUT_EXCLUDES + ['ui', 'assets/*.ico']
+
+    inputs = build_and_release.collect_build_inputs(str(tmp_path), excludes)
+
+    assert inputs == [build_and_release.SPEC_FILE, 'main.py']
+
+
+def test_is_excluded_input_matches_names_and_prefixes():
+    excludes = ['node_modules', 'docs/*', '*.bak']
+
+    assert build_and_release.is_excluded_input('a/node_modules/b.json', excludes)
+    assert build_and_release.is_excluded_input('docs/index.json', excludes)
+    assert build_and_release.is_excluded_input('src/old.bak', excludes)
+    assert not build_and_release.is_excluded_input('src/docs.py', excludes)
+
+
+def test_virtualenv_changes_do_not_change_fingerprint(tmp_path, monkeypatch):
+    make_project(str(tmp_path))
+    monkeypatch.chdir(tmp_path)
+    before = build_and_release.compute_build_fingerprint()
+
+    touch(str(tmp_path), '.venv/Lib/site-packages/newpkg/__init__.py', b'new')
+    touch(str(tmp_path), 'py311/Lib/site-packages/six.py', b'changed')
+    assert build_and_release.compute_build_fingerprint()['key'] == before['key']
+
+    touch(str(tmp_path), 'ui/window.py', b'changed')
+    after = build_and_release.compute_build_fingerprint()
+    assert after['key'] != before['key']
+    assert build_and_release.describe_fingerprint_changes(before, after) == ["修改输入: ui/window.py"]
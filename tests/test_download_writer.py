@@ -0,0 +1,133 @@
+# -*- coding: utf-8 -*-
+"""download_writer：写入与哈希、块大小调整，以及连接提前关闭时的处理"""
+
+import hashlib
+import io
+import os
+import socket
+import threading
+
+import pytest
+import requests
+
+import download_writer
+import update_core
+import update_state
+from download_writer import AdaptiveChunkSize, IncompleteDownload, write_response
+
+PAYLOAD = os.urandom(300_000)
+
+
+@pytest.fixture
+def raw_server():
+    """本机 HTTP 服务：对每个连接原样发送 reply 中的响应头和正文后关闭连接"""
+    sock = socket.socket()
+    sock.bind(('127.0.0.1', 0))
+    sock.listen()
+    state = {'reply': b''}
+
+    def serve():
+        while True:
+            try:
+                conn, _ = sock.accept()
+            except OSError:
+                return
+            with conn:
+                conn.recv(65536)
+                conn.sendall(state['reply'])
+
+    threading.Thread(target=serve, daemon=True).start()
+
+    def respond(body, content_length=None):
+        length = len(body) if content_length is None else content_length
+        state['reply'] = f"HTTP/1.1 200 OK\r\nContent-Length: {length}\r\n\r\n".encode('ascii') + body
+        return f"http://127.0.0.1:{sock.getsockname()[1]}/Y2_1.9.2.zip"
+
+    yield respond
+    sock.close()
+
+
+def test_writes_file_and_hash(raw_server, tmp_path):
+    url = raw_server(PAYLOAD)
+    path = tmp_path / 'out.zip'
+    progress = []
+
+    with requests.get(url, stream=True, timeout=5) as response:
+        downloaded, digest = write_response(
+            response, str(path), len(PAYLOAD) * 2, lambda current, total: progress.append(current), 'sha256'
+        )
+
+    assert downloaded == len(PAYLOAD)
+    assert digest == hashlib.sha256(PAYLOAD).hexdigest()
+    # 预分配的多余部分被截断
+    assert path.read_bytes() == PAYLOAD
+    assert progress[-1] == len(PAYLOAD)
+
+
+def test_truncated_response_raises(raw_server, tmp_path):
+    url = raw_server(PAYLOAD[:30_000], content_length=100_000)
+
+    with requests.get(url, stream=True, timeout=5) as response:
+        with pytest.raises(Exception) as info:
+            write_response(response, str(tmp_path / 'out.zip'), 100_000)
+
+    assert '30000' in str(info.value)
+
+
+class ShortRaw:
+    """不检查 Content-Length 的底层读取（如 enforce_content_length=False 时的 urllib3）"""
+
+    def __init__(self, data):
+        self.decode_content = False
+        self._stream = io.BytesIO(data)
+
+    def readinto(self, buffer):
+        return self._stream.readinto(buffer)
+
+
+class ShortResponse:
+    def __init__(self, data, headers):
+        self.raw = ShortRaw(data)
+        self.headers = headers
+
+
+def test_length_mismatch_is_detected_without_urllib3_check(tmp_path):
+    response = ShortResponse(b'x' * 100, {'Content-Length': '250'})
+
+    with pytest.raises(IncompleteDownload):
+        write_response(response, str(tmp_path / 'out.zip'), 250)
+
+
+def test_compressed_response_skips_length_check(tmp_path):
+    # Content-Length 是压缩后的大小，与解压后写入的字节数无关
+    response = ShortResponse(b'x' * 100, {'Content-Length': '40', 'Content-Encoding': 'gzip'})
+
+    assert write_response(response, str(tmp_path / 'out.zip'))[0] == 100
+
+
+@pytest.mark.parametrize('expected_hash', ['', 'sha256:' + hashlib.sha256(PAYLOAD).hexdigest()])
+def test_truncated_download_is_recorded_as_failed(raw_server, tmp_path, monkeypatch, expected_hash):
+    store = update_state.UpdateStateStore(str(tmp_path / 'state.db'))
+    monkeypatch.setattr(update_state, '_store', store)
+    url = raw_server(PAYLOAD[:30_000], content_length=len(PAYLOAD))
+    path = tmp_path / 'Y2_1.9.2.zip'
+
+    success, error = update_core.UpdateChecker()._download_file(url, str(path), expected_hash, len(PAYLOAD))
+
+    assert not success
+    # 报告网络错误而不是校验失败
+    assert error != "文件校验失败"
+    assert not path.exists()
+    assert store.get_download(url)['status'] == 'failed'
+    assert store.get_completed_downloads() == []
+    store.close()
+
+
+def test_adaptive_chunk_size():
+    chunker = AdaptiveChunkSize(minimum=64, maximum=1024, target_seconds=1)
+
+    assert chunker.update(64, 0) == 128
+    assert chunker.update(100, 1) == 128
+    assert chunker.update(10_000, 1) == 1024
+    assert chunker.update(1, 1) == 64
+    assert chunker.update(0, 1) == 64
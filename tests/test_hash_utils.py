@@ -0,0 +1,190 @@
+# -*- coding: utf-8 -*-
+"""hash_utils：三种读取方式的一致性、哈希字符串解析和哈希缓存失效"""
+
+import hashlib
+import os
+
+import pytest
+
+import hash_utils
+from hash_utils import HashCache, file_digest, hash_matches, parse_hash
+
+DATA = os.urandom(300_000)
+
+
+@pytest.fixture
+def data_file(tmp_path):
+    path = tmp_path / 'data.bin'
+    path.write_bytes(DATA)
+    return path
+
+
+# ---------- file_digest ----------
+
+@pytest.mark.parametrize('algorithm', ['sha256', 'md5'])
+def test_read_paths_agree(data_file, monkeypatch, algorithm):
+    expected = hashlib.new(algorithm, DATA).hexdigest()
+
+    # 默认：hashlib.file_digest
+    assert file_digest(str(data_file), algorithm) == expected
+
+    # mmap：降低阈值
+    with monkeypatch.context() as m:
+        m.setattr(hash_utils, 'MMAP_THRESHOLD', 1024)
+        assert file_digest(str(data_file), algorithm) == expected
+
+    # readinto：没有 hashlib.file_digest 的 Python 版本，缓冲区小于文件
+    with monkeypatch.context() as m:
+        m.delattr(hashlib, 'file_digest', raising=False)
+        m.setattr(hash_utils, 'BUFFER_SIZE', 64 * 1024)
+        assert file_digest(str(data_file), algorithm) == expected
+
+
+def test_empty_file(tmp_path, monkeypatch):
+    path = tmp_path / 'empty.bin'
+    path.write_bytes(b'')
+    expected = hashlib.sha256(b'').hexdigest()
+
+    assert file_digest(str(path)) == expected
+    monkeypatch.delattr(hashlib, 'file_digest', raising=False)
+    assert file_digest(str(path)) == expected
+
+
+# ---------- 哈希字符串 ----------
+
+@pytest.mark.parametrize('value, expected', [
+    ('sha256:abc123', ('sha256', 'abc123')),
+    # PowerShell Get-FileHash 输出大写
+    ('SHA256:ABC123', ('sha256', 'abc123')),
+    ('ABC123', ('sha256', 'abc123')),
+    ('  md5 : ABC123  ', ('md5', 'abc123')),
+    (':abc123', ('sha256', 'abc123')),
+    ('', ('sha256', '')),
+    (None, ('sha256', '')),
+])
+def test_parse_hash(value, expected):
+    assert parse_hash(value) == expected
+
+
+def test_format_and_parse_round_trip():
+    assert parse_hash(hash_utils.format_hash('abc', 'md5')) == ('md5', 'abc')
+
+
+def test_hash_matches(data_file):
+    digest = hashlib.sha256(DATA).hexdigest()
+
+    assert hash_matches('sha256:' + digest, str(data_file))
+    assert hash_matches(digest.upper(), str(data_file))
+    assert hash_matches('SHA256:' + digest.upper(), str(data_file))
+    assert not hash_matches('sha256:' + '0' * 64, str(data_file))
+    assert not hash_matches('', str(data_file))
+    assert not hash_matches(None, str(data_file))
+    assert not hash_matches('sha256:', str(data_file))
+
+
+# ---------- HashCache ----------
+
+def cached(cache, path):
+    return cache.get(str(path))
+
+
+def test_cache_hit(data_file):
+    cache = HashCache()
+    cache.put(str(data_file), 'digest')
+
+    assert cached(cache, data_file) == 'digest'
+    assert cache.get(str(data_file), 'md5') is None
+
+
+def test_cache_invalidated_by_size(data_file):
+    cache = HashCache()
+    cache.put(str(data_file), 'digest')
+    st = data_file.stat()
+
+    data_file.write_bytes(DATA + b'x')
+    os.utime(data_file, ns=(st.st_atime_ns, st.st_mtime_ns))
+
+    assert cached(cache, data_file) is None
+
+
+def test_cache_invalidated_by_mtime(data_file):
+    cache = HashCache()
+    cache.put(str(data_file), 'digest')
+    st = data_file.stat()
+
+    os.utime(data_file, ns=(st.st_atime_ns, st.st_mtime_ns + 1))
+
+    assert cached(cache, data_file) is None
+
+
+def test_cache_invalidated_by_inode(data_file, tmp_path):
+    cache = HashCache()
+    cache.put(str(data_file), 'digest')
+    st = data_file.stat()
+
+    # 大小和修改时间相同的另一个文件替换原文件（如更新助手替换）
+    replacement = tmp_path / 'replacement.bin'
+    replacement.write_bytes(DATA)
+    os.utime(replacement, ns=(st.st_atime_ns, st.st_mtime_ns))
+    os.replace(replacement, data_file)
+    assert data_file.stat().st_ino != st.st_ino
+
+    assert cached(cache, data_file) is None
+
+
+def test_cache_missing_file(tmp_path):
+    cache = HashCache()
+    path = tmp_path / 'gone.bin'
+    path.write_bytes(b'x')
+    cache.put(str(path), 'digest')
+    path.unlink()
+
+    assert cached(cache, path) is None
+
+
+def test_cache_save_and_reload(data_file, tmp_path):
+    cache_path = tmp_path / 'cache' / 'hash_cache.json'
+    cache = HashCache(str(cache_path))
+    # 没有变化时不写文件
+    cache.save()
+    assert not cache_path.exists()
+
+    digest = hash_utils.cached_file_digest(str(data_file), cache=cache)
+    cache.save()
+
+    reloaded = HashCache(str(cache_path))
+    assert cached(reloaded, data_file) == digest == hashlib.sha256(DATA).hexdigest()
+    assert not (tmp_path / 'cache' / 'hash_cache.json.tmp').exists()
+
+
+def test_cache_ignores_corrupt_file(data_file, tmp_path):
+    cache_path = tmp_path / 'hash_cache.json'
+    cache_path.write_text('{broken', encoding='utf-8')
+
+    cache = HashCache(str(cache_path))
+
+    assert cached(cache, data_file) is None
+
+
+def test_cached_digest_skips_unchanged_files(data_file, monkeypatch):
+    cache = HashCache()
+    hash_utils.cached_file_digest(str(data_file), cache=cache)
+    monkeypatch.setattr(hash_utils, 'file_digest', lambda *args: pytest.fail("应使用缓存"))
+
+    assert hash_utils.cached_file_digest(str(data_file), cache=cache) == hashlib.sha256(DATA).hexdigest()
+
+
+def test_hash_files_parallel_matches_serial(tmp_path):
+    paths = []
+    for i in range(20):
+        path = tmp_path / f"file{i}.bin"
+        path.write_bytes(os.urandom(1000 + i))
+        paths.append(str(path))
+    cache = HashCache()
+
+    parallel = hash_utils.hash_files(paths, max_workers=8, cache=cache)
+    serial = hash_utils.hash_files(paths, max_workers=1)
+
+    assert parallel == serial == {path: file_digest(path) for path in paths}
+    assert all(cache.get(path) for path in paths)
+    assert hash_utils.hash_files([]) == {}
@@ -0,0 +1,270 @@
+# -*- coding: utf-8 -*-
+"""install_verify：按清单校验安装目录、从本地或远程完整包修复单个文件"""
+
+import hashlib
+import io
+import os
+import zipfile
+
+import pytest
+
+import hash_utils
+import install_verify
+import update_state
+import updater
+from install_verify import HttpRangeFile, create_manifest, repair_install, verify_install
+
+FILES = {
+    'Y2订单处理辅助工具.exe': b'exe' * 1000,
+    '_internal/base_library.zip': os.urandom(20_000),
+    '_internal/pandas/core.pyd': os.urandom(5_000),
+    '_internal/readme.txt': b'hello',
+}
+
+
+def make_install(install_dir, components=None):
+    """生成安装目录和文件清单，返回清单"""
+    for rel_path, data in FILES.items():
+        path = install_dir / rel_path
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_bytes(data)
+    create_manifest(str(install_dir), '1.9.2', components=components)
+    return install_verify.load_manifest(str(install_dir))
+
+
+def make_package(zip_path, wrapper='Y2订单处理辅助工具/'):
+    """与安装目录内容相同的完整包（默认带外层目录）"""
+    with zipfile.ZipFile(zip_path, 'w', zipfile.ZIP_DEFLATED) as zf:
+        for rel_path, data in FILES.items():
+            zf.writestr(wrapper + rel_path, data)
+    return str(zip_path)
+
+
+@pytest.fixture(autouse=True)
+def store(tmp_path, monkeypatch):
+    """查找本地已下载更新包时使用临时的状态存储"""
+    store = update_state.UpdateStateStore(str(tmp_path / 'state.db'))
+    monkeypatch.setattr(update_state, '_store', store)
+    yield store
+    store.close()
+
+
+@pytest.fixture
+def install(tmp_path):
+    install_dir = tmp_path / 'install'
+    make_install(install_dir)
+    return install_dir
+
+
+def issues(result):
+    return result['missing'], result['mismatched'], result['stale']
+
+
+# ---------- 校验 ----------
+
+def test_clean_install(install):
+    result = verify_install(str(install))
+
+    assert issues(result) == ([], [], [])
+    assert result['version'] == '1.9.2'
+    assert result['files'] == len(FILES)
+    assert result['hashed'] == len(FILES)
+    assert result['hashed_size'] == sum(len(data) for data in FILES.values())
+
+
+def test_detects_problems(install):
+    (install / '_internal' / 'readme.txt').write_bytes(b'hello, world')   # 大小不符
+    (install / '_internal' / 'pandas' / 'core.pyd').write_bytes(os.urandom(5_000))   # 大小相同，哈希不符
+    (install / '_internal' / 'base_library.zip').unlink()
+    (install / 'Y2订单处理辅助工具.exe.old').write_bytes(b'old')
+
+    result = verify_install(str(install))
+
+    assert result['missing'] == ['_internal/base_library.zip']
+    assert result['mismatched'] == ['_internal/pandas/core.pyd', '_internal/readme.txt']
+    assert result['stale'] == ['Y2订单处理辅助工具.exe.old']
+    # 大小不符的文件不计算哈希
+    assert result['hashed'] == 2
+
+
+def test_cache_hits_and_rehash(install, tmp_path):
+    cache_path = str(tmp_path / 'hash_cache.json')
+
+    first = verify_install(str(install), cache=hash_utils.HashCache(cache_path))
+    second = verify_install(str(install), cache=hash_utils.HashCache(cache_path))
+    # 内容改变但大小不变：指纹（修改时间）变化，只重新计算这一个文件
+    path = install / '_internal' / 'pandas' / 'core.pyd'
+    path.write_bytes(os.urandom(5_000))
+    os.utime(path, ns=(path.stat().st_atime_ns, path.stat().st_mtime_ns + 10 ** 9))
+    third = verify_install(str(install), cache=hash_utils.HashCache(cache_path))
+
+    assert (first['hashed'], first['cached']) == (len(FILES), 0)
+    assert (second['hashed'], second['cached']) == (0, len(FILES))
+    assert second['hashed_size'] == 0
+    assert (third['hashed'], third['cached']) == (1, len(FILES) - 1)
+    assert third['mismatched'] == ['_internal/pandas/core.pyd']
+
+
+def test_components_not_installed_are_skipped(tmp_path):
+    install_dir = tmp_path / 'install'
+    make_install(install_dir, components={'_internal/pandas/core.pyd': 'excel'})
+    (install_dir / '_internal' / 'pandas' / 'core.pyd').unlink()
+
+    assert verify_install(str(install_dir), installed_components=set())['missing'] == []
+    assert verify_install(str(install_dir), installed_components={'excel'})['missing'] == [
+        '_internal/pandas/core.pyd'
+    ]
+    assert verify_install(str(install_dir))['missing'] == ['_internal/pandas/core.pyd']
+
+
+def test_paths_outside_install_are_ignored(install, tmp_path):
+    manifest = install_verify.load_manifest(str(install))
+    manifest['files']['../outside.txt'] = {'size': 1, 'hash': 'sha256:' + '0' * 64}
+
+    result = verify_install(str(install), manifest=manifest)
+
+    assert issues(result) == ([], [], [])
+
+
+def test_missing_manifest(tmp_path):
+    with pytest.raises(FileNotFoundError):
+        verify_install(str(tmp_path))
+
+
+# ---------- 压缩包成员与外层目录 ----------
+
+def updater_layout(zip_path, tmp_path, monkeypatch):
+    """更新助手实际安装的相对路径集合"""
+    monkeypatch.setattr(updater, '_log_writer', updater.BufferedLogWriter(str(tmp_path / 'updater.log')))
+    monkeypatch.setattr(updater.tempfile, 'tempdir', str(tmp_path))
+    extract_dir, root_dirs = updater.extract_update(zip_path, str(tmp_path / 'target'))
+    source_dir = os.path.join(extract_dir, next(iter(root_dirs))) if len(root_dirs) == 1 else extract_dir
+    return {
+        os.path.relpath(os.path.join(root, name), source_dir).replace(os.sep, '/')
+        for root, _, files in os.walk(source_dir) for name in files
+    }
+
+
+@pytest.mark.parametrize('entries', [
+    ['Y2/Y2.exe', 'Y2/_internal/a.pyd'],
+    ['Y2/', 'Y2/Y2.exe', 'Y2/_internal/', 'Y2/_internal/a.pyd'],
+    ['Y2.exe', '_internal/a.pyd'],
+    ['_internal/a.pyd', '_internal/b.pyd'],
+    ['Y2/Y2.exe', 'docs/'],
+    ['_internal/a.pyd', 'docs/b.txt'],
+    ['Y2.exe'],
+])
+def test_member_names_match_updater(tmp_path, monkeypatch, entries):
+    zip_path = tmp_path / 'package.zip'
+    with zipfile.ZipFile(zip_path, 'w') as zf:
+        for name in entries:
+            zf.writestr(name, '' if name.endswith('/') else name)
+
+    with zipfile.ZipFile(zip_path) as zf:
+        members = install_verify._member_names(zf)
+
+    assert set(members) == updater_layout(str(zip_path), tmp_path, monkeypatch)
+    for rel_path, name in members.items():
+        assert name.endswith(rel_path)
+
+
+# ---------- 修复 ----------
+
+def test_restore_member_rejects_hash_mismatch(tmp_path):
+    zip_path = make_package(tmp_path / 'package.zip', wrapper='')
+    dst = tmp_path / 'install' / '_internal' / 'readme.txt'
+    dst.parent.mkdir(parents=True)
+    dst.write_bytes(b'current')
+
+    with zipfile.ZipFile(zip_path) as zf:
+        with pytest.raises(ValueError):
+            install_verify.restore_member(zf, '_internal/readme.txt', str(dst), 'sha256:' + '0' * 64)
+        # 原文件不变，也没有留下 .repair 临时文件
+        assert dst.read_bytes() == b'current'
+        assert os.listdir(dst.parent) == ['readme.txt']
+
+        install_verify.restore_member(
+            zf, '_internal/readme.txt', str(dst), 'sha256:' + hashlib.sha256(b'hello').hexdigest()
+        )
+        assert dst.read_bytes() == b'hello'
+        assert os.listdir(dst.parent) == ['readme.txt']
+
+
+def damage(install_dir):
+    (install_dir / '_internal' / 'base_library.zip').unlink()
+    (install_dir / '_internal' / 'readme.txt').write_bytes(b'broken')
+    (install_dir / 'Y2订单处理辅助工具.exe.old').write_bytes(b'old')
+
+
+def test_repair_from_local_package(install, tmp_path):
+    damage(install)
+    package = make_package(tmp_path / 'Y2_1.9.2.zip')
+
+    result = repair_install(str(install), verify_install(str(install)), package_path=package)
+
+    assert result['repaired'] == ['_internal/base_library.zip', '_internal/readme.txt']
+    assert result['removed'] == ['Y2订单处理辅助工具.exe.old']
+    assert result['failed'] == {}
+    assert result['sources'] == [package]
+    assert issues(verify_install(str(install))) == ([], [], [])
+
+
+def test_repair_finds_downloaded_package(install, tmp_path, store):
+    package = make_package(tmp_path / 'Y2_1.9.2.zip')
+    store.record_download('https://example.com/Y2_1.9.2.zip', package, 'completed', version='1.9.2')
+    damage(install)
+
+    result = repair_install(str(install), verify_install(str(install)))
+
+    assert result['sources'] == [package]
+    assert result['failed'] == {}
+
+
+def test_repair_without_source(install):
+    damage(install)
+
+    result = repair_install(str(install), verify_install(str(install)), package_path=None)
+
+    assert result['repaired'] == []
+    assert set(result['failed']) == {'_internal/base_library.zip', '_internal/readme.txt'}
+
+
+def test_http_range_file(range_server):
+    cache_dir, base_url = range_server
+    cache_dir.mkdir(exist_ok=True)
+    data = os.urandom(100_000)
+    (cache_dir / 'blob.bin').write_bytes(data)
+
+    remote = HttpRangeFile(base_url + 'blob.bin')
+
+    assert remote.size == len(data)
+    assert remote.seek(-10, io.SEEK_END) == len(data) - 10
+    assert remote.read(100) == data[-10:]
+    assert remote.read(10) == b''
+    remote.seek(1000)
+    assert remote.read(500) == data[1000:1500]
+    assert remote.tell() == 1500
+    assert remote.requests == 2
+    with pytest.raises(ValueError):
+        remote.seek(-1)
+
+
+def test_repair_from_remote_package(install, tmp_path, range_server):
+    cache_dir, base_url = range_server
+    cache_dir.mkdir(exist_ok=True)
+    make_package(cache_dir / 'Y2_1.9.2.zip')
+    version_info = {
+        'version': '1.9.2',
+        'releases': [{'version': '1.9.2', 'artifacts': [
+            {'type': 'full', 'url': base_url + 'Y2_1.9.2.zip', 'size': 0},
+        ]}],
+    }
+    damage(install)
+
+    result = repair_install(str(install), verify_install(str(install)),
+                            version_info=version_info, package_path=None)
+
+    assert result['repaired'] == ['_internal/base_library.zip', '_internal/readme.txt']
+    assert result['failed'] == {}
+    assert len(result['sources']) == 1
+    assert issues(verify_install(str(install))) == ([], [], [])
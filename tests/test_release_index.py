@@ -0,0 +1,127 @@
+# -*- coding: utf-8 -*-
+"""release_index：版本号比较与更新路径规划"""
+
+import pytest
+
+import release_index
+
+
+def full(version, size):
+    return {'type': 'full', 'url': f'https://example.com/full-{version}.zip', 'size': size}
+
+
+def delta(from_version, to_version, size):
+    return {
+        'type': 'delta', 'from': from_version,
+        'url': f'https://example.com/delta-{from_version}-{to_version}.zip', 'size': size,
+    }
+
+
+def make_index():
+    """1.9.0 -> 1.9.1 -> 1.9.2 的增量链，以及各版本完整包"""
+    return {
+        'version': '1.9.2',
+        'releases': [
+            {'version': '1.9.1', 'artifacts': [full('1.9.1', 100), delta('1.9.0', '1.9.1', 10)]},
+            {'version': '1.9.2', 'artifacts': [
+                full('1.9.2', 100), delta('1.9.1', '1.9.2', 15), delta('1.9.0', '1.9.2', 40),
+            ]},
+        ],
+    }
+
+
+def urls(plan):
+    return [step['url'] for step in plan]
+
+
+@pytest.mark.parametrize('older, newer', [
+    ('1.9.0', '1.9.1'),
+    ('1.9.1-dev', '1.9.1a1'),
+    ('1.9.1a1', '1.9.1-beta.2'),
+    ('1.9.1-beta.2', '1.9.1-beta.10'),
+    ('1.9.1-beta.10', '1.9.1rc1'),
+    ('1.9.1rc1', '1.9.1'),
+    ('1.9.1', '1.10.0'),
+])
+def test_version_ordering(older, newer):
+    assert release_index.compare_versions(older, newer) == -1
+    assert release_index.compare_versions(newer, older) == 1
+
+
+def test_equivalent_versions():
+    assert release_index.compare_versions('v1.9', '1.9.0') == 0
+    assert release_index.compare_versions('1.9.1-RC.1', '1.9.1rc1') == 0
+
+
+def test_invalid_version_raises():
+    with pytest.raises(ValueError):
+        release_index.parse_version('latest')
+
+
+def test_delta_chain_is_cheapest():
+    plan = release_index.plan_update_path(make_index(), '1.9.0')
+
+    assert urls(plan) == [
+        'https://example.com/delta-1.9.0-1.9.1.zip',
+        'https://example.com/delta-1.9.1-1.9.2.zip',
+    ]
+    assert [step['to'] for step in plan] == ['1.9.1', '1.9.2']
+
+
+def test_replans_after_link_is_excluded():
+    index = make_index()
+    first = release_index.plan_update_path(index, '1.9.0')
+
+    # 链中第一环下载失败：改用直接从 1.9.0 到 1.9.2 的增量包
+    second = release_index.plan_update_path(index, '1.9.0', exclude={first[0]['url']})
+    assert urls(second) == ['https://example.com/delta-1.9.0-1.9.2.zip']
+
+    # 再排除它：从 1.9.0 已没有增量路径，回退到完整包
+    third = release_index.plan_update_path(index, '1.9.0', exclude={first[0]['url'], second[0]['url']})
+    assert urls(third) == ['https://example.com/full-1.9.2.zip']
+
+
+def test_full_package_when_no_delta_from_current():
+    plan = release_index.plan_update_path(make_index(), '1.8.0')
+
+    assert urls(plan) == ['https://example.com/full-1.9.2.zip']
+
+
+def test_full_package_when_cheaper_than_chain():
+    index = make_index()
+    index['releases'][1]['artifacts'][0]['size'] = 20
+    plan = release_index.plan_update_path(index, '1.9.0')
+
+    assert urls(plan) == ['https://example.com/full-1.9.2.zip']
+
+
+def test_prerelease_current_version():
+    index = {
+        'releases': [
+            {'version': '1.9.1rc1', 'artifacts': [full('1.9.1rc1', 100)]},
+            {'version': '1.9.1', 'artifacts': [full('1.9.1', 100), delta('1.9.1rc1', '1.9.1', 5)]},
+        ],
+    }
+
+    assert release_index.get_latest_version(index) == '1.9.1'
+    assert urls(release_index.plan_update_path(index, '1.9.1-rc.1')) == [
+        'https://example.com/delta-1.9.1rc1-1.9.1.zip'
+    ]
+
+
+def test_up_to_date_and_no_path():
+    index = make_index()
+
+    assert release_index.plan_update_path(index, '1.9.2') == []
+    assert release_index.plan_update_path(index, '2.0.0') == []
+    all_urls = {artifact['url'] for release in index['releases'] for artifact in release['artifacts']}
+    assert release_index.plan_update_path(index, '1.9.0', exclude=all_urls) is None
+
+
+def test_legacy_index_without_releases():
+    index = {'version': '1.9.2', 'download_url': 'https://example.com/old.zip', 'file_size': 7, 'hash': ''}
+
+    plan = release_index.plan_update_path(index, '1.9.0')
+
+    assert urls(plan) == ['https://example.com/old.zip']
+    assert plan[0]['size'] == 7
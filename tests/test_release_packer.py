@@ -0,0 +1,111 @@
+# -*- coding: utf-8 -*-
+"""release_packer：ZipAssembler 输出格式、确定性和 ZIP64 限制"""
+
+import io
+import os
+import zipfile
+
+import pytest
+
+import release_packer
+
+
+def make_source(root):
+    """生成包含各类文件的构建输出目录"""
+    files = {
+        'main.exe': os.urandom(64 * 1024),                               # 不可压缩 -> STORE
+        '_internal/base_library.txt': b'import os\n' * 5000,             # 可压缩 -> DEFLATE
+        '_internal/data/big.log': b'2026-10-19 INFO ok\n' * 120000,      # 大且可压缩 -> 可能 LZMA
+        '模板/订单.txt': '中文内容\n'.encode('utf-8') * 100,               # 非 ASCII 文件名
+        'empty.dat': b'',
+    }
+    for rel_path, data in files.items():
+        path = os.path.join(root, *rel_path.split('/'))
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, 'wb') as f:
+            f.write(data)
+        # 固定修改时间，保证两次打包输入完全一致
+        os.utime(path, (1_700_000_000, 1_700_000_000))
+    return files
+
+
+def test_package_is_readable_by_zipfile(tmp_path):
+    source = tmp_path / 'dist'
+    files = make_source(str(source))
+    zip_path = tmp_path / 'release.zip'
+
+    stats = release_packer.build_package(str(source), str(zip_path), max_workers=2)
+
+    assert stats['files'] == len(files)
+    with zipfile.ZipFile(zip_path) as zf:
+        assert zf.testzip() is None
+        assert sorted(zf.namelist()) == sorted(files)
+        for name, data in files.items():
+            assert zf.read(name) == data
+        methods = {info.filename: info.compress_type for info in zf.infolist()}
+    assert methods['main.exe'] == zipfile.ZIP_STORED
+    assert methods['_internal/base_library.txt'] in (zipfile.ZIP_DEFLATED, zipfile.ZIP_LZMA)
+
+
+def test_package_bytes_are_deterministic(tmp_path):
+    source = tmp_path / 'dist'
+    make_source(str(source))
+    first = tmp_path / 'first.zip'
+    second = tmp_path / 'second.zip'
+
+    release_packer.build_package(str(source), str(first), max_workers=1)
+    release_packer.build_package(str(source), str(second), max_workers=3)
+
+    assert first.read_bytes() == second.read_bytes()
+
+
+def test_cached_members_produce_identical_package(tmp_path):
+    source = tmp_path / 'dist'
+    make_source(str(source))
+    cache_dir = tmp_path / 'cache'
+    first = tmp_path / 'first.zip'
+    second = tmp_path / 'second.zip'
+
+    release_packer.build_package(str(source), str(first), max_workers=2, cache_dir=str(cache_dir))
+    stats = release_packer.build_package(str(source), str(second), max_workers=2, cache_dir=str(cache_dir))
+
+    assert stats['cache_misses'] == 0
+    assert first.read_bytes() == second.read_bytes()
+
+
+def member(file_size=0, data=b''):
+    return {
+        'arcname': 'big.bin',
+        'method': zipfile.ZIP_STORED,
+        'crc': 0,
+        'file_size': file_size,
+        'data': data,
+        'mtime': 1_700_000_000,
+        'mode': 0o100644,
+    }
+
+
+def test_member_past_zip32_limit_raises():
+    assembler = release_packer.ZipAssembler(io.BytesIO())
+    with pytest.raises(ValueError):
+        assembler.add(member(file_size=release_packer._ZIP32_LIMIT))
+
+
+class FarFile(io.BytesIO):
+    """tell() 报告超过 4 GB 的偏移，不实际写入那么多数据"""
+
+    def tell(self):
+        return release_packer._ZIP32_LIMIT + super().tell()
+
+
+def test_offset_past_zip32_limit_raises():
+    assembler = release_packer.ZipAssembler(FarFile())
+    with pytest.raises(ValueError):
+        assembler.add(member())
+
+
+def test_too_many_members_raises():
+    assembler = release_packer.ZipAssembler(io.BytesIO())
+    assembler.entries = [None] * release_packer._ZIP32_COUNT_LIMIT
+    with pytest.raises(ValueError):
+        assembler.close()
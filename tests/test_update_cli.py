@@ -0,0 +1,293 @@
+# -*- coding: utf-8 -*-
+"""update_cli：退出码约定、标准输出只有 JSON、apply 选择的更新包、status 不导入 tkinter"""
+
+import hashlib
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+import pytest
+
+import install_verify
+import update_cli
+import update_core
+import update_state
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+PACKAGE = os.urandom(50_000)
+NEWER = '9.0.0'
+
+
+@pytest.fixture
+def origin():
+    """本机更新源：routes 为 {路径: bytes 或可 JSON 序列化的对象}"""
+    routes = {}
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            body = routes.get(self.path)
+            if body is None:
+                self.send_error(404)
+                return
+            if not isinstance(body, bytes):
+                body = json.dumps(body).encode('utf-8')
+            self.send_response(200)
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+    threading.Thread(target=server.serve_forever, args=(0.05,), daemon=True).start()
+    base = f"http://127.0.0.1:{server.server_address[1]}"
+    yield base, routes
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture
+def cli(tmp_path, monkeypatch, origin):
+    """状态存储、下载目录、哈希缓存在 tmp_path 中，更新源为本机服务；返回运行命令的函数"""
+    store = update_state.UpdateStateStore(str(tmp_path / 'state.db'))
+    monkeypatch.setattr(update_state, '_store', store)
+    monkeypatch.setattr(install_verify, 'HASH_CACHE_PATH', str(tmp_path / 'hash_cache.json'))
+    monkeypatch.setattr(tempfile, 'tempdir', str(tmp_path))
+    monkeypatch.delenv(update_core.RELAY_ENV, raising=False)
+    base, routes = origin
+    monkeypatch.setattr(update_core, 'VERSION_CHECK_URL', base + '/version.json')
+    monkeypatch.setattr(update_core, 'BACKUP_CHECK_URL', base + '/backup.json')
+
+    def run(capsys, *argv):
+        code = update_cli.main(list(argv))
+        captured = capsys.readouterr()
+        run.stderr = captured.err
+        # 标准输出只有一个 JSON 对象
+        return code, json.loads(captured.out)
+
+    run.store = store
+    run.base = base
+    run.routes = routes
+    yield run
+    store.close()
+
+
+def publish(cli, version=NEWER, package_hash=None, **extra):
+    cli.routes['/Y2.zip'] = PACKAGE
+    cli.routes['/version.json'] = dict({
+        'version': version,
+        'download_url': cli.base + '/Y2.zip',
+        'file_size': len(PACKAGE),
+        'hash': package_hash or 'sha256:' + hashlib.sha256(PACKAGE).hexdigest(),
+        'changelog': ['修复问题'],
+    }, **extra)
+
+
+# ---------- 退出码 ----------
+
+def test_exit_codes_are_stable():
+    assert (update_cli.EXIT_OK, update_cli.EXIT_ERROR, update_cli.EXIT_USAGE, update_cli.EXIT_CHECK_FAILED,
+            update_cli.EXIT_VERIFY_FAILED, update_cli.EXIT_UPDATE_AVAILABLE) == (0, 1, 2, 3, 4, 10)
+
+
+def test_check_up_to_date(cli, capsys):
+    publish(cli, version=update_core.CURRENT_VERSION)
+
+    code, result = cli(capsys, 'check')
+
+    assert code == 0
+    assert result['update_available'] is False
+    assert 'elapsed_seconds' in result
+
+
+def test_check_update_available(cli, capsys):
+    publish(cli)
+
+    code, result = cli(capsys, 'check')
+
+    assert code == 10
+    assert result['latest_version'] == NEWER
+    assert result['download_size'] == len(PACKAGE)
+    assert result['changelog'] == ['修复问题']
+
+
+def test_check_rollout_deferred(cli, capsys):
+    publish(cli, rollout={'percentage': 0})
+
+    code, result = cli(capsys, 'check')
+
+    assert code == 0
+    assert result['rollout_deferred'] is True
+
+
+def test_check_failed(cli, capsys):
+    code, result = cli(capsys, 'check')
+
+    assert code == 3
+    assert result['error']
+
+
+def test_usage_error(cli, capsys):
+    with pytest.raises(SystemExit) as info:
+        update_cli.main(['status', '--limit', 'many'])
+    assert info.value.code == 2
+    assert capsys.readouterr().out == ''
+
+
+def test_unknown_component_is_usage_error(cli, capsys, tmp_path):
+    code, result = cli(capsys, 'components', '--install', 'fonts', '--install-dir', str(tmp_path))
+
+    assert code == 2
+    assert 'fonts' in result['error']
+
+
+def test_download(cli, capsys):
+    publish(cli)
+
+    code, result = cli(capsys, 'download', '--progress')
+
+    assert code == 0
+    with open(result['package_path'], 'rb') as f:
+        assert f.read() == PACKAGE
+    # 进度只输出到标准错误
+    assert '下载中' in cli.stderr
+
+
+def test_download_hash_mismatch(cli, capsys):
+    publish(cli, package_hash='sha256:' + '0' * 64)
+
+    code, result = cli(capsys, 'download')
+
+    assert code == 1
+    assert result['error'] == "文件校验失败"
+
+
+def test_unexpected_exception_is_reported_as_json(cli, capsys, monkeypatch):
+    def fail(args):
+        raise RuntimeError("出错了")
+
+    monkeypatch.setitem(update_cli.COMMANDS, 'status', fail)
+
+    code, result = cli(capsys, 'status')
+
+    assert code == 1
+    assert result == {'command': 'status', 'error': "出错了"}
+
+
+# ---------- verify ----------
+
+def make_install(install_dir):
+    install_dir.mkdir()
+    (install_dir / 'Y2.exe').write_bytes(b'exe')
+    install_verify.create_manifest(str(install_dir), update_core.CURRENT_VERSION)
+
+
+def test_verify_exit_codes(cli, capsys, tmp_path):
+    install_dir = tmp_path / 'install'
+
+    install_dir.mkdir()
+    code, result = cli(capsys, 'verify', '--install-dir', str(install_dir))
+    assert code == 1 and 'error' in result
+    install_dir.rmdir()
+
+    make_install(install_dir)
+    code, result = cli(capsys, 'verify', '--install-dir', str(install_dir))
+    assert code == 0 and result['healthy'] is True
+
+    (install_dir / 'Y2.exe').write_bytes(b'EXE')
+    code, result = cli(capsys, 'verify', '--install-dir', str(install_dir), '--full')
+    assert code == 4
+    assert result['mismatched'] == ['Y2.exe']
+
+
+# ---------- apply ----------
+
+def record(store, tmp_path, name, version, data=PACKAGE, recorded_hash=None, kind='update'):
+    path = tmp_path / name
+    path.write_bytes(data)
+    store.record_download(
+        f"https://example.com/{name}", str(path), 'completed', version=version,
+        expected_hash=recorded_hash or 'sha256:' + hashlib.sha256(data).hexdigest(), kind=kind
+    )
+    return str(path)
+
+
+def test_latest_downloaded_package_skips_unusable(cli, tmp_path):
+    store = cli.store
+    good = record(store, tmp_path, 'good.zip', NEWER)
+    record(store, tmp_path, 'older.zip', '1.0.0')
+    record(store, tmp_path, 'current.zip', update_core.CURRENT_VERSION)
+    record(store, tmp_path, 'component.zip', NEWER, kind='component')
+    os.remove(record(store, tmp_path, 'missing.zip', NEWER))
+    tampered = record(store, tmp_path, 'tampered.zip', NEWER, recorded_hash='sha256:' + '0' * 64)
+
+    assert update_cli._latest_downloaded_package() == (good, NEWER)
+    # 只查看状态时不校验哈希，返回最近一次的记录
+    assert update_cli._latest_downloaded_package(verify=False) == (tampered, NEWER)
+
+
+class FakeProcess:
+    pid = 4321
+
+    def __init__(self, exit_code=0):
+        self.exit_code = exit_code
+
+    def wait(self):
+        return self.exit_code
+
+
+def test_apply(cli, capsys, tmp_path, monkeypatch):
+    launched = []
+    monkeypatch.setattr(update_cli, 'launch_updater',
+                        lambda path, restart: launched.append((path, restart)) or FakeProcess(1))
+
+    code, result = cli(capsys, 'apply')
+    assert code == 1
+    assert launched == []
+
+    package = record(cli.store, tmp_path, 'good.zip', NEWER)
+    code, result = cli(capsys, 'apply')
+    assert code == 0
+    assert result['updater_pid'] == 4321
+    assert launched == [(package, False)]
+    assert cli.store.get_history()[0]['to_version'] == NEWER
+
+    code, result = cli(capsys, 'apply', '--wait')
+    assert code == 1
+    assert result['updater_exit_code'] == 1
+
+
+# ---------- status ----------
+
+def test_status(cli, capsys, tmp_path):
+    package = record(cli.store, tmp_path, 'good.zip', NEWER)
+
+    code, result = cli(capsys, 'status')
+
+    assert code == 0
+    assert result['downloaded_package'] == {'path': package, 'version': NEWER}
+
+
+def test_status_does_not_import_tkinter(tmp_path):
+    env = dict(os.environ, HOME=str(tmp_path), USERPROFILE=str(tmp_path))
+    env.pop(update_core.RELAY_ENV, None)
+    code = (
+        "import sys\n"
+        "from update_cli import main\n"
+        "code = main(['status'])\n"
+        "assert 'tkinter' not in sys.modules, 'tkinter imported'\n"
+        "sys.exit(code)\n"
+    )
+
+    process = subprocess.run([sys.executable, '-c', code], cwd=REPO_ROOT, env=env,
+                             capture_output=True, text=True, encoding='utf-8', timeout=60)
+
+    assert process.returncode == 0, process.stderr
+    assert json.loads(process.stdout)['current_version'] == update_core.CURRENT_VERSION
+    # 状态存储建在临时 HOME 中
+    assert os.path.exists(os.path.join(str(tmp_path), '.Y2订单处理辅助工具', 'update_state.db'))
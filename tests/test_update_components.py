@@ -0,0 +1,233 @@
+# -*- coding: utf-8 -*-
+"""update_components：组件记录、组件包安装（缺少成员、哈希不符）和 ensure_component 的后台解析"""
+
+import hashlib
+import json
+import tempfile
+import threading
+import zipfile
+
+import pytest
+
+import install_verify
+import update_components
+import update_state
+from update_components import ensure_component, install_component
+
+EXCEL_FILES = {
+    '_internal/pandas/core.pyd': b'pandas' * 500,
+    '_internal/numpy/core.pyd': b'numpy' * 700,
+}
+
+
+@pytest.fixture(autouse=True)
+def isolated(tmp_path, monkeypatch):
+    """状态存储、哈希缓存、临时目录都放在 tmp_path，不使用中继"""
+    store = update_state.UpdateStateStore(str(tmp_path / 'state.db'))
+    monkeypatch.setattr(update_state, '_store', store)
+    monkeypatch.setattr(install_verify, 'HASH_CACHE_PATH', str(tmp_path / 'hash_cache.json'))
+    monkeypatch.setattr(tempfile, 'tempdir', str(tmp_path))
+    monkeypatch.delenv('Y2_UPDATE_RELAY', raising=False)
+    yield store
+    store.close()
+
+
+def make_install(install_dir, version='1.9.2', with_component=False):
+    """生成带 excel 组件清单的安装目录（组件文件默认不在安装目录中）"""
+    install_dir.mkdir(parents=True, exist_ok=True)
+    (install_dir / 'Y2.exe').write_bytes(b'exe')
+    files = {'Y2.exe': {'size': 3, 'hash': 'sha256:' + hashlib.sha256(b'exe').hexdigest()}}
+    for rel_path, data in EXCEL_FILES.items():
+        files[rel_path] = {
+            'size': len(data), 'hash': 'sha256:' + hashlib.sha256(data).hexdigest(), 'component': 'excel',
+        }
+        if with_component:
+            path = install_dir / rel_path
+            path.parent.mkdir(parents=True, exist_ok=True)
+            path.write_bytes(data)
+    (install_dir / install_verify.INSTALL_MANIFEST).write_text(
+        json.dumps({'version': version, 'files': files}), encoding='utf-8'
+    )
+    return str(install_dir)
+
+
+def publish_component(range_server, store, members, version='1.9.2'):
+    """把组件包放到本机 Range 服务上，并写入缓存的版本信息"""
+    cache_dir, base_url = range_server
+    cache_dir.mkdir(exist_ok=True)
+    with zipfile.ZipFile(cache_dir / 'Y2_excel.zip', 'w') as zf:
+        for rel_path, data in members.items():
+            zf.writestr(rel_path, data)
+    store.set_meta('version_info', {
+        'version': version,
+        'releases': [{'version': version, 'artifacts': [], 'components': {
+            'excel': {'url': base_url + 'Y2_excel.zip', 'size': 0},
+        }}],
+    })
+
+
+def test_installed_components_follow_manifest_version(tmp_path):
+    install_dir = make_install(tmp_path / 'install')
+    (tmp_path / 'install' / update_components.COMPONENTS_FILE).write_text(
+        json.dumps({'excel': '1.9.2', 'templates': '1.9.1'}), encoding='utf-8'
+    )
+
+    assert update_components.get_installed_components(install_dir) == {'excel'}
+    assert update_components.get_installed_components(install_dir, {'version': '1.9.1', 'files': {}}) == {
+        'templates'
+    }
+
+
+def test_no_manifest_counts_as_installed(tmp_path):
+    assert update_components.is_component_recorded('excel', str(tmp_path))
+    assert ensure_component('excel', install_dir=str(tmp_path))
+
+
+def test_recorded_check_uses_record_and_sizes(tmp_path):
+    install_dir = make_install(tmp_path / 'install', with_component=True)
+    assert not update_components.is_component_recorded('excel', install_dir)
+
+    update_components._mark_installed(install_dir, 'excel', '1.9.2')
+    assert update_components.is_component_recorded('excel', install_dir)
+
+    (tmp_path / 'install' / '_internal' / 'numpy' / 'core.pyd').write_bytes(b'short')
+    assert not update_components.is_component_recorded('excel', install_dir)
+
+
+def test_install_component(tmp_path, range_server, isolated):
+    install_dir = make_install(tmp_path / 'install')
+    publish_component(range_server, isolated, EXCEL_FILES)
+
+    assert install_component('excel', install_dir) == (True, None)
+
+    for rel_path, data in EXCEL_FILES.items():
+        assert (tmp_path / 'install' / rel_path).read_bytes() == data
+    assert update_components.load_installed_components(install_dir) == {'excel': '1.9.2'}
+    assert not (tmp_path / 'Y2订单处理辅助工具_excel_1.9.2.zip').exists()
+    assert isolated.get_completed_downloads(kind='component')
+
+
+def test_install_component_missing_member(tmp_path, range_server, isolated):
+    install_dir = make_install(tmp_path / 'install')
+    publish_component(range_server, isolated, {'_internal/pandas/core.pyd': EXCEL_FILES['_internal/pandas/core.pyd']})
+
+    success, error = install_component('excel', install_dir)
+
+    assert not success
+    assert '_internal/numpy/core.pyd' in error
+    # 不替换任何文件，也不记录为已安装
+    assert not (tmp_path / 'install' / '_internal').exists()
+    assert update_components.load_installed_components(install_dir) == {}
+
+
+def test_install_component_hash_mismatch(tmp_path, range_server, isolated):
+    install_dir = make_install(tmp_path / 'install', with_component=True)
+    tampered = dict(EXCEL_FILES, **{'_internal/numpy/core.pyd': b'x' * len(EXCEL_FILES['_internal/numpy/core.pyd'])})
+    publish_component(range_server, isolated, tampered)
+
+    success, error = install_component('excel', install_dir)
+
+    assert not success
+    assert '校验失败' in error
+    assert (tmp_path / 'install' / '_internal' / 'numpy' / 'core.pyd').read_bytes() == \
+        EXCEL_FILES['_internal/numpy/core.pyd']
+    assert update_components.load_installed_components(install_dir) == {}
+
+
+def test_unknown_component(tmp_path):
+    install_dir = make_install(tmp_path / 'install')
+
+    assert install_component('fonts', install_dir) == (False, "未知的组件: fonts")
+
+
+def test_recorded_component_returns_without_callback(tmp_path, monkeypatch):
+    install_dir = make_install(tmp_path / 'install', with_component=True)
+    update_components._mark_installed(install_dir, 'excel', '1.9.2')
+    monkeypatch.setattr(install_verify, 'verify_install', lambda *args, **kwargs: pytest.fail("不应计算哈希"))
+    calls = []
+
+    assert ensure_component('excel', lambda *args: calls.append(args), install_dir=install_dir)
+    assert calls == []
+
+
+def test_unrecorded_component_is_verified_in_background(tmp_path, monkeypatch):
+    """通过安装程序安装、没有记录时：调用线程不计算哈希，后台校验通过后记录并回调"""
+    install_dir = make_install(tmp_path / 'install', with_component=True)
+    verify_threads = []
+    original_verify = install_verify.verify_install
+
+    def verify(*args, **kwargs):
+        verify_threads.append(threading.current_thread())
+        return original_verify(*args, **kwargs)
+
+    monkeypatch.setattr(install_verify, 'verify_install', verify)
+    monkeypatch.setattr(update_components, 'install_component', lambda *args: pytest.fail("不应下载"))
+    results = []
+    done = threading.Event()
+
+    def on_ready(success, error):
+        results.append((success, error, threading.current_thread()))
+        done.set()
+
+    assert not ensure_component('excel', on_ready, install_dir=install_dir)
+    assert done.wait(5)
+
+    assert results[0][:2] == (True, None)
+    assert results[0][2] is not threading.current_thread()
+    assert verify_threads and threading.current_thread() not in verify_threads
+    assert update_components.load_installed_components(install_dir) == {'excel': '1.9.2'}
+
+
+def test_one_install_per_component(tmp_path, monkeypatch):
+    install_dir = make_install(tmp_path / 'install')
+    release = threading.Event()
+    installs = []
+
+    def fake_install(name, directory):
+        installs.append(name)
+        release.wait(5)
+        for rel_path, data in EXCEL_FILES.items():
+            path = tmp_path / 'install' / rel_path
+            path.parent.mkdir(parents=True, exist_ok=True)
+            path.write_bytes(data)
+        update_components._mark_installed(directory, name, '1.9.2')
+        return True, None
+
+    monkeypatch.setattr(update_components, 'install_component', fake_install)
+    results = []
+    lock = threading.Lock()
+
+    def callback(success, error):
+        with lock:
+            results.append((success, error))
+
+    # 安装进行中时的多次调用都立即返回，共用同一个后台安装
+    callers = [
+        threading.Thread(target=ensure_component, args=('excel', callback), kwargs={'install_dir': install_dir})
+        for _ in range(8)
+    ]
+    for thread in callers:
+        thread.start()
+    for thread in callers:
+        thread.join()
+    waited = []
+    waiter = threading.Thread(target=lambda: waited.append(
+        ensure_component('excel', callback, wait=True, install_dir=install_dir)
+    ))
+    waiter.start()
+    # 等 wait=True 的调用也加入同一个安装后再让安装完成
+    for _ in range(500):
+        if len(update_components._pending['excel']['callbacks']) == 9:
+            break
+        waiter.join(0.01)
+
+    release.set()
+    waiter.join(5)
+
+    assert waited == [True]
+    assert installs == ['excel']
+    assert results == [(True, None)] * 9
+    assert update_components._pending == {}
+    # 安装完成后直接返回 True
+    assert ensure_component('excel', callback, install_dir=install_dir)
+    assert installs == ['excel']
@@ -0,0 +1,97 @@
+# -*- coding: utf-8 -*-
+"""update_profiling：关闭时装饰器不做任何事，开启时写出全部分析结果"""
+
+import json
+import pstats
+import tracemalloc
+
+import pytest
+
+import update_profiling
+from update_profiling import profiled
+
+SUFFIXES = ('.prof', '.tracemalloc', '.alloc.folded', '.json')
+
+
+@pytest.fixture
+def profile_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(update_profiling, 'get_profile_dir', lambda: str(tmp_path))
+    monkeypatch.delenv(update_profiling.PROFILE_ENV, raising=False)
+    monkeypatch.setattr(update_profiling.sys, 'argv', ['pytest'])
+    return tmp_path
+
+
+def work(n):
+    return sum(len(str(i) * 10) for i in range(n))
+
+
+def test_disabled_is_noop(profile_dir, monkeypatch):
+    monkeypatch.setattr(update_profiling, 'ProfileSession', lambda name: pytest.fail("不应开始分析会话"))
+
+    assert profiled('test')(work)(100) == work(100)
+    assert list(profile_dir.iterdir()) == []
+    assert not tracemalloc.is_tracing()
+
+
+@pytest.mark.parametrize('value', ['', '0'])
+def test_env_values_that_disable(profile_dir, monkeypatch, value):
+    monkeypatch.setenv(update_profiling.PROFILE_ENV, value)
+
+    assert not update_profiling.is_enabled()
+
+
+def test_enabled_writes_all_results(profile_dir, monkeypatch):
+    decorated = profiled('unit')(work)
+    # 导入（装饰）之后才开启同样生效
+    monkeypatch.setenv(update_profiling.PROFILE_ENV, '1')
+
+    assert decorated(1000) == work(1000)
+
+    outputs = sorted(path.name for path in profile_dir.iterdir())
+    assert len(outputs) == len(SUFFIXES)
+    base = outputs[0].split('.')[0]
+    assert base.startswith('Y2_profile_unit_')
+    assert sorted(base + suffix for suffix in SUFFIXES) == outputs
+
+    stats = pstats.Stats(str(profile_dir / (base + '.prof')))
+    assert any(func[2] == 'work' for func in stats.stats)
+    assert tracemalloc.Snapshot.load(str(profile_dir / (base + '.tracemalloc')))
+    summary = json.loads((profile_dir / (base + '.json')).read_text(encoding='utf-8'))
+    assert summary['name'] == 'unit'
+    assert summary['seconds'] > 0
+    assert summary['exception'] is None
+    assert not tracemalloc.is_tracing()
+
+
+def test_profile_argument_enables(profile_dir, monkeypatch):
+    monkeypatch.setattr(update_profiling.sys, 'argv', ['updater.py', 'a.zip', 'dir', update_profiling.PROFILE_ARG])
+
+    profiled('argv')(work)(10)
+
+    assert len(list(profile_dir.glob('Y2_profile_argv_*.json'))) == 1
+
+
+def test_exception_is_recorded_and_propagated(profile_dir, monkeypatch):
+    monkeypatch.setenv(update_profiling.PROFILE_ENV, '1')
+
+    @profiled('failing')
+    def fail():
+        raise RuntimeError("失败")
+
+    with pytest.raises(RuntimeError):
+        fail()
+
+    summary_path, = profile_dir.glob('Y2_profile_failing_*.json')
+    assert json.loads(summary_path.read_text(encoding='utf-8'))['exception'] == 'RuntimeError'
+
+
+def test_nested_calls_use_one_session(profile_dir, monkeypatch):
+    monkeypatch.setenv(update_profiling.PROFILE_ENV, '1')
+    inner = profiled('inner')(work)
+
+    @profiled('outer')
+    def outer():
+        return inner(10)
+
+    assert outer() == work(10)
+    assert [path.name.split('_')[2] for path in profile_dir.glob('*.json')] == ['outer']
@@ -0,0 +1,178 @@
+# -*- coding: utf-8 -*-
+"""update_relay：Range 解析、Range 响应（206 / 416）和首次请求时的后台缓存"""
+
+import hashlib
+import json
+import threading
+import time
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+import pytest
+import requests
+
+import update_relay
+from update_relay import parse_range
+
+PAYLOAD = bytes(range(256)) * 40
+
+
+@pytest.mark.parametrize('header, expected', [
+    ('bytes=0-99', (0, 99)),
+    ('bytes=100-', (100, 999)),
+    ('bytes=900-5000', (900, 999)),
+    ('bytes=-100', (900, 999)),
+    ('bytes=-5000', (0, 999)),
+    ('bytes=999-999', (999, 999)),
+    ('bytes=1000-', None),
+    ('bytes=50-10', None),
+    ('bytes=-0', None),
+    ('bytes=0-1,5-6', None),
+    ('bytes=a-b', None),
+    ('items=0-1', None),
+    ('', None),
+    (None, None),
+])
+def test_parse_range(header, expected):
+    assert parse_range(header, 1000) == expected
+
+
+def test_parse_range_empty_file():
+    assert parse_range('bytes=0-', 0) is None
+
+
+def serve(handler):
+    server = ThreadingHTTPServer(('127.0.0.1', 0), handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, args=(0.05,), daemon=True).start()
+    return server
+
+
+@pytest.fixture
+def upstream():
+    """本机上游：提供 version.json 和更新包；release 事件置位前更新包请求会一直等待"""
+    state = {'release': threading.Event(), 'downloads': 0, 'hash': None}
+    state['release'].set()
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path == '/version.json':
+                body = json.dumps({
+                    'version': '1.9.2',
+                    'download_url': f"{state['base']}/files/Y2_1.9.2.zip",
+                    'file_size': len(PAYLOAD),
+                    'hash': state['hash'] or 'sha256:' + hashlib.sha256(PAYLOAD).hexdigest(),
+                }).encode('utf-8')
+            elif self.path == '/files/Y2_1.9.2.zip':
+                state['downloads'] += 1
+                state['release'].wait(10)
+                body = PAYLOAD
+            else:
+                self.send_error(404)
+                return
+            self.send_response(200)
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    server = serve(Handler)
+    state['base'] = f"http://127.0.0.1:{server.server_address[1]}"
+    yield state
+    state['release'].set()
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture
+def relay(tmp_path, upstream):
+    server = update_relay.create_server(
+        '127.0.0.1', 0, str(tmp_path / 'cache'), [f"{upstream['base']}/version.json"]
+    )
+    threading.Thread(target=server.serve_forever, args=(0.05,), daemon=True).start()
+    yield f"http://127.0.0.1:{server.server_address[1]}/files/Y2_1.9.2.zip"
+    server.shutdown()
+    server.server_close()
+
+
+def fetch(url, headers=None, timeout=10):
+    """请求中继文件，收到 503 时按 Retry-After 等待（测试中最多等 0.1 秒）后重试"""
+    deadline = time.monotonic() + timeout
+    while True:
+        response = requests.get(url, headers=headers, timeout=5)
+        if response.status_code != 503 or time.monotonic() > deadline:
+            return response
+        time.sleep(0.1)
+
+
+def test_first_request_is_deferred_until_cached(relay, upstream):
+    upstream['release'].clear()
+
+    first = requests.get(relay, timeout=5)
+    assert first.status_code == 503
+    assert first.headers['Retry-After'] == str(update_relay.RETRY_AFTER)
+    # 下载进行中时的其他请求同样立即返回，不会再次发起上游下载
+    assert requests.get(relay, timeout=5).status_code == 503
+
+    upstream['release'].set()
+    response = fetch(relay)
+    assert response.status_code == 200
+    assert response.content == PAYLOAD
+    assert response.headers['Accept-Ranges'] == 'bytes'
+    assert upstream['downloads'] == 1
+
+
+def test_range_responses(relay):
+    assert fetch(relay).status_code == 200
+    size = len(PAYLOAD)
+
+    response = requests.get(relay, headers={'Range': 'bytes=100-199'}, timeout=5)
+    assert response.status_code == 206
+    assert response.headers['Content-Range'] == f"bytes 100-199/{size}"
+    assert response.content == PAYLOAD[100:200]
+
+    response = requests.get(relay, headers={'Range': f"bytes={size - 10}-"}, timeout=5)
+    assert response.status_code == 206
+    assert response.content == PAYLOAD[-10:]
+
+    response = requests.get(relay, headers={'Range': 'bytes=-16'}, timeout=5)
+    assert response.status_code == 206
+    assert response.headers['Content-Range'] == f"bytes {size - 16}-{size - 1}/{size}"
+    assert response.content == PAYLOAD[-16:]
+
+
+@pytest.mark.parametrize('header', ['bytes=20000-', 'bytes=50-10', 'bytes=0-1,5-6'])
+def test_unsatisfiable_range(relay, header):
+    assert fetch(relay).status_code == 200
+
+    response = requests.get(relay, headers={'Range': header}, timeout=5)
+
+    assert response.status_code == 416
+    assert response.headers['Content-Range'] == f"bytes */{len(PAYLOAD)}"
+    assert response.content == b''
+
+
+def test_head_request(relay):
+    assert fetch(relay).status_code == 200
+
+    response = requests.head(relay, headers={'Range': 'bytes=0-9'}, timeout=5)
+
+    assert response.status_code == 206
+    assert response.headers['Content-Length'] == '10'
+
+
+def test_hash_mismatch_is_not_served(relay, upstream, tmp_path):
+    upstream['hash'] = 'sha256:' + '0' * 64
+
+    response = fetch(relay)
+
+    assert response.status_code == 502
+    assert '文件校验失败' in response.text
+    assert not (tmp_path / 'cache' / 'Y2_1.9.2.zip').exists()
+
+
+def test_unknown_file(relay):
+    response = requests.get(relay.replace('Y2_1.9.2.zip', 'other.zip'), timeout=5)
+
+    assert response.status_code == 404
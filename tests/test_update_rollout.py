@@ -0,0 +1,150 @@
+# -*- coding: utf-8 -*-
+"""update_rollout：分桶、发布比例爬升和错峰延迟"""
+
+import pytest
+
+import update_rollout
+from update_rollout import get_bucket, get_rollout_percentage, is_in_rollout
+
+START = 1_800_000_000
+HOUR = 3600
+INSTALL_IDS = [f"{i:032x}" for i in range(2000)]
+
+
+def test_bucket_is_stable_and_in_range():
+    buckets = [get_bucket(install_id, '1.9.2') for install_id in INSTALL_IDS]
+
+    assert buckets == [get_bucket(install_id, '1.9.2') for install_id in INSTALL_IDS]
+    assert all(0 <= bucket < 100 for bucket in buckets)
+    # 大致均匀分布
+    assert 0.15 < sum(bucket < 20 for bucket in buckets) / len(buckets) < 0.25
+
+
+def test_bucket_depends_on_salt():
+    same = sum(get_bucket(i, '1.9.2') < 20 and get_bucket(i, '1.9.3') < 20 for i in INSTALL_IDS)
+
+    # 不同版本的早期批次不应总是同一批实例
+    assert same / len(INSTALL_IDS) < 0.1
+
+
+@pytest.mark.parametrize('now, expected', [
+    (START - 1, 0.0),
+    (START, 0.0),
+    (START + 6 * HOUR, 20.0),
+    (START + 12 * HOUR, 40.0),
+    (START + 24 * HOUR, 40.0),
+    (START + 240 * HOUR, 40.0),
+])
+def test_ramp(now, expected):
+    rollout = {'percentage': 40, 'start': START, 'ramp_hours': 12}
+
+    assert get_rollout_percentage(rollout, now) == pytest.approx(expected)
+
+
+@pytest.mark.parametrize('rollout, expected', [
+    (None, 100.0),
+    ({}, 100.0),
+    ({'percentage': 25}, 25.0),
+    ({'percentage': 150}, 100.0),
+    ({'percentage': -5}, 0.0),
+    ({'percentage': 25, 'start': START, 'ramp_hours': 0}, 25.0),
+])
+def test_percentage_without_ramp(rollout, expected):
+    assert get_rollout_percentage(rollout, START + HOUR) == expected
+
+
+def test_iso_start_time():
+    # START 即 2027-01-15T08:00:00Z
+    rollout = {'percentage': 50, 'start': '2027-01-15T16:00:00+08:00', 'ramp_hours': 10}
+
+    assert get_rollout_percentage(rollout, START - 1) == 0.0
+    assert get_rollout_percentage(rollout, START + 5 * HOUR) == pytest.approx(25.0)
+    assert get_rollout_percentage(dict(rollout, start='2027-01-15T08:00:00Z'), START + 5 * HOUR) == \
+        pytest.approx(25.0)
+
+
+def test_ramp_only_adds_instances():
+    """比例增加时，已在发布范围内的实例不会被移出"""
+    version_info = {'version': '1.9.2', 'rollout': {'percentage': 100, 'start': START, 'ramp_hours': 10}}
+    previous = set()
+    for hours in range(11):
+        current = {
+            install_id for install_id in INSTALL_IDS[:500]
+            if is_in_rollout(version_info, install_id=install_id, now=START + hours * HOUR)
+        }
+        assert previous <= current
+        previous = current
+    assert len(previous) == 500
+
+
+def test_release_rollout_overrides_top_level():
+    version_info = {
+        'version': '1.9.2',
+        'rollout': {'percentage': 100},
+        'releases': [
+            {'version': '1.9.2', 'artifacts': [], 'rollout': {'percentage': 0}},
+        ],
+    }
+
+    assert not is_in_rollout(version_info, install_id=INSTALL_IDS[0], now=START)
+    assert is_in_rollout({'version': '1.9.2'}, install_id=INSTALL_IDS[0], now=START)
+
+
+def test_salt_selects_bucket():
+    rollout = {'percentage': 30, 'salt': 'wave-1'}
+    version_info = {'version': '1.9.2', 'rollout': rollout}
+
+    for install_id in INSTALL_IDS[:100]:
+        expected = get_bucket(install_id, 'wave-1') < 30
+        assert is_in_rollout(version_info, install_id=install_id, now=START) == expected
+
+
+@pytest.mark.parametrize('rollout', [
+    {'percentage': 5, 'start': '2026/10/20 08:00'},
+    {'percentage': 5, 'start': START, 'ramp_hours': 'a day'},
+    {'percentage': 5, 'start': [START]},
+])
+def test_invalid_start_or_ramp_keeps_percentage(rollout):
+    """开始时间或爬升时长写错时仍只发布给配置的比例"""
+    version_info = {'version': '1.9.2', 'rollout': rollout}
+
+    selected = sum(is_in_rollout(version_info, install_id=i, now=START) for i in INSTALL_IDS)
+
+    assert get_rollout_percentage(rollout, START) == 5.0
+    assert selected / len(INSTALL_IDS) < 0.1
+
+
+@pytest.mark.parametrize('percentage', ['half', None, float('nan'), float('inf')])
+def test_invalid_percentage_releases_to_nobody(percentage):
+    version_info = {'version': '1.9.2', 'rollout': {'percentage': percentage}}
+
+    assert get_rollout_percentage(version_info['rollout'], START) == 0.0
+    assert not any(is_in_rollout(version_info, install_id=i, now=START) for i in INSTALL_IDS[:100])
+
+
+def test_build_script_validates_rollout_start():
+    import argparse
+    import build_and_release
+
+    assert build_and_release._rollout_start('2026-10-20T08:00:00+08:00') == '2026-10-20T08:00:00+08:00'
+    with pytest.raises(argparse.ArgumentTypeError):
+        build_and_release._rollout_start('2026/10/20 08:00')
+
+
+def test_check_delay_bounds():
+    delays = [update_rollout.get_check_delay(3, 600) for _ in range(200)]
+
+    assert all(3 <= delay <= 603 for delay in delays)
+    # 每次启动重新随机
+    assert len(set(delays)) > 1
+    assert update_rollout.get_check_delay(3, 0) == 3
+
+
+def test_download_delay_bounds():
+    version_info = {'version': '1.9.2', 'rollout': {'download_spread_seconds': 100}}
+
+    for install_id in INSTALL_IDS[:100]:
+        assert 0 <= update_rollout.get_download_delay(version_info, install_id) <= 100
+    assert update_rollout.get_download_delay(
+        {'version': '1.9.2', 'rollout': {'download_spread_seconds': 0}}, INSTALL_IDS[0]
+    ) == 0
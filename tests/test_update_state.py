@@ -0,0 +1,178 @@
+# -*- coding: utf-8 -*-
+"""update_state：旧配置迁移、表结构升级、旧记录清理与并发写入"""
+
+import json
+import sqlite3
+import threading
+import time
+import uuid
+
+import pytest
+
+import update_state
+from update_state import UpdateStateStore
+
+
+@pytest.fixture
+def legacy_config(tmp_path, monkeypatch):
+    """把旧配置文件路径指向临时目录，返回写入旧配置的函数"""
+    path = tmp_path / 'update_config.json'
+    monkeypatch.setattr(update_state, 'LEGACY_CONFIG_PATH', str(path))
+
+    def write(config):
+        path.write_text(json.dumps(config), encoding='utf-8')
+    return write
+
+
+@pytest.fixture
+def db_path(tmp_path, legacy_config):
+    return str(tmp_path / 'state' / 'update_state.db')
+
+
+def test_migrates_legacy_skipped_version(db_path, legacy_config):
+    legacy_config({'skipped_version': '1.9.1', 'skip_time': time.time() - 3600, 'auto_check': True})
+
+    store = UpdateStateStore(db_path)
+
+    assert store.is_version_skipped('1.9.1')
+    assert not store.is_version_skipped('1.9.2')
+    store.close()
+
+
+def test_expired_legacy_skip_is_not_honoured(db_path, legacy_config):
+    legacy_config({'skipped_version': '1.9.1', 'skip_time': time.time() - update_state.SKIP_DURATION - 60})
+
+    store = UpdateStateStore(db_path)
+
+    assert not store.is_version_skipped('1.9.1')
+    store.close()
+
+
+@pytest.mark.parametrize('content', [None, '{not json', '{}'])
+def test_missing_or_broken_legacy_config(db_path, tmp_path, content):
+    if content is not None:
+        (tmp_path / 'update_config.json').write_text(content, encoding='utf-8')
+
+    store = UpdateStateStore(db_path)
+
+    assert not store.is_version_skipped('1.9.1')
+    store.close()
+
+
+def test_legacy_config_is_migrated_only_once(db_path, legacy_config):
+    store = UpdateStateStore(db_path)
+    store.get_meta('install_id')
+    store.close()
+    legacy_config({'skipped_version': '1.9.1', 'skip_time': time.time()})
+
+    store = UpdateStateStore(db_path)
+
+    assert not store.is_version_skipped('1.9.1')
+    store.close()
+
+
+def test_upgrades_v1_schema(db_path):
+    # 创建 v1 表结构（downloads 没有 kind 列）并写入一条已完成的下载
+    store = UpdateStateStore(db_path)
+    store.get_meta('install_id')
+    store.close()
+    conn = sqlite3.connect(db_path, isolation_level=None)
+    conn.execute('DROP TABLE downloads')
+    conn.execute(
+        'CREATE TABLE downloads (url TEXT PRIMARY KEY, path TEXT NOT NULL, version TEXT, '
+        'total_size INTEGER NOT NULL DEFAULT 0, downloaded INTEGER NOT NULL DEFAULT 0, '
+        'expected_hash TEXT, status TEXT NOT NULL, updated_at REAL NOT NULL)'
+    )
+    conn.execute(
+        "INSERT INTO downloads VALUES ('https://example.com/a.zip', '/tmp/a.zip', '1.9.1', 1, 1, "
+        "'sha256:00', 'completed', 0)"
+    )
+    conn.execute('PRAGMA user_version = 1')
+    conn.close()
+
+    store = UpdateStateStore(db_path)
+
+    assert store.get_completed_downloads() == [('/tmp/a.zip', '1.9.1', 'sha256:00')]
+    store.record_download('https://example.com/c.zip', '/tmp/c.zip', 'completed', kind='component')
+    assert store.get_download('https://example.com/c.zip')['kind'] == 'component'
+    assert store.get_completed_downloads(kind='component') == [('/tmp/c.zip', None, None)]
+    store.close()
+    conn = sqlite3.connect(db_path)
+    assert conn.execute('PRAGMA user_version').fetchone()[0] == update_state.SCHEMA_VERSION
+    conn.close()
+
+
+def test_prunes_history_and_timings(db_path, monkeypatch):
+    monkeypatch.setattr(update_state, 'HISTORY_LIMIT', 3)
+    monkeypatch.setattr(update_state, 'TIMINGS_PER_PHASE', 2)
+    store = UpdateStateStore(db_path)
+
+    for i in range(5):
+        store.begin_update('1.9.0', f'1.9.{i + 1}', f'/tmp/{i}.zip')
+        store.record_timing('download', i)
+    store.record_timing('check', 1)
+
+    assert [row['to_version'] for row in store.get_history()] == ['1.9.5', '1.9.4', '1.9.3']
+    assert sorted(row['seconds'] for row in store.get_timings('download')) == [3.0, 4.0]
+    assert len(store.get_timings('check')) == 1
+    store.close()
+
+
+def test_default_path_is_resolved_at_call_time(tmp_path, monkeypatch):
+    path = str(tmp_path / 'other.db')
+    monkeypatch.setattr(update_state, 'DB_PATH', path)
+
+    assert UpdateStateStore().path == path
+
+
+def run_threads(count, target):
+    errors = []
+    start = threading.Barrier(count)
+
+    def worker(index):
+        try:
+            start.wait()
+            target(index)
+        except BaseException as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=worker, args=(i,)) for i in range(count)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert errors == []
+
+
+def test_concurrent_writers(db_path):
+    """每个线程使用独立的连接（与多个进程同时打开数据库相同），包括同时初始化新数据库"""
+    writers, rounds = 8, 20
+    install_ids = []
+
+    def write(index):
+        store = UpdateStateStore(db_path)
+        install_ids.append(store.get_or_create_meta('install_id', lambda: uuid.uuid4().hex))
+        for i in range(rounds):
+            store.record_timing('download', i, version=str(index))
+            store.begin_update('1.9.0', '1.9.1', f'/tmp/{index}-{i}.zip')
+            store.record_download(f'https://example.com/{index}-{i}.zip', '/tmp/x', 'completed')
+        store.close()
+
+    run_threads(writers, write)
+
+    store = UpdateStateStore(db_path)
+    assert len(set(install_ids)) == 1
+    assert store.get_meta('install_id') == install_ids[0]
+    assert len(store.get_timings('download', limit=1000)) == writers * rounds
+    assert len(store.get_history(limit=1000)) == update_state.HISTORY_LIMIT
+    assert len(store.get_completed_downloads()) == writers * rounds
+    store.close()
+
+
+def test_shared_instance_across_threads(db_path):
+    store = UpdateStateStore(db_path)
+
+    run_threads(4, lambda index: [store.record_timing(f'phase{index}', i) for i in range(25)])
+
+    assert len(store.get_timings(limit=1000)) == 100
+    store.close()
@@ -0,0 +1,243 @@
+# -*- coding: utf-8 -*-
+"""updater：缓冲日志（轮转、落盘）、增量包删除文件和更新包外层目录判断"""
+
+import json
+import os
+import tempfile
+import threading
+import time
+import zipfile
+
+import pytest
+
+import updater
+from updater import BufferedLogWriter
+
+
+@pytest.fixture
+def log_path(tmp_path, monkeypatch):
+    """把更新助手的日志写入临时目录（刷新间隔很长，只有显式落盘时才写文件）"""
+    path = tmp_path / 'Y2_updater.log'
+    writer = BufferedLogWriter(str(path), flush_interval=3600)
+    monkeypatch.setattr(updater, '_log_writer', writer)
+    yield path
+    writer.close()
+
+
+def read(path):
+    return path.read_text(encoding='utf-8')
+
+
+# ---------- 缓冲日志 ----------
+
+def test_rotation(tmp_path):
+    path = tmp_path / 'Y2_updater.log'
+    writer = BufferedLogWriter(str(path), max_bytes=100, backup_count=3, flush_interval=3600)
+
+    for i in range(6):
+        writer.write(f"batch {i} " + 'x' * 100 + "\n")
+        writer.flush()
+
+    # 每批都超过 max_bytes，写入前轮转：最新的在 .log，依次变旧，只保留 3 个旧文件
+    assert read(path).startswith('batch 5')
+    assert read(tmp_path / 'Y2_updater.log.1').startswith('batch 4')
+    assert read(tmp_path / 'Y2_updater.log.2').startswith('batch 3')
+    assert read(tmp_path / 'Y2_updater.log.3').startswith('batch 2')
+    assert not (tmp_path / 'Y2_updater.log.4').exists()
+    writer.close()
+
+
+def test_no_rotation_below_limit(tmp_path):
+    path = tmp_path / 'Y2_updater.log'
+    writer = BufferedLogWriter(str(path), max_bytes=1000, flush_interval=3600)
+
+    for i in range(3):
+        writer.write(f"line {i}\n")
+        writer.flush()
+
+    assert read(path) == "line 0\nline 1\nline 2\n"
+    assert not (tmp_path / 'Y2_updater.log.1').exists()
+    writer.close()
+
+
+def test_rotation_without_backups(tmp_path):
+    path = tmp_path / 'Y2_updater.log'
+    writer = BufferedLogWriter(str(path), max_bytes=10, backup_count=0, flush_interval=3600)
+
+    writer.write('x' * 20 + "\n")
+    writer.flush()
+    writer.write("new\n")
+    writer.flush()
+
+    assert read(path) == "new\n"
+    assert os.listdir(tmp_path) == ['Y2_updater.log']
+    writer.close()
+
+
+def test_close_flushes_buffer(tmp_path):
+    path = tmp_path / 'Y2_updater.log'
+    writer = BufferedLogWriter(str(path), flush_interval=3600)
+
+    writer.write("first\n")
+    writer.write("second\n")
+    assert not path.exists()
+
+    writer.close()
+    assert read(path) == "first\nsecond\n"
+    assert not writer._thread.is_alive()
+
+
+def test_background_flush(tmp_path):
+    path = tmp_path / 'Y2_updater.log'
+    writer = BufferedLogWriter(str(path), flush_interval=0.01)
+
+    writer.write("line\n")
+    # 文件可能已创建但尚未写完，等待内容而不是文件存在
+    deadline = time.monotonic() + 5
+    while (not path.exists() or read(path) != "line\n") and time.monotonic() < deadline:
+        time.sleep(0.01)
+
+    assert read(path) == "line\n"
+    writer.close()
+
+
+def test_uncaught_exception_is_flushed(log_path, monkeypatch):
+    def fail():
+        updater.log("更新助手启动")
+        raise RuntimeError("解压时出错")
+
+    monkeypatch.setattr(updater, 'run_update', fail)
+    hook = threading.excepthook
+
+    with pytest.raises(RuntimeError):
+        updater.main()
+
+    # 未调用 close，日志已写入文件
+    content = read(log_path)
+    assert "更新助手启动" in content
+    assert "未捕获的异常" in content
+    assert "RuntimeError: 解压时出错" in content
+    assert threading.excepthook is hook
+
+
+def test_thread_exception_is_flushed(log_path, monkeypatch):
+    def run():
+        def fail():
+            raise ValueError("后台线程出错")
+        thread = threading.Thread(target=fail)
+        thread.start()
+        thread.join()
+
+    monkeypatch.setattr(updater, 'run_update', run)
+    # 不让 pytest 的线程异常处理干扰
+    monkeypatch.setattr(threading, 'excepthook', lambda args: None)
+
+    updater.main()
+
+    assert "ValueError: 后台线程出错" in read(log_path)
+
+
+# ---------- 增量包删除文件 ----------
+
+def write_manifest(source_dir, removed):
+    source_dir.mkdir(exist_ok=True)
+    (source_dir / updater.DELTA_MANIFEST).write_text(
+        json.dumps({'from': '1.9.1', 'to': '1.9.2', 'removed': removed}), encoding='utf-8'
+    )
+
+
+def test_apply_delta_removals(tmp_path, log_path):
+    target = tmp_path / 'install'
+    (target / '_internal').mkdir(parents=True)
+    (target / '_internal' / 'old.pyd').write_bytes(b'old')
+    (target / '_internal' / 'updater.py').write_bytes(b'helper')
+    (target / 'updater.exe').write_bytes(b'helper')
+    (target / 'keep.txt').write_bytes(b'keep')
+    outside = tmp_path / 'outside.txt'
+    outside.write_bytes(b'outside')
+    write_manifest(tmp_path / 'source', [
+        '_internal/old.pyd',
+        '_internal/missing.pyd',
+        '../outside.txt',
+        str(outside),
+        '_internal/../../outside.txt',
+        'UPDATER.EXE',
+        '_internal/updater.py',
+    ])
+
+    removed = updater.apply_delta_removals(str(tmp_path / 'source'), str(target))
+
+    assert removed == 1
+    assert not (target / '_internal' / 'old.pyd').exists()
+    assert outside.read_bytes() == b'outside'
+    assert (target / 'updater.exe').exists()
+    assert (target / '_internal' / 'updater.py').exists()
+    assert (target / 'keep.txt').exists()
+
+
+def test_apply_delta_removals_without_manifest(tmp_path):
+    assert updater.apply_delta_removals(str(tmp_path), str(tmp_path)) == 0
+
+
+# ---------- 更新包外层目录 ----------
+
+def make_zip(path, names):
+    with zipfile.ZipFile(path, 'w') as zf:
+        for name in names:
+            zf.writestr(name, name)
+    return str(path)
+
+
+@pytest.fixture
+def extract_tmp(tmp_path, monkeypatch):
+    """extract_update 解压到系统临时目录，测试中改为 tmp_path"""
+    monkeypatch.setattr(tempfile, 'tempdir', str(tmp_path))
+
+
+@pytest.mark.parametrize('names, expected_roots', [
+    # 外层目录（打包时的 Y2订单处理辅助工具/）
+    (['Y2/Y2.exe', 'Y2/_internal/a.pyd'], {'Y2'}),
+    # exe 与 _internal 同级：根目录有文件，没有外层目录
+    (['Y2.exe', '_internal/a.pyd'], set()),
+    # 只有根目录文件
+    (['Y2.exe', 'readme.txt'], set()),
+    # 多个根目录
+    (['_internal/a.pyd', 'docs/b.txt'], {'_internal', 'docs'}),
+])
+def test_extract_update_root_dirs(tmp_path, log_path, extract_tmp, names, expected_roots):
+    zip_path = make_zip(tmp_path / 'update.zip', names)
+
+    extract_dir, root_dirs = updater.extract_update(zip_path, str(tmp_path / 'install'))
+
+    assert root_dirs == expected_roots
+    assert sorted(
+        os.path.relpath(os.path.join(root, name), extract_dir).replace(os.sep, '/')
+        for root, _, files in os.walk(extract_dir) for name in files
+    ) == sorted(names)
+
+
+@pytest.mark.parametrize('names, expected', [
+    (['Y2/Y2.exe', 'Y2/_internal/a.pyd'], ['Y2.exe', '_internal/a.pyd']),
+    # 根目录有文件时 _internal 不能被当作外层目录展开
+    (['Y2.exe', '_internal/a.pyd'], ['Y2.exe', '_internal/a.pyd']),
+])
+def test_replace_files_uses_wrapper_directory(tmp_path, log_path, extract_tmp, names, expected):
+    zip_path = make_zip(tmp_path / 'update.zip', names)
+    target = tmp_path / 'install'
+    target.mkdir()
+
+    extract_dir, root_dirs = updater.extract_update(zip_path, str(target))
+    assert updater.replace_files(extract_dir, str(target), root_dirs)
+
+    assert sorted(
+        os.path.relpath(os.path.join(root, name), target).replace(os.sep, '/')
+        for root, _, files in os.walk(target) for name in files
+    ) == expected
+
+
+def test_extract_update_bad_zip(tmp_path, log_path, extract_tmp):
+    (tmp_path / 'update.zip').write_bytes(b'not a zip')
+
+    assert updater.extract_update(str(tmp_path / 'update.zip'), str(tmp_path)) == (None, None)
+    updater._log_writer.flush()
+    assert "解压失败" in read(log_path)
@@ -0,0 +1,415 @@
+# -*- coding: utf-8 -*-
+"""
+无界面更新命令行 - Y2订单处理辅助工具
+用于脚本化 / 批量更新，不导入 tkinter：
+
+    python -m update_module check                 检查是否有新版本
+    python -m update_module download [--jitter]   下载更新包
+    python -m update_module apply [--wait]        启动更新助手应用已下载的更新包
+    python -m update_module status                查看本地更新状态
+    python -m update_module verify [--repair]     按文件清单校验安装目录，可选修复
+    python -m update_module components [--install NAME]
+                                                  查看 / 安装可选组件
+    python -m update_module gui                   显示更新对话框（测试用）
+
+所有命令向标准输出打印一个 JSON 对象，包含 elapsed_seconds（本步骤耗时）。
+加 --profile（如 python -m update_module download --profile）时记录性能分析数据，见 update_profiling。
+"""
+
+import os
+import sys
+import json
+import time
+import argparse
+
+from update_core import CURRENT_VERSION, UpdateChecker, get_download_path, launch_updater
+from update_profiling import enable as enable_profiling, profiled
+
+# 退出码
+EXIT_OK = 0
+EXIT_ERROR = 1
+EXIT_USAGE = 2
+EXIT_CHECK_FAILED = 3
+EXIT_VERIFY_FAILED = 4
+EXIT_UPDATE_AVAILABLE = 10
+
+
+def _output(result, code):
+    """打印 JSON 结果并返回退出码"""
+    print(json.dumps(result, ensure_ascii=False, indent=2))
+    return code
+
+
+def _progress_printer(enabled):
+    """下载进度输出到标准错误，避免干扰 JSON 输出"""
+    if not enabled:
+        return None
+
+    state = {'last': 0.0}
+
+    def progress(current, total):
+        now = time.monotonic()
+        if now - state['last'] < 1 and current != total:
+            return
+        state['last'] = now
+        if total:
+            sys.stderr.write(f"\r下载中... {current / 1024 / 1024:.1f} / {total / 1024 / 1024:.1f} MB "
+                             f"({current / total * 100:.1f}%)")
+        else:
+            sys.stderr.write(f"\r下载中... {current / 1024 / 1024:.1f} MB")
+        sys.stderr.flush()
+
+    return progress
+
+
+def _check(checker):
+    """
+    检查更新
+    返回: (result dict, exit code)，有可用更新时 exit code 为 EXIT_UPDATE_AVAILABLE
+    """
+    has_update, version_info = checker.check_update()
+    result = {
+        'current_version': CURRENT_VERSION,
+        'latest_version': checker.latest_version,
+        'update_available': bool(has_update),
+        'force_update': bool(checker.force_update),
+        'rollout_deferred': checker.rollout_deferred,
+    }
+    if version_info is None:
+        result['error'] = checker.error_msg
+        return result, EXIT_CHECK_FAILED
+
+    if has_update:
+        plan = checker.plan_update() or []
+        result['changelog'] = checker.changelog
+        result['plan'] = [
+            {'type': step.get('type', 'full'), 'from': step.get('from'),
+             'to': step.get('to'), 'size': step.get('size', 0)}
+            for step in plan
+        ]
+        result['download_size'] = sum(int(step.get('size') or 0) for step in plan)
+        return result, EXIT_UPDATE_AVAILABLE
+    return result, EXIT_OK
+
+
+def cmd_check(args):
+    """check: 检查是否有新版本"""
+    start_time = time.perf_counter()
+    result, code = _check(UpdateChecker())
+    result['elapsed_seconds'] = round(time.perf_counter() - start_time, 3)
+    return _output(result, code)
+
+
+def cmd_download(args):
+    """download: 检查并下载更新包"""
+    start_time = time.perf_counter()
+    checker = UpdateChecker()
+    result, code = _check(checker)
+    if code != EXIT_UPDATE_AVAILABLE:
+        result['elapsed_seconds'] = round(time.perf_counter() - start_time, 3)
+        return _output(result, code)
+
+    if args.jitter:
+        import update_rollout
+
+        delay = update_rollout.get_download_delay(checker.version_info)
+        result['jitter_seconds'] = round(delay, 1)
+        time.sleep(delay)
+
+    download_path = args.output or get_download_path(checker.latest_version)
+    download_start = time.perf_counter()
+    success, error = checker.download_update(download_path, _progress_printer(args.progress))
+    if args.progress:
+        sys.stderr.write("\n")
+
+    result['download_seconds'] = round(time.perf_counter() - download_start, 3)
+    result['elapsed_seconds'] = round(time.perf_counter() - start_time, 3)
+    if not success:
+        result['error'] = error
+        return _output(result, EXIT_ERROR)
+
+    result['package_path'] = download_path
+    result['package_size'] = os.path.getsize(download_path)
+    return _output(result, EXIT_OK)
+
+
+def _latest_downloaded_package(verify=True):
+    """
+    状态存储中最近一次下载完成、仍存在且版本高于当前版本的更新包
+    不包括可选组件包和增量包链的中间文件；verify 为 True 时按记录的哈希重新校验
+    返回: (path, version)，没有时返回 (None, None)
+    """
+    import sqlite3
+    import hash_utils
+    import release_index
+    import update_state
+
+    try:
+        rows = update_state.get_store().get_completed_downloads(kind='update')
+    except (OSError, sqlite3.Error):
+        return None, None
+    for path, version, expected_hash in rows:
+        try:
+            if not version or release_index.compare_versions(version, CURRENT_VERSION) <= 0:
+                continue
+        except ValueError:
+            continue
+        if not os.path.exists(path):
+            continue
+        if verify and not hash_utils.hash_matches(expected_hash, path):
+            # 下载后被修改或不完整的文件不交给更新助手
+            continue
+        return path, version
+    return None, None
+
+
+def cmd_apply(args):
+    """apply: 启动更新助手应用更新包"""
+    from update_core import record_update_started
+
+    start_time = time.perf_counter()
+    package_path, version = args.package, None
+    if not package_path:
+        package_path, version = _latest_downloaded_package()
+    result = {'current_version': CURRENT_VERSION, 'package_path': package_path}
+
+    if not package_path or not os.path.exists(package_path):
+        result['error'] = "没有可应用的更新包（需高于当前版本且哈希校验通过），请先执行 download 或通过 --package 指定"
+        return _output(result, EXIT_ERROR)
+
+    record_update_started(CURRENT_VERSION, version, package_path)
+    process = launch_updater(package_path, restart=args.restart)
+    if process is None:
+        result['error'] = "找不到更新助手（updater.exe / updater.py）"
+        return _output(result, EXIT_ERROR)
+
+    result['updater_pid'] = process.pid
+    code = EXIT_OK
+    if args.wait:
+        result['updater_exit_code'] = process.wait()
+        if result['updater_exit_code'] != 0:
+            code = EXIT_ERROR
+    result['elapsed_seconds'] = round(time.perf_counter() - start_time, 3)
+    return _output(result, code)
+
+
+def cmd_status(args):
+    """status: 本地更新状态"""
+    import sqlite3
+    import update_state
+
+    start_time = time.perf_counter()
+    result = {'current_version': CURRENT_VERSION}
+    try:
+        store = update_state.get_store()
+        version_info = store.get_meta('version_info') or {}
+        result['cached_latest_version'] = version_info.get('version')
+        result['install_id'] = store.get_meta('install_id')
+        result['relay'] = store.get_meta('relay_url') or (store.get_meta('relay_discovered') or {}).get('url')
+        result['history'] = store.get_history(limit=args.limit)
+        result['timings'] = store.get_timings(limit=args.limit)
+        # 只查看状态时不重新计算哈希
+        package_path, version = _latest_downloaded_package(verify=False)
+        result['downloaded_package'] = {'path': package_path, 'version': version} if package_path else None
+    except (OSError, sqlite3.Error) as e:
+        result['error'] = str(e)
+        return _output(result, EXIT_ERROR)
+    result['elapsed_seconds'] = round(time.perf_counter() - start_time, 3)
+    return _output(result, EXIT_OK)
+
+
+def _get_version_info():
+    """获取发布索引：优先在线获取，失败时使用状态存储中缓存的版本信息"""
+    import sqlite3
+    import update_state
+
+    checker = UpdateChecker()
+    checker.check_update()
+    if checker.version_info:
+        return checker.version_info
+    try:
+        return update_state.get_store().get_meta('version_info')
+    except (OSError, sqlite3.Error):
+        return None
+
+
+def cmd_verify(args):
+    """verify: 按文件清单校验安装目录"""
+    import hash_utils
+    import install_verify
+    from update_core import get_install_dir, record_timing
+
+    start_time = time.perf_counter()
+    install_dir = os.path.abspath(args.install_dir or get_install_dir())
+    result = {'current_version': CURRENT_VERSION, 'install_dir': install_dir}
+
+    manifest = install_verify.load_manifest(install_dir)
+    if manifest is None:
+        result['error'] = f"找不到文件清单 {install_verify.INSTALL_MANIFEST}，无法校验"
+        return _output(result, EXIT_ERROR)
+
+    import update_components
+
+    components = update_components.get_installed_components(install_dir, manifest)
+    cache = None if args.full else hash_utils.HashCache(install_verify.HASH_CACHE_PATH)
+    verify = install_verify.verify_install(install_dir, manifest, cache, args.workers, components)
+    record_timing('verify', verify['seconds'], verify['version'])
+
+    result.update({
+        'manifest_version': verify['version'],
+        'files': verify['files'],
+        'hashed': verify['hashed'],
+        'cached': verify['cached'],
+        'hashed_size': verify['hashed_size'],
+        'missing': verify['missing'],
+        'mismatched': verify['mismatched'],
+        'stale': verify['stale'],
+        'verify_seconds': round(verify['seconds'], 3),
+    })
+    healthy = not (verify['missing'] or verify['mismatched'] or verify['stale'])
+
+    if not healthy and args.repair:
+        repair = install_verify.repair_install(
+            install_dir, verify, manifest, _get_version_info(), args.package, sorted(components)
+        )
+        record_timing('repair', repair['seconds'], verify['version'])
+        result['repair'] = {
+            'repaired': repair['repaired'],
+            'removed': repair['removed'],
+            'failed': repair['failed'],
+            'sources': repair['sources'],
+            'seconds': round(repair['seconds'], 3),
+        }
+        healthy = not repair['failed']
+
+    result['healthy'] = healthy
+    result['elapsed_seconds'] = round(time.perf_counter() - start_time, 3)
+    return _output(result, EXIT_OK if healthy else EXIT_VERIFY_FAILED)
+
+
+def cmd_components(args):
+    """components: 查看 / 安装可选组件"""
+    import install_verify
+    import update_components
+    from update_core import get_install_dir
+
+    start_time = time.perf_counter()
+    install_dir = os.path.abspath(args.install_dir or get_install_dir())
+    manifest = install_verify.load_manifest(install_dir)
+    available = update_components.get_manifest_components(manifest)
+    result = {'current_version': CURRENT_VERSION, 'install_dir': install_dir}
+
+    code = EXIT_OK
+    if args.install:
+        if args.install not in available:
+            result['error'] = f"未知的组件: {args.install}"
+            return _output(result, EXIT_USAGE)
+        success, error = update_components.install_component(
+            args.install, install_dir, _progress_printer(args.progress)
+        )
+        if args.progress:
+            sys.stderr.write("\n")
+        result['installed'] = args.install if success else None
+        if not success:
+            result['error'] = error
+            code = EXIT_ERROR
+
+    result['components'] = [
+        {
+            'name': name,
+            'files': len(files),
+            'size': sum(manifest['files'][rel_path]['size'] for rel_path in files),
+            'installed': update_components.is_component_installed(name, install_dir),
+        }
+        for name, files in sorted(available.items())
+    ]
+    result['elapsed_seconds'] = round(time.perf_counter() - start_time, 3)
+    return _output(result, code)
+
+
+def cmd_gui(args):
+    """gui: 显示更新对话框"""
+    import tkinter as tk
+    from update_module import check_for_updates
+
+    root = tk.Tk()
+    root.withdraw()
+    check_for_updates(root)
+    return EXIT_OK
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(
+        prog='python -m update_module',
+        description="Y2订单处理辅助工具 - 无界面更新命令行"
+    )
+    profile_help = "记录性能分析数据（cProfile、tracemalloc、RSS 峰值），也传递给更新助手"
+    parser.add_argument('--profile', action='store_true', help=profile_help)
+    # 子命令也接受 --profile（如 download --profile）；SUPPRESS 避免子命令的默认值覆盖前面的设置
+    common = argparse.ArgumentParser(add_help=False)
+    common.add_argument('--profile', action='store_true', default=argparse.SUPPRESS, help=profile_help)
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    def add_command(name, **kwargs):
+        return subparsers.add_parser(name, parents=[common], **kwargs)
+
+    add_command('check', help="检查是否有新版本（有更新时退出码为 10）")
+
+    download = add_command('download', help="下载更新包")
+    download.add_argument('--output', default=None, help="保存路径（默认系统临时目录）")
+    download.add_argument('--jitter', action='store_true', help="按安装 ID 错峰等待后再下载")
+    download.add_argument('--progress', action='store_true', help="在标准错误输出下载进度")
+
+    apply = add_command('apply', help="启动更新助手应用更新包")
+    apply.add_argument('--package', default=None, help="更新包路径（默认最近一次下载、版本高于当前版本且哈希校验通过的更新包）")
+    apply.add_argument('--wait', action='store_true', help="等待更新助手结束并返回其结果")
+    apply.add_argument('--restart', action='store_true', help="更新完成后重启主程序")
+
+    status = add_command('status', help="查看本地更新状态")
+    status.add_argument('--limit', type=int, default=10, help="显示的历史记录条数")
+
+    verify = add_command('verify', help="按文件清单校验安装目录（有问题时退出码为 4）")
+    verify.add_argument('--repair', action='store_true', help="重新获取缺失或损坏的文件并清理 .old 文件")
+    verify.add_argument('--full', action='store_true', help="忽略哈希缓存，重新计算全部文件的哈希")
+    verify.add_argument('--install-dir', default=None, help="安装目录（默认当前程序所在目录）")
+    verify.add_argument('--package', default=None, help="修复时使用的本地更新包（默认查找同版本的已下载更新包）")
+    verify.add_argument('--workers', type=int, default=None, help="并行计算哈希的线程数")
+
+    components = add_command('components', help="查看 / 安装可选组件")
+    components.add_argument('--install', default=None, metavar='NAME', help="下载并安装指定组件")
+    components.add_argument('--install-dir', default=None, help="安装目录（默认当前程序所在目录）")
+    components.add_argument('--progress', action='store_true', help="在标准错误输出下载进度")
+
+    add_command('gui', help="显示更新对话框（测试用）")
+    return parser
+
+
+COMMANDS = {
+    'check': cmd_check,
+    'download': cmd_download,
+    'apply': cmd_apply,
+    'status': cmd_status,
+    'verify': cmd_verify,
+    'components': cmd_components,
+    'gui': cmd_gui,
+}
+
+
+def main(argv=None):
+    """命令行入口，返回退出码"""
+    args = build_parser().parse_args(argv)
+    if args.profile:
+        # argv 由调用方传入时 sys.argv 中没有 --profile，在进入分析会话前开启
+        enable_profiling()
+    return _run(args)
+
+
+@profiled('cli')
+def _run(args):
+    """执行子命令（开启性能分析时整个子命令在一个会话中记录）"""
+    try:
+        return COMMANDS[args.command](args)
+    except KeyboardInterrupt:
+        return EXIT_ERROR
+    except Exception as e:
+        return _output({'command': args.command, 'error': str(e)}, EXIT_ERROR)
@@ -0,0 +1,287 @@
+# -*- coding: utf-8 -*-
+"""
+可选组件按需安装 - Y2订单处理辅助工具
+发布包只包含核心组件；体积大、使用少的部分（如 pandas / openpyxl、图片素材、模板）
+打包为单独的可选组件，在程序第一次需要时才在后台下载、校验并安装。
+
+- 组件包含哪些文件由安装目录的文件清单 __manifest__.json 中的 component 字段决定
+- 组件包的下载地址在 version.json 对应版本记录的 components 中
+- 已安装的组件及其版本记录在安装目录的 __components__.json 中；
+  程序更新后组件版本不一致，下次使用时重新获取
+
+用法（通过 update_module）：
+
+    from update_module import ensure_component
+
+    def on_ready(success, error):
+        # 组件尚未可用时才回调，且总在后台线程中调用，界面操作需通过 root.after 切回主线程
+        ...
+
+    if ensure_component('excel', on_ready):
+        ...  # 已安装，可直接使用（不会再回调 on_ready）
+"""
+
+import os
+import json
+import time
+import threading
+
+from update_core import CURRENT_VERSION, UpdateChecker, get_install_dir, record_timing
+
+# 安装目录中记录已安装组件的文件
+COMPONENTS_FILE = '__components__.json'
+
+_pending = {}
+_pending_lock = threading.Lock()
+_file_lock = threading.Lock()
+
+
+def get_manifest_components(manifest):
+    """清单中的可选组件，返回 {组件名: [相对路径]}"""
+    components = {}
+    for rel_path, entry in (manifest or {}).get('files', {}).items():
+        if entry.get('component'):
+            components.setdefault(entry['component'], []).append(rel_path)
+    return components
+
+
+def load_installed_components(install_dir):
+    """已安装的组件，返回 {组件名: 版本}"""
+    try:
+        with open(os.path.join(install_dir, COMPONENTS_FILE), 'r', encoding='utf-8') as f:
+            installed = json.load(f)
+    except (OSError, ValueError):
+        return {}
+    return installed if isinstance(installed, dict) else {}
+
+
+def _mark_installed(install_dir, name, version):
+    """记录组件已安装（先写临时文件再替换）"""
+    with _file_lock:
+        installed = load_installed_components(install_dir)
+        installed[name] = version
+        path = os.path.join(install_dir, COMPONENTS_FILE)
+        temp_path = f"{path}.tmp"
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            json.dump(installed, f, ensure_ascii=False, indent=2)
+        os.replace(temp_path, path)
+
+
+def get_installed_components(install_dir, manifest=None):
+    """与清单版本一致的已安装组件名集合"""
+    import install_verify
+
+    manifest = manifest or install_verify.load_manifest(install_dir) or {}
+    version = manifest.get('version') or CURRENT_VERSION
+    return {
+        name for name, installed_version in load_installed_components(install_dir).items()
+        if installed_version == version
+    }
+
+
+def _component_files(name, install_dir):
+    """组件在清单中的文件，返回 (清单, [相对路径], 版本)；没有清单或清单中没有该组件时文件为 None"""
+    import install_verify
+
+    manifest = install_verify.load_manifest(install_dir)
+    files = get_manifest_components(manifest).get(name)
+    version = (manifest or {}).get('version') or CURRENT_VERSION
+    return manifest, files, version
+
+
+def is_component_recorded(name, install_dir=None):
+    """
+    快速判断组件是否已安装（不计算哈希，可在界面线程中调用）
+    没有文件清单（开发环境）或清单中没有该组件时视为已安装；
+    否则需要有当前版本的安装记录，且每个文件存在、大小与清单一致
+    """
+    install_dir = install_dir or get_install_dir()
+    manifest, files, version = _component_files(name, install_dir)
+    if not files:
+        return True
+    if load_installed_components(install_dir).get(name) != version:
+        return False
+    for rel_path in files:
+        try:
+            if os.path.getsize(os.path.join(install_dir, rel_path)) != manifest['files'][rel_path].get('size'):
+                return False
+        except OSError:
+            return False
+    return True
+
+
+def is_component_installed(name, install_dir=None):
+    """
+    组件是否已安装且与当前版本一致
+    没有安装记录时按清单校验组件的每个文件（哈希结果缓存，下次只计算变化的文件），
+    组件较大时耗时较长，界面线程中应使用 is_component_recorded
+    """
+    import install_verify
+    import hash_utils
+
+    install_dir = install_dir or get_install_dir()
+    if is_component_recorded(name, install_dir):
+        return True
+
+    # 通过安装程序完整安装时没有记录：每个文件的大小和哈希都与清单一致才视为已安装，
+    # 避免把旧版本或混合版本中大小恰好相同的文件当作当前版本的组件
+    manifest, files, version = _component_files(name, install_dir)
+    component_manifest = {
+        'version': version,
+        'files': {rel_path: manifest['files'][rel_path] for rel_path in files},
+    }
+    result = install_verify.verify_install(
+        install_dir, component_manifest, cache=hash_utils.HashCache(install_verify.HASH_CACHE_PATH)
+    )
+    if result['missing'] or result['mismatched']:
+        return False
+    try:
+        _mark_installed(install_dir, name, version)
+    except OSError:
+        pass
+    return True
+
+
+def find_component_artifact(version_info, name, version):
+    """发布索引中指定版本的组件包，没有时返回 None"""
+    import release_index
+
+    for release in release_index.get_releases(version_info or {}):
+        try:
+            if release_index.compare_versions(release['version'], version) != 0:
+                continue
+        except ValueError:
+            continue
+        component = (release.get('components') or {}).get(name)
+        if component and component.get('url'):
+            return component
+    return None
+
+
+def _get_component_artifact(name, version):
+    """先查缓存的版本信息，找不到时在线获取"""
+    import sqlite3
+    import update_state
+
+    try:
+        artifact = find_component_artifact(update_state.get_store().get_meta('version_info'), name, version)
+    except (OSError, sqlite3.Error):
+        artifact = None
+    if artifact:
+        return artifact, None
+
+    checker = UpdateChecker()
+    checker.check_update()
+    if checker.version_info is None:
+        return None, checker.error_msg or "无法获取版本信息"
+    return find_component_artifact(checker.version_info, name, version), None
+
+
+def install_component(name, install_dir=None, progress_callback=None):
+    """
+    下载并安装一个可选组件（阻塞）
+    组件包整体校验哈希后，每个文件再按清单校验并原子替换
+    返回: (success: bool, error: str)
+    """
+    import zipfile
+    import tempfile
+    import install_verify
+
+    start_time = time.perf_counter()
+    install_dir = install_dir or get_install_dir()
+    manifest, files, version = _component_files(name, install_dir)
+    if not files:
+        return False, f"未知的组件: {name}"
+
+    artifact, error = _get_component_artifact(name, version)
+    if artifact is None:
+        return False, error or f"发布索引中没有 {version} 版本的组件 {name}"
+
+    package_path = os.path.join(tempfile.gettempdir(), f"Y2订单处理辅助工具_{name}_{version}.zip")
+    success, error = UpdateChecker().download_artifact(artifact, package_path, progress_callback, kind='component')
+    if not success:
+        return False, error
+
+    try:
+        with zipfile.ZipFile(package_path, 'r') as zip_ref:
+            # 先确认成员齐全，避免只替换了一部分文件
+            members = set(zip_ref.namelist())
+            for rel_path in files:
+                if rel_path not in members:
+                    return False, f"组件包中缺少文件: {rel_path}"
+            for rel_path in files:
+                install_verify.restore_member(
+                    zip_ref, rel_path, os.path.join(install_dir, rel_path),
+                    manifest['files'][rel_path].get('hash')
+                )
+        _mark_installed(install_dir, name, version)
+    except Exception as e:
+        return False, str(e)
+    finally:
+        if os.path.exists(package_path):
+            os.remove(package_path)
+
+    record_timing(f'component:{name}', time.perf_counter() - start_time, version)
+    return True, None
+
+
+def _install_worker(name, install_dir):
+    """
+    后台安装线程：先按哈希确认已有的文件（如通过安装程序安装、没有记录时），
+    不一致时才下载安装；完成后依次通知所有等待该组件的回调
+    """
+    try:
+        if is_component_installed(name, install_dir):
+            success, error = True, None
+        else:
+            success, error = install_component(name, install_dir)
+    except Exception as e:
+        success, error = False, str(e)
+
+    with _pending_lock:
+        entry = _pending.pop(name)
+    entry['result'] = (success, error)
+    for callback in entry['callbacks']:
+        try:
+            callback(success, error)
+        except Exception:
+            pass
+
+
+def ensure_component(name, callback=None, wait=False, install_dir=None):
+    """
+    确保可选组件可用
+    调用线程中只检查安装记录和文件大小（不计算哈希）：已安装时直接返回 True，不调用 callback；
+    否则在后台线程中校验已有文件，不一致时下载安装（同一组件只会安装一次），
+    完成后在后台线程中回调 callback(success, error)。
+
+    Args:
+        name: 组件名
+        callback: 完成回调；已安装、直接返回 True 时不调用，否则安装完成后在后台线程中调用
+        wait: 是否等待安装完成
+        install_dir: 安装目录（默认当前程序所在目录）
+
+    Returns:
+        bool: 组件当前是否可用（wait=True 时为安装结果）
+    """
+    install_dir = install_dir or get_install_dir()
+    if is_component_recorded(name, install_dir):
+        return True
+
+    with _pending_lock:
+        entry = _pending.get(name)
+        if entry is None:
+            entry = {'callbacks': [], 'result': None}
+            entry['thread'] = threading.Thread(
+                target=_install_worker, args=(name, install_dir),
+                name=f'component-{name}', daemon=True
+            )
+            _pending[name] = entry
+            entry['thread'].start()
+        if callback:
+            entry['callbacks'].append(callback)
+
+    if not wait:
+        return False
+    entry['thread'].join()
+    return entry['result'][0]
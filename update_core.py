@@ -0,0 +1,509 @@
+# -*- coding: utf-8 -*-
+"""
+更新检查核心 - Y2订单处理辅助工具
+功能：版本检查、下载更新包、本地更新状态记录
+本模块不依赖 tkinter，可在无界面环境（命令行、更新助手）中导入。
+较重的依赖（requests、hashlib、sqlite3 等）均在首次使用时才导入，
+以降低程序启动时的导入开销。
+"""
+
+import os
+import sys
+import time
+
+from update_profiling import profiled
+
+# 版本信息
+CURRENT_VERSION = "1.9.0"
+# GitHub 主更新源（使用 GitHub Pages 或 raw 方式）
+VERSION_CHECK_URL = "https://raw.githubusercontent.com/chxwy/Y2Tool/main/docs/version.json"
+# 备用更新源（可以换成 Gitee 或其他镜像）
+BACKUP_CHECK_URL = "https://gitee.com/chxwy/Y2Tool/raw/main/docs/version.json"
+
+# 本地配置目录
+CONFIG_DIR = os.path.join(os.path.expanduser('~'), '.Y2订单处理辅助工具')
+
+# 局域网更新中继（见 update_relay.py）：环境变量指定地址，设为 off 时禁用，
+# 设为 auto 时通过 UDP 广播自动发现
+RELAY_ENV = 'Y2_UPDATE_RELAY'
+# 中继正在从上游缓存文件时，客户端最多等待的时间（秒），超时后改从原始地址下载
+RELAY_WAIT_TIMEOUT = 30 * 60
+# 两次询问中继之间的最长间隔（秒），不论 Retry-After 为多少
+RELAY_MAX_RETRY_AFTER = 30
+# 自动发现结果的缓存时间（秒），找不到中继时同样缓存，避免每次检查都等待广播
+RELAY_DISCOVERY_TTL = 3600
+
+
+class UpdateChecker:
+    """更新检查器"""
+
+    def __init__(self):
+        self.latest_version = None
+        self.download_url = None
+        self.changelog = []
+        self.force_update = False
+        self.file_size = 0
+        self.file_hash = None
+        self.error_msg = None
+        self.version_info = None
+        # 有新版本但本实例尚未进入分批发布范围
+        self.rollout_deferred = False
+        self._relay_url = None
+        self._relay_checked = False
+
+    @profiled('check')
+    def check_update(self, use_backup=False):
+        """
+        检查是否有新版本
+        依次尝试主更新源和备用更新源；版本信息（含哈希）只从更新源获取，不经过局域网中继
+        返回: (has_update: bool, version_info: dict)
+        """
+        urls = [BACKUP_CHECK_URL] if use_backup else [VERSION_CHECK_URL, BACKUP_CHECK_URL]
+        for url in urls:
+            result = self._check_source(url)
+            if result is not None:
+                return result
+        return False, None
+
+    def _check_source(self, url):
+        """
+        从单个更新源检查版本
+        返回: (has_update, version_info)，更新源不可用时返回 None
+        """
+        try:
+            import requests
+            import release_index
+
+            start_time = time.perf_counter()
+            response = requests.get(url, timeout=10)
+            response.raise_for_status()
+
+            version_info = response.json()
+            record_timing('check', time.perf_counter() - start_time)
+            self._cache_version_info(version_info)
+            self.version_info = version_info
+            self.latest_version = release_index.get_latest_version(version_info) or '0.0.0'
+            self.download_url = version_info.get('download_url', '')
+            self.changelog = version_info.get('changelog', [])
+            self.force_update = version_info.get('force_update', False)
+            self.file_size = version_info.get('file_size', 0)
+            self.file_hash = version_info.get('hash', '')
+
+            # 当前版本低于最低支持版本时强制更新
+            min_version = version_info.get('min_version')
+            if min_version and self._compare_version(CURRENT_VERSION, min_version):
+                self.force_update = True
+                version_info['force_update'] = True
+
+            # 版本号比较
+            has_update = self._compare_version(CURRENT_VERSION, self.latest_version)
+
+            # 分批发布：强制更新不受发布比例限制
+            self.rollout_deferred = False
+            if has_update and not self.force_update:
+                import update_rollout
+
+                if not update_rollout.is_in_rollout(version_info, self.latest_version):
+                    self.rollout_deferred = True
+                    has_update = False
+
+            return has_update, version_info
+
+        except Exception as e:
+            self.error_msg = str(e)
+            return None
+
+    def _cache_version_info(self, version_info):
+        """缓存最近一次获取的版本信息"""
+        import sqlite3
+
+        try:
+            _get_store().set_meta('version_info', version_info)
+        except (OSError, sqlite3.Error):
+            pass
+
+    def _compare_version(self, current, latest):
+        """比较版本号，返回 True 如果有新版本"""
+        import release_index
+
+        try:
+            return release_index.compare_versions(latest, current) > 0
+        except ValueError:
+            return False
+
+    def plan_update(self, exclude=()):
+        """
+        规划从当前版本到最新版本的下载路径（增量包链或完整包）
+        返回: [step, ...]，没有发布索引或没有可用路径时返回 None
+        """
+        import release_index
+
+        if not self.version_info or not self.latest_version:
+            return None
+        try:
+            return release_index.plan_update_path(
+                self.version_info, CURRENT_VERSION, self.latest_version, exclude=exclude
+            )
+        except ValueError:
+            return None
+
+    def download_update(self, download_path, progress_callback=None):
+        """
+        下载更新包
+        有多版本发布索引时按总下载量最少的路径下载（增量包链或完整包），
+        增量包缺失或下载失败时重新规划，最终回退到完整包。
+        progress_callback: 回调函数(current_size, total_size)
+        """
+        import release_index
+
+        excluded = set()
+        while True:
+            plan = self.plan_update(exclude=excluded)
+            if not plan:
+                if excluded:
+                    return False, self.error_msg or "没有可用的更新路径"
+                # 没有发布索引：按旧格式直接下载完整包
+                return self.download_artifact(
+                    {'url': self.download_url, 'hash': self.file_hash, 'size': self.file_size},
+                    download_path, progress_callback
+                )
+
+            if len(plan) == 1 and plan[0].get('type', 'full') == 'full':
+                step = plan[0]
+                success, error = self.download_artifact(step, download_path, progress_callback)
+                if success:
+                    return True, None
+                excluded.add(step['url'])
+                self.error_msg = error
+                continue
+
+            # 下载增量包链
+            total_size = sum(int(step.get('size') or 0) for step in plan)
+            done_size = 0
+            step_paths = []
+            failed_step = None
+            for i, step in enumerate(plan):
+                step_path = f"{download_path}.part{i}"
+
+                def step_progress(current, total, offset=done_size):
+                    if progress_callback:
+                        progress_callback(offset + current, total_size)
+
+                success, error = self.download_artifact(step, step_path, step_progress, kind='part')
+                if not success:
+                    failed_step = step
+                    self.error_msg = error
+                    break
+                step_paths.append(step_path)
+                done_size += int(step.get('size') or 0)
+
+            try:
+                if failed_step is None:
+                    import hash_utils
+
+                    release_index.merge_packages(step_paths, download_path)
+                    # 记录合并后的更新包及其哈希，供命令行 apply 使用前校验
+                    merged_hash = hash_utils.format_hash(hash_utils.file_digest(download_path))
+                    self._record_download('+'.join(step['url'] for step in plan), download_path,
+                                          'completed', total_size, total_size, merged_hash)
+                    return True, None
+            except Exception as e:
+                return False, str(e)
+            finally:
+                for step_path in step_paths:
+                    if os.path.exists(step_path):
+                        os.remove(step_path)
+
+            # 这一环不可用，排除后重新规划
+            excluded.add(failed_step['url'])
+
+    def download_artifact(self, artifact, download_path, progress_callback=None, kind='update'):
+        """
+        下载一个制品
+        配置了局域网中继且更新源给出了哈希时先从中继下载，按该哈希校验；
+        中继不可用或校验失败时改从原始地址下载
+        kind: 下载记录的类型（update / part / component，见 update_state）
+        返回: (success: bool, error: str)
+        """
+        relay_file_url = self._get_relay_file_url(artifact)
+        if relay_file_url and self._wait_for_relay(relay_file_url, artifact.get('size', 0), progress_callback):
+            success, error = self._download_file(
+                relay_file_url, download_path, artifact.get('hash'),
+                artifact.get('size', 0), progress_callback, kind
+            )
+            if success:
+                return True, None
+
+        return self._download_file(
+            artifact['url'], download_path, artifact.get('hash'),
+            artifact.get('size', 0), progress_callback, kind
+        )
+
+    def _get_relay_file_url(self, artifact):
+        """制品经局域网中继下载的地址；没有中继或没有可校验的哈希时返回 None"""
+        import hash_utils
+
+        if not hash_utils.parse_hash(artifact.get('hash'))[1]:
+            # 没有哈希就无法确认中继提供的内容，只从原始地址下载
+            return None
+        if not self._relay_checked:
+            self._relay_url = find_relay_url()
+            self._relay_checked = True
+        if not self._relay_url:
+            return None
+
+        import update_relay
+
+        return update_relay.relay_file_url(self._relay_url, artifact['url'])
+
+    def _wait_for_relay(self, url, expected_size, progress_callback=None):
+        """
+        等待中继缓存好文件
+        中继回复 503 时按 Retry-After 重试，而不是立即改从外网下载
+        返回: 中继是否可以提供该文件
+        """
+        import requests
+
+        deadline = time.monotonic() + RELAY_WAIT_TIMEOUT
+        while True:
+            try:
+                response = requests.head(url, timeout=10)
+            except requests.RequestException:
+                return False
+            if response.status_code != 503:
+                return response.ok
+            try:
+                retry_after = int(response.headers.get('Retry-After', ''))
+            except ValueError:
+                return False
+            retry_after = min(max(retry_after, 1), RELAY_MAX_RETRY_AFTER)
+            if time.monotonic() + retry_after > deadline:
+                return False
+            if progress_callback:
+                progress_callback(0, expected_size)
+            time.sleep(retry_after)
+
+    def _download_file(self, url, download_path, expected_hash, expected_size, progress_callback=None,
+                       kind='update'):
+        """
+        下载单个文件并校验哈希
+        没有期望哈希时记录下载内容的哈希，之后使用该文件前可以确认它没有变化
+        返回: (success: bool, error: str)
+        """
+        self._record_download(url, download_path, 'downloading',
+                              expected_size, 0, expected_hash, kind)
+
+        downloaded = 0
+        total_size = expected_size or 0
+        start_time = time.perf_counter()
+        try:
+            import requests
+            import hash_utils
+            import download_writer
+
+            # version.json 中的哈希为空时跳过校验
+            algorithm, expected_digest = hash_utils.parse_hash(expected_hash)
+
+            with requests.get(url, stream=True, timeout=30) as response:
+                response.raise_for_status()
+
+                total_size = int(response.headers.get('content-length', 0))
+                if total_size == 0:
+                    total_size = expected_size
+
+                # 预分配、自适应块大小，写入时同时计算哈希
+                downloaded, digest = download_writer.write_response(
+                    response, download_path, total_size or 0, progress_callback, algorithm
+                )
+
+            if expected_digest and digest != expected_digest:
+                os.remove(download_path)
+                self._record_download(url, download_path, 'failed',
+                                      total_size, downloaded, expected_hash, kind)
+                return False, "文件校验失败"
+
+            self._record_download(url, download_path, 'completed',
+                                  total_size, downloaded, hash_utils.format_hash(digest, algorithm),
+                                  kind)
+            record_timing('download', time.perf_counter() - start_time, self.latest_version)
+            return True, None
+
+        except Exception as e:
+            if os.path.exists(download_path):
+                os.remove(download_path)
+            self._record_download(url, download_path, 'failed',
+                                  total_size, downloaded, expected_hash, kind)
+            return False, str(e)
+
+    def _record_download(self, url, download_path, status,
+                         total_size, downloaded, expected_hash, kind='update'):
+        """记录下载状态，存储不可用时忽略"""
+        import sqlite3
+
+        try:
+            _get_store().record_download(url, download_path, status,
+                                         version=self.latest_version, total_size=total_size or 0,
+                                         downloaded=downloaded, expected_hash=expected_hash, kind=kind)
+        except (OSError, sqlite3.Error):
+            pass
+
+    def _calculate_hash(self, file_path):
+        """计算文件 SHA256 哈希"""
+        import hash_utils
+
+        return hash_utils.file_digest(file_path)
+
+
+def get_download_path(version):
+    """更新包的下载位置（系统临时目录）"""
+    import tempfile
+
+    return os.path.join(tempfile.gettempdir(), f"Y2订单处理辅助工具_update_{version}.zip")
+
+
+def get_install_dir():
+    """当前程序的安装目录"""
+    if getattr(sys, 'frozen', False):
+        # PyInstaller 打包后的路径
+        current_dir = os.path.dirname(sys.executable)
+        # 如果是 onefile 模式，sys.executable 就是主程序
+        # 如果是 onedir 模式，sys.executable 在 _internal 或同级目录
+        if '_internal' in current_dir:
+            current_dir = os.path.dirname(current_dir)
+        return current_dir
+    # 开发环境
+    return os.path.dirname(os.path.abspath(__file__))
+
+
+def launch_updater(update_package_path, restart=True):
+    """
+    启动更新助手程序
+    优先使用独立的 updater.exe，没有时以 Python 脚本方式运行 updater.py
+
+    Args:
+        update_package_path: 已下载的更新包
+        restart: 更新完成后是否重启主程序
+
+    Returns:
+        subprocess.Popen: 更新助手进程；找不到更新助手时返回 None
+    """
+    import subprocess
+
+    current_dir = get_install_dir()
+    main_exe = sys.executable if getattr(sys, 'frozen', False) else ''
+    extra_args = [] if restart else ['--no-restart']
+
+    # 更新助手路径
+    updater_path = os.path.join(current_dir, 'updater.exe')
+
+    # 如果更新助手不存在，使用内置方法
+    if not os.path.exists(updater_path):
+        updater_path = os.path.join(current_dir, '_internal', 'updater.exe')
+
+    if os.path.exists(updater_path):
+        return subprocess.Popen(
+            [updater_path, update_package_path, current_dir, main_exe] + extra_args,
+            shell=False
+        )
+
+    # 如果没有独立的更新助手，使用 Python 脚本方式
+    updater_script = os.path.join(current_dir, 'updater.py')
+    if os.path.exists(updater_script):
+        return subprocess.Popen(
+            [sys.executable, updater_script, update_package_path, current_dir, main_exe] + extra_args,
+            shell=False
+        )
+
+    return None
+
+
+def find_relay_url():
+    """
+    查找局域网更新中继
+    优先使用环境变量 Y2_UPDATE_RELAY，其次是状态存储中配置的 relay_url；
+    环境变量为 auto 或状态存储中 relay_discovery 为 true 时通过 UDP 广播自动发现
+    （结果缓存 RELAY_DISCOVERY_TTL 秒）。自动发现默认关闭：局域网内任何主机都能应答广播，
+    虽然下载内容按更新源的哈希校验，仍只应在受信任的网络中开启。
+    返回: 中继地址，没有中继时返回 None
+    """
+    import sqlite3
+
+    setting = os.environ.get(RELAY_ENV, '').strip()
+    if setting.lower() == 'off':
+        return None
+    if setting and setting.lower() != 'auto':
+        return setting
+    auto = setting.lower() == 'auto'
+
+    try:
+        store = _get_store()
+        url = store.get_meta('relay_url')
+        if url:
+            return url
+        auto = auto or bool(store.get_meta('relay_discovery'))
+        if not auto:
+            return None
+        discovered = store.get_meta('relay_discovered', max_age=RELAY_DISCOVERY_TTL)
+        if discovered is not None:
+            return discovered.get('url')
+    except (OSError, sqlite3.Error):
+        store = None
+    if not auto:
+        return None
+
+    import update_relay
+
+    url = update_relay.discover_relay()
+    if store is not None:
+        try:
+            store.set_meta('relay_discovered', {'url': url})
+        except (OSError, sqlite3.Error):
+            pass
+    return url
+
+
+def _get_store():
+    """本地更新状态存储（按需导入 sqlite3）"""
+    import update_state
+
+    return update_state.get_store()
+
+
+def save_skip_version(version):
+    """保存跳过的版本号"""
+    import sqlite3
+
+    try:
+        _get_store().skip_version(version)
+    except (OSError, sqlite3.Error):
+        pass
+
+
+def is_version_skipped(version):
+    """检查用户是否跳过了此版本（7天内跳过的版本不再提示）"""
+    import sqlite3
+
+    try:
+        return _get_store().is_version_skipped(version)
+    except (OSError, sqlite3.Error):
+        return False
+
+
+def record_timing(phase, seconds, version=None):
+    """记录更新各阶段耗时，存储不可用时忽略"""
+    import sqlite3
+
+    try:
+        _get_store().record_timing(phase, seconds, version)
+    except (OSError, sqlite3.Error):
+        pass
+
+
+def record_update_started(from_version, to_version, package_path):
+    """记录即将由更新助手应用的更新，存储不可用时忽略"""
+    import sqlite3
+
+    try:
+        _get_store().begin_update(from_version, to_version, package_path)
+    except (OSError, sqlite3.Error):
+        pass
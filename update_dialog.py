@@ -0,0 +1,227 @@
+# -*- coding: utf-8 -*-
+"""
+更新对话框 - Y2订单处理辅助工具
+功能：新版本提示、下载进度显示、启动更新助手
+本模块依赖 tkinter，仅在需要显示更新对话框时由 update_module 按需导入。
+"""
+
+import threading
+import tkinter as tk
+from tkinter import ttk, messagebox
+
+from update_core import (
+    CURRENT_VERSION,
+    save_skip_version,
+    record_update_started,
+    get_download_path,
+    get_install_dir,
+    launch_updater,
+)
+from update_profiling import profiled
+
+
+class UpdateDialog:
+    """更新提示对话框"""
+    
+    def __init__(self, parent, version_info, checker):
+        self.checker = checker
+        self.result = None
+        
+        self.dialog = tk.Toplevel(parent)
+        self.dialog.title(f"发现新版本 - {version_info['version']}")
+        self.dialog.geometry("500x400")
+        self.dialog.resizable(False, False)
+        self.dialog.transient(parent)
+        self.dialog.grab_set()
+        
+        # 居中显示
+        self.dialog.update_idletasks()
+        x = (self.dialog.winfo_screenwidth() - 500) // 2
+        y = (self.dialog.winfo_screenheight() - 400) // 2
+        self.dialog.geometry(f"+{x}+{y}")
+        
+        self._create_ui(version_info)
+        
+    def _create_ui(self, version_info):
+        """创建对话框UI"""
+        # 标题
+        title_frame = ttk.Frame(self.dialog, padding="20")
+        title_frame.pack(fill='x')
+        
+        ttk.Label(
+            title_frame,
+            text="🎉 发现新版本",
+            font=('Microsoft YaHei UI', 16, 'bold'),
+            foreground='#2E86AB'
+        ).pack()
+        
+        ttk.Label(
+            title_frame,
+            text=f"当前版本: {CURRENT_VERSION}  →  最新版本: {version_info['version']}",
+            font=('Microsoft YaHei UI', 10)
+        ).pack(pady=(10, 0))
+        
+        # 更新日志
+        log_frame = ttk.LabelFrame(self.dialog, text="更新内容", padding="10")
+        log_frame.pack(fill='both', expand=True, padx=20, pady=10)
+        
+        log_text = tk.Text(
+            log_frame,
+            wrap='word',
+            font=('Microsoft YaHei UI', 10),
+            height=10,
+            padx=5,
+            pady=5
+        )
+        log_text.pack(fill='both', expand=True)
+        
+        scrollbar = ttk.Scrollbar(log_frame, orient='vertical', command=log_text.yview)
+        scrollbar.pack(side='right', fill='y')
+        log_text.configure(yscrollcommand=scrollbar.set)
+        
+        # 填充更新日志
+        changelog = version_info.get('changelog', [])
+        if changelog:
+            for item in changelog:
+                log_text.insert('end', f"• {item}\n")
+        else:
+            log_text.insert('end', "暂无更新说明")
+        log_text.configure(state='disabled')
+        
+        # 进度条（初始隐藏）
+        self.progress_frame = ttk.Frame(self.dialog)
+        self.progress_var = tk.DoubleVar(value=0)
+        self.progress_bar = ttk.Progressbar(
+            self.progress_frame,
+            variable=self.progress_var,
+            maximum=100,
+            length=400,
+            mode='determinate'
+        )
+        self.progress_bar.pack(pady=5)
+        self.progress_label = ttk.Label(self.progress_frame, text="准备下载...")
+        self.progress_label.pack()
+        
+        # 按钮
+        self.button_frame = ttk.Frame(self.dialog, padding="20")
+        self.button_frame.pack(fill='x')
+        
+        self.update_btn = ttk.Button(
+            self.button_frame,
+            text="立即更新",
+            command=self._start_update
+        )
+        self.update_btn.pack(side='left', padx=(0, 10))
+        
+        self.later_btn = ttk.Button(
+            self.button_frame,
+            text="稍后提醒",
+            command=self._remind_later
+        )
+        self.later_btn.pack(side='left', padx=(0, 10))
+        
+        if not version_info.get('force_update', False):
+            self.skip_btn = ttk.Button(
+                self.button_frame,
+                text="跳过此版本",
+                command=self._skip_version
+            )
+            self.skip_btn.pack(side='right')
+        
+    def _start_update(self):
+        """开始更新"""
+        self.update_btn.configure(state='disabled')
+        self.later_btn.configure(state='disabled')
+        if hasattr(self, 'skip_btn'):
+            self.skip_btn.configure(state='disabled')
+        
+        self.button_frame.pack_forget()
+        self.progress_frame.pack(fill='x', padx=20, pady=10)
+        
+        # 在后台线程下载
+        threading.Thread(target=self._download_and_install, daemon=True).start()
+    
+    @profiled('download')
+    def _download_and_install(self):
+        """下载并安装更新"""
+        try:
+            download_path = get_download_path(self.checker.latest_version)
+            
+            # 下载更新包
+            def progress_callback(current, total):
+                if total > 0:
+                    percent = (current / total) * 100
+                    self.progress_var.set(percent)
+                    self.progress_label.configure(
+                        text=f"下载中... {current//1024//1024}MB / {total//1024//1024}MB ({percent:.1f}%)"
+                    )
+                self.dialog.update_idletasks()
+            
+            success, error = self.checker.download_update(download_path, progress_callback)
+            
+            if not success:
+                self.dialog.after(0, lambda: self._show_error(f"下载失败: {error}"))
+                return
+            
+            self.progress_label.configure(text="下载完成，准备安装...")
+            
+            record_update_started(CURRENT_VERSION, self.checker.latest_version, download_path)
+            
+            # 启动更新助手
+            self._launch_updater(download_path)
+            
+            self.result = 'update'
+            self.dialog.after(0, self.dialog.destroy)
+            
+        except Exception as e:
+            self.dialog.after(0, lambda: self._show_error(str(e)))
+    
+    def _launch_updater(self, update_package_path):
+        """启动更新助手程序"""
+        try:
+            if launch_updater(update_package_path) is None:
+                # 最后手段：直接解压并提示用户手动重启
+                self._extract_and_notify(update_package_path, get_install_dir())
+        except Exception as e:
+            print(f"启动更新助手失败: {e}")
+    
+    def _extract_and_notify(self, zip_path, target_dir):
+        """解压并通知用户手动重启"""
+        import zipfile
+        try:
+            with zipfile.ZipFile(zip_path, 'r') as zip_ref:
+                zip_ref.extractall(target_dir)
+            messagebox.showinfo(
+                "更新完成",
+                "更新文件已下载并解压完成。\n请手动重启程序以应用更新。",
+                parent=self.dialog
+            )
+        except Exception as e:
+            messagebox.showerror(
+                "更新失败",
+                f"解压更新文件失败: {e}\n请手动下载更新。",
+                parent=self.dialog
+            )
+    
+    def _show_error(self, message):
+        """显示错误信息"""
+        messagebox.showerror("更新失败", message, parent=self.dialog)
+        self.result = 'error'
+        self.dialog.destroy()
+    
+    def _remind_later(self):
+        """稍后提醒"""
+        self.result = 'later'
+        self.dialog.destroy()
+    
+    def _skip_version(self):
+        """跳过此版本"""
+        # 保存跳过的版本号到配置文件
+        save_skip_version(self.checker.latest_version)
+        self.result = 'skip'
+        self.dialog.destroy()
+    
+    def show(self):
+        """显示对话框并等待结果"""
+        self.dialog.wait_window()
+        return self.result
@@ -0,0 +1,222 @@
+# -*- coding: utf-8 -*-
+"""
+更新流程性能分析 - Y2订单处理辅助工具
+用户反馈更新很慢时，开启后重现一次即可得到分析数据。以下任一方式开启：
+- 环境变量 Y2_UPDATE_PROFILE=1（会传递给更新助手进程）
+- 命令行参数 --profile（python -m update_module --profile ...、updater.py ... --profile）
+
+开启后被 @profiled 装饰的函数（UpdateChecker.check_update、UpdateDialog._download_and_install、
+updater.main、命令行入口）在 cProfile 和 tracemalloc 下运行，同时采样进程 RSS 峰值。
+结果写入系统临时目录（与 Y2_updater.log 相同），文件名前缀 Y2_profile_<名称>_<时间>_<pid>：
+
+    .prof            cProfile 结果（pstats 格式，可用 snakeviz、flameprof、gprof2dot 打开）
+    .alloc.folded    内存分配调用栈（折叠格式，可直接交给 flamegraph.pl / speedscope）
+    .tracemalloc     tracemalloc 快照（tracemalloc.Snapshot.load 读取）
+    .json            汇总：耗时、RSS 峰值、tracemalloc 峰值
+
+是否开启在每次调用被装饰的函数时判断（导入后再设置环境变量或传入 --profile 同样生效），
+关闭时只多一次环境变量和命令行参数的查找。
+"""
+
+import os
+import sys
+import time
+import functools
+import threading
+
+PROFILE_ENV = 'Y2_UPDATE_PROFILE'
+PROFILE_ARG = '--profile'
+# tracemalloc 记录的调用栈深度
+TRACEMALLOC_FRAMES = 25
+# RSS 采样间隔（秒）
+RSS_SAMPLE_INTERVAL = 0.05
+# 折叠格式中保留的分配调用栈数量（按大小）
+FOLDED_STACK_LIMIT = 2000
+
+# 正在进行分析的线程（同一线程内的嵌套调用由外层会话统一记录）
+_active_threads = set()
+# 使用 tracemalloc 的会话数，最后一个会话结束时才停止 tracemalloc
+_tracemalloc_users = 0
+_lock = threading.Lock()
+
+
+def is_enabled():
+    """是否开启性能分析"""
+    return os.environ.get(PROFILE_ENV, '').strip() not in ('', '0') or PROFILE_ARG in sys.argv[1:]
+
+
+def enable():
+    """在当前进程中开启（之后调用的被装饰函数生效），并传递给子进程（更新助手）"""
+    os.environ[PROFILE_ENV] = '1'
+
+
+def _report(message):
+    """输出到标准错误（无控制台的窗口程序中 sys.stderr 为 None）"""
+    if sys.stderr is not None:
+        sys.stderr.write(message + "\n")
+
+
+def get_profile_dir():
+    """分析结果目录：与更新助手日志相同的系统临时目录"""
+    import tempfile
+
+    return tempfile.gettempdir()
+
+
+class _RssSampler:
+    """后台线程定期采样进程常驻内存，记录峰值"""
+
+    def __init__(self, interval=RSS_SAMPLE_INTERVAL):
+        self.interval = interval
+        self.peak = None
+        self.samples = 0
+        self._read = self._rss_reader()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name='profile-rss', daemon=True)
+
+    @staticmethod
+    def _rss_reader():
+        """返回读取当前 RSS（字节）的函数，没有可用方式时返回 None"""
+        try:
+            import psutil
+            process = psutil.Process()
+            return lambda: process.memory_info().rss
+        except ImportError:
+            pass
+        try:
+            import resource
+        except ImportError:
+            return None
+        # 没有 psutil 时只能取得历史峰值（Linux 单位为 KB，macOS 为字节）
+        scale = 1 if sys.platform == 'darwin' else 1024
+        return lambda: resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * scale
+
+    def _sample(self):
+        try:
+            rss = self._read()
+        except Exception:
+            return
+        self.samples += 1
+        if self.peak is None or rss > self.peak:
+            self.peak = rss
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self._sample()
+
+    def start(self):
+        if self._read is not None:
+            self._sample()
+            self._thread.start()
+
+    def stop(self):
+        if self._read is not None:
+            self._stop.set()
+            self._thread.join(timeout=1)
+            self._sample()
+
+
+def _write_folded_allocations(snapshot, path):
+    """把 tracemalloc 快照按调用栈写成折叠格式（根在前，每行 "栈;栈;栈 字节数"）"""
+    stats = snapshot.statistics('traceback')[:FOLDED_STACK_LIMIT]
+    with open(path, 'w', encoding='utf-8') as f:
+        for stat in stats:
+            frames = [
+                f"{os.path.basename(frame.filename)}:{frame.lineno}"
+                for frame in reversed(stat.traceback)
+            ]
+            f.write(f"{';'.join(frames)} {stat.size}\n")
+
+
+class ProfileSession:
+    """在 cProfile、tracemalloc 和 RSS 采样下运行一段代码，结束时写出结果"""
+
+    def __init__(self, name):
+        self.name = name
+        self.base_path = None
+        self.summary = None
+
+    def __enter__(self):
+        import cProfile
+        import tracemalloc
+
+        stamp = time.strftime('%Y%m%d_%H%M%S')
+        self.base_path = os.path.join(get_profile_dir(), f"Y2_profile_{self.name}_{stamp}_{os.getpid()}")
+
+        self._sampler = _RssSampler()
+        self._sampler.start()
+        # 多个线程中的会话共用同一个 tracemalloc
+        global _tracemalloc_users
+        with _lock:
+            if _tracemalloc_users == 0:
+                tracemalloc.start(TRACEMALLOC_FRAMES)
+            _tracemalloc_users += 1
+        self._profiler = cProfile.Profile()
+        self._start_time = time.perf_counter()
+        self._profiler.enable()
+        return self
+
+    def __exit__(self, exc_type, exc_value, exc_traceback):
+        import tracemalloc
+
+        global _tracemalloc_users
+        self._profiler.disable()
+        elapsed = time.perf_counter() - self._start_time
+        with _lock:
+            snapshot = tracemalloc.take_snapshot()
+            _, traced_peak = tracemalloc.get_traced_memory()
+            _tracemalloc_users -= 1
+            if _tracemalloc_users == 0:
+                tracemalloc.stop()
+        self._sampler.stop()
+
+        self.summary = {
+            'name': self.name,
+            'pid': os.getpid(),
+            'argv': sys.argv,
+            'seconds': elapsed,
+            'peak_rss': self._sampler.peak,
+            'rss_samples': self._sampler.samples,
+            'tracemalloc_peak': traced_peak,
+            'exception': exc_type.__name__ if exc_type else None,
+        }
+        # 写出失败不影响被分析的流程
+        try:
+            self._write_results(snapshot)
+            _report(f"性能分析结果: {self.base_path}.*")
+        except OSError as e:
+            _report(f"写入性能分析结果失败: {e}")
+        return False
+
+    def _write_results(self, snapshot):
+        import json
+
+        self._profiler.dump_stats(f"{self.base_path}.prof")
+        snapshot.dump(f"{self.base_path}.tracemalloc")
+        _write_folded_allocations(snapshot, f"{self.base_path}.alloc.folded")
+        with open(f"{self.base_path}.json", 'w', encoding='utf-8') as f:
+            json.dump(self.summary, f, ensure_ascii=False, indent=2)
+
+
+def profiled(name):
+    """
+    装饰器：开启性能分析时在 ProfileSession 中运行被装饰的函数
+    是否开启在每次调用时判断，关闭时直接调用原函数
+    """
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if not is_enabled():
+                return func(*args, **kwargs)
+            thread_id = threading.get_ident()
+            if thread_id in _active_threads:
+                # 外层会话已在记录本线程（cProfile 不能在同一线程中嵌套启用）
+                return func(*args, **kwargs)
+            _active_threads.add(thread_id)
+            try:
+                with ProfileSession(name):
+                    return func(*args, **kwargs)
+            finally:
+                _active_threads.discard(thread_id)
+        return wrapper
+    return decorator
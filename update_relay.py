@@ -0,0 +1,463 @@
+# -*- coding: utf-8 -*-
+"""
+局域网更新中继 - Y2订单处理辅助工具
+在局域网内的一台机器上运行，为同一站点的所有客户端缓存更新包：
+1. 从上游获取 version.json（短时间缓存），登记其中的更新包和组件包
+2. 首次请求某个文件时在后台从上游下载，校验哈希后缓存到磁盘，之后直接从磁盘提供；
+   下载完成前对请求回复 503 和 Retry-After，客户端稍后重试而不是各自去外网下载
+3. 支持 HTTP Range 请求和多客户端并发下载
+4. 可选响应 UDP 广播，客户端开启自动发现时无需配置地址
+
+中继只是字节来源：客户端始终从 HTTPS 更新源获取 version.json，
+从中继下载的文件按更新源中的哈希校验，校验失败时改从原始地址下载。
+
+用法:
+    python update_relay.py [--port 8765] [--cache-dir DIR] [--upstream URL ...]
+
+客户端通过环境变量 Y2_UPDATE_RELAY（如 http://192.168.1.10:8765/）指定中继，
+设为 auto 时通过 UDP 广播自动发现。
+"""
+
+import os
+import json
+import time
+import socket
+import argparse
+import threading
+from urllib.parse import urlparse, unquote, quote
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+import hash_utils
+import download_writer
+from update_core import VERSION_CHECK_URL, BACKUP_CHECK_URL, CONFIG_DIR
+
+DEFAULT_PORT = 8765
+DEFAULT_CACHE_DIR = os.path.join(CONFIG_DIR, 'relay_cache')
+# version.json 缓存时间（秒）
+VERSION_TTL = 300
+# 自动发现
+DISCOVERY_PORT = 38517
+DISCOVERY_REQUEST = b'Y2_RELAY_DISCOVER'
+# 读取缓存文件的块大小
+SEND_CHUNK_SIZE = 1024 * 1024
+# 文件尚未缓存时建议客户端的重试间隔（秒）
+RETRY_AFTER = 5
+# 上游下载失败后，在此时间（秒）内直接向客户端报告失败，之后再重新尝试
+FAILURE_TTL = 60
+# 请求未登记的文件时，距上次获取版本信息超过此时间（秒）则重新获取
+REFRESH_INTERVAL = 30
+
+
+def log(message):
+    """打印日志"""
+    print(f"[{time.strftime('%Y-%m-%d %H:%M:%S')}] {message}", flush=True)
+
+
+class RelayBusy(Exception):
+    """文件正在从上游下载，客户端应在 retry_after 秒后重试"""
+
+    def __init__(self, retry_after=RETRY_AFTER):
+        super().__init__(f"文件正在缓存，{retry_after} 秒后重试")
+        self.retry_after = retry_after
+
+
+def artifact_name(upstream_url):
+    """上游文件在中继上的名称（取地址中的文件名）"""
+    return os.path.basename(unquote(urlparse(upstream_url).path)) or 'package.zip'
+
+
+def relay_file_url(relay_url, upstream_url):
+    """上游文件经中继下载时的地址"""
+    return f"{relay_url.rstrip('/')}/files/{quote(artifact_name(upstream_url))}"
+
+
+def _iter_artifacts(version_info):
+    """
+    遍历版本信息中的所有下载项
+    返回: [(记录, 地址字段, 原始地址字段, 哈希字段, 大小字段)]
+    """
+    items = []
+    if version_info.get('download_url'):
+        items.append((version_info, 'download_url', 'origin_download_url', 'hash', 'file_size'))
+    for release in version_info.get('releases', []):
+        for artifact in release.get('artifacts', []):
+            if artifact.get('url'):
+                items.append((artifact, 'url', 'origin_url', 'hash', 'size'))
+        # 可选组件包
+        for component in (release.get('components') or {}).values():
+            if component.get('url'):
+                items.append((component, 'url', 'origin_url', 'hash', 'size'))
+    return items
+
+
+class RelayCache:
+    """上游版本信息和更新包的磁盘缓存"""
+
+    def __init__(self, cache_dir, upstream_urls):
+        self.cache_dir = cache_dir
+        self.upstream_urls = list(upstream_urls)
+        self.files = {}
+        self._version_info = None
+        self._version_time = 0
+        self._lock = threading.Lock()
+        self._verified = set()
+        # 正在后台下载（或校验）的文件
+        self._jobs = {}
+        # 上游下载失败的文件: {名称: (时间, 错误)}
+        self._failures = {}
+        os.makedirs(cache_dir, exist_ok=True)
+
+    def _refresh(self, max_age=VERSION_TTL):
+        """版本信息超过 max_age 秒时重新获取，并登记其中的所有文件"""
+        with self._lock:
+            if self._version_info is not None and time.time() - self._version_time <= max_age:
+                return self._version_info
+        version_info = self._fetch_version_info()
+        with self._lock:
+            self._version_info = version_info
+            self._version_time = time.time()
+            for record, url_key, _, hash_key, size_key in _iter_artifacts(version_info):
+                self._register(record[url_key], record.get(hash_key), record.get(size_key))
+        return version_info
+
+    def get_version_info(self, base_url):
+        """
+        返回改写了下载地址的 version.json（供查看中继状态，客户端不使用）
+        base_url: 客户端访问本中继使用的地址（如 http://192.168.1.10:8765/）
+        """
+        version_info = json.loads(json.dumps(self._refresh()))
+        for record, url_key, origin_key, _, _ in _iter_artifacts(version_info):
+            record[origin_key] = record[url_key]
+            record[url_key] = relay_file_url(base_url, record[url_key])
+        return version_info
+
+    def _fetch_version_info(self):
+        """依次尝试各个上游源"""
+        import requests
+
+        errors = []
+        for url in self.upstream_urls:
+            try:
+                response = requests.get(url, timeout=10)
+                response.raise_for_status()
+                log(f"已获取版本信息: {url}")
+                return response.json()
+            except Exception as e:
+                errors.append(f"{url}: {e}")
+        raise RuntimeError("所有上游源均不可用: " + "; ".join(errors))
+
+    def _register(self, upstream_url, expected_hash, size):
+        """登记一个上游文件（调用方持有 self._lock）"""
+        name = artifact_name(upstream_url)
+        if self.files.get(name, {}).get('hash') != (expected_hash or ''):
+            self._verified.discard(name)
+        self.files[name] = {
+            'url': upstream_url,
+            'hash': expected_hash or '',
+            'size': int(size or 0),
+        }
+
+    def get_file(self, name):
+        """
+        返回缓存文件路径；未登记且没有缓存时返回 None
+        文件未缓存时在后台线程中从上游下载（同一文件只下载一次）并抛出 RelayBusy，
+        最近一次上游下载失败时抛出 RuntimeError
+        """
+        with self._lock:
+            entry = self.files.get(name)
+        if entry is None:
+            # 客户端请求的文件可能来自更新的版本信息
+            try:
+                self._refresh(max_age=REFRESH_INTERVAL)
+            except Exception as e:
+                log(f"获取版本信息失败: {e}")
+            with self._lock:
+                entry = self.files.get(name)
+
+        cache_path = os.path.join(self.cache_dir, name)
+        if entry is None:
+            # 上游版本信息中没有的文件：提供之前缓存的文件，由客户端按哈希校验
+            return cache_path if os.path.exists(cache_path) else None
+
+        with self._lock:
+            if name in self._verified and os.path.exists(cache_path):
+                return cache_path
+            failure = self._failures.get(name)
+            if failure and time.time() - failure[0] < FAILURE_TTL:
+                raise RuntimeError(failure[1])
+            if name not in self._jobs:
+                self._failures.pop(name, None)
+                self._jobs[name] = threading.Thread(
+                    target=self._prepare, args=(name, entry, cache_path),
+                    name=f'relay-{name}', daemon=True
+                )
+                self._jobs[name].start()
+        raise RelayBusy()
+
+    def _prepare(self, name, entry, cache_path):
+        """后台线程：校验已有缓存，缺失或不一致时从上游下载"""
+        try:
+            if os.path.exists(cache_path):
+                # 之前运行时缓存的文件，按当前版本信息校验一次
+                if hash_utils.parse_hash(entry['hash'])[1] and \
+                        not hash_utils.hash_matches(entry['hash'], cache_path):
+                    log(f"缓存文件与版本信息不一致，重新下载: {name}")
+                    os.remove(cache_path)
+            if not os.path.exists(cache_path):
+                self._download(entry, cache_path)
+            with self._lock:
+                if self.files.get(name, {}).get('hash') == entry['hash']:
+                    self._verified.add(name)
+        except Exception as e:
+            log(f"缓存失败 {name}: {e}")
+            with self._lock:
+                self._failures[name] = (time.time(), f"上游下载失败: {e}")
+        finally:
+            with self._lock:
+                self._jobs.pop(name, None)
+
+    def _download(self, entry, cache_path):
+        """从上游下载到临时文件，哈希校验通过后再放入缓存"""
+        import requests
+
+        temp_path = f"{cache_path}.part"
+        log(f"从上游下载: {entry['url']}")
+        start_time = time.perf_counter()
+        algorithm, expected_digest = hash_utils.parse_hash(entry['hash'])
+        try:
+            with requests.get(entry['url'], stream=True, timeout=30) as response:
+                response.raise_for_status()
+                _, digest = download_writer.write_response(
+                    response, temp_path, entry['size'],
+                    algorithm=algorithm if expected_digest else None
+                )
+
+            if expected_digest and digest != expected_digest:
+                raise RuntimeError("文件校验失败")
+
+            os.replace(temp_path, cache_path)
+            log(f"已缓存: {cache_path} ({os.path.getsize(cache_path) / 1024 / 1024:.2f} MB, "
+                f"{time.perf_counter() - start_time:.1f} 秒)")
+        finally:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+
+
+def parse_range(header, file_size):
+    """
+    解析单个 Range 请求头
+    返回: (start, end)（含 end），无效时返回 None
+    """
+    if not header or not header.startswith('bytes=') or ',' in header:
+        return None
+    start_text, _, end_text = header[len('bytes='):].strip().partition('-')
+    try:
+        if start_text == '':
+            # bytes=-N：最后 N 个字节
+            length = int(end_text)
+            if length <= 0:
+                return None
+            return max(0, file_size - length), file_size - 1
+        start = int(start_text)
+        end = int(end_text) if end_text else file_size - 1
+    except ValueError:
+        return None
+    if start >= file_size or end < start:
+        return None
+    return start, min(end, file_size - 1)
+
+
+class RelayHandler(BaseHTTPRequestHandler):
+    """中继 HTTP 请求处理"""
+
+    server_version = 'Y2Relay/1.0'
+    cache = None
+
+    def do_GET(self):
+        self._handle(send_body=True)
+
+    def do_HEAD(self):
+        self._handle(send_body=False)
+
+    def _base_url(self):
+        host = self.headers.get('Host') or f"{self.server.server_address[0]}:{self.server.server_address[1]}"
+        return f"http://{host}/"
+
+    def _handle(self, send_body):
+        path = unquote(urlparse(self.path).path)
+        try:
+            if path in ('/', '/version.json'):
+                self._send_json(self.cache.get_version_info(self._base_url()), send_body)
+            elif path.startswith('/files/'):
+                self._send_file(path[len('/files/'):], send_body)
+            else:
+                self.send_error(404)
+        except RelayBusy as e:
+            self.send_response(503)
+            self.send_header('Retry-After', str(e.retry_after))
+            self.send_header('Content-Length', '0')
+            self.end_headers()
+        except Exception as e:
+            log(f"请求失败 {self.path}: {e}")
+            try:
+                # 状态行只能使用 latin-1，中文说明放在响应正文中
+                self.send_error(502, explain=str(e))
+            except OSError:
+                pass
+
+    def _send_json(self, data, send_body):
+        body = json.dumps(data, ensure_ascii=False).encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        self.send_header('Cache-Control', 'no-cache')
+        self.end_headers()
+        if send_body:
+            self.wfile.write(body)
+
+    def _send_file(self, name, send_body):
+        if '/' in name or '\\' in name or name.startswith('.'):
+            self.send_error(400)
+            return
+
+        file_path = self.cache.get_file(name)
+        if file_path is None:
+            self.send_error(404, explain="上游版本信息中没有此文件")
+            return
+
+        file_size = os.path.getsize(file_path)
+        range_header = self.headers.get('Range')
+        byte_range = parse_range(range_header, file_size)
+        if range_header and byte_range is None:
+            self.send_response(416)
+            self.send_header('Content-Range', f"bytes */{file_size}")
+            self.end_headers()
+            return
+
+        start, end = byte_range or (0, file_size - 1)
+        length = end - start + 1 if file_size else 0
+        self.send_response(206 if byte_range else 200)
+        self.send_header('Content-Type', 'application/octet-stream')
+        self.send_header('Content-Length', str(length))
+        self.send_header('Accept-Ranges', 'bytes')
+        if byte_range:
+            self.send_header('Content-Range', f"bytes {start}-{end}/{file_size}")
+        self.end_headers()
+
+        if not send_body:
+            return
+        with open(file_path, 'rb') as f:
+            f.seek(start)
+            remaining = length
+            while remaining > 0:
+                chunk = f.read(min(SEND_CHUNK_SIZE, remaining))
+                if not chunk:
+                    break
+                self.wfile.write(chunk)
+                remaining -= len(chunk)
+
+    def log_message(self, format, *args):
+        log(f"{self.client_address[0]} {format % args}")
+
+
+def serve_discovery(http_port, stop_event, port=DISCOVERY_PORT, http_host=None):
+    """
+    响应客户端的 UDP 广播，回复本中继的地址
+    http_host: HTTP 服务绑定的地址；绑定到所有地址时按请求方所在网段选择本机地址
+    """
+    sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind(('', port))
+    sock.settimeout(0.5)
+    log(f"自动发现已启动: UDP {port}")
+
+    while not stop_event.is_set():
+        try:
+            data, address = sock.recvfrom(1024)
+        except socket.timeout:
+            continue
+        except OSError:
+            break
+        if data.strip() != DISCOVERY_REQUEST:
+            continue
+
+        if http_host and http_host not in ('0.0.0.0', ''):
+            local_ip = http_host
+        else:
+            # 取得能到达请求方的本机地址
+            probe = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+            try:
+                probe.connect(address)
+                local_ip = probe.getsockname()[0]
+            finally:
+                probe.close()
+        reply = json.dumps({'url': f"http://{local_ip}:{http_port}/"}).encode('utf-8')
+        sock.sendto(reply, address)
+    sock.close()
+
+
+def discover_relay(timeout=0.3, port=DISCOVERY_PORT):
+    """
+    通过 UDP 广播查找局域网内的中继（客户端使用）
+    返回: 中继地址，找不到时返回 None
+    """
+    sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    try:
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_BROADCAST, 1)
+        sock.settimeout(timeout)
+        for target in ('<broadcast>', '127.0.0.1'):
+            try:
+                sock.sendto(DISCOVERY_REQUEST, (target, port))
+            except OSError:
+                continue
+        data, _ = sock.recvfrom(1024)
+        return json.loads(data.decode('utf-8')).get('url')
+    except (OSError, ValueError):
+        return None
+    finally:
+        sock.close()
+
+
+def create_server(host='0.0.0.0', port=DEFAULT_PORT, cache_dir=DEFAULT_CACHE_DIR, upstream_urls=None):
+    """创建中继服务器（port 为 0 时自动分配端口，便于本机测试）"""
+    handler = type('BoundRelayHandler', (RelayHandler,), {
+        'cache': RelayCache(cache_dir, upstream_urls or [VERSION_CHECK_URL, BACKUP_CHECK_URL]),
+    })
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Y2订单处理辅助工具 - 局域网更新中继")
+    parser.add_argument('--host', default='0.0.0.0', help="监听地址")
+    parser.add_argument('--port', type=int, default=DEFAULT_PORT, help="HTTP 端口")
+    parser.add_argument('--cache-dir', default=DEFAULT_CACHE_DIR, help="缓存目录")
+    parser.add_argument('--upstream', action='append', default=None,
+                        help="上游 version.json 地址，可重复指定（默认使用内置更新源）")
+    parser.add_argument('--no-discovery', action='store_true', help="不响应 UDP 广播")
+    args = parser.parse_args()
+
+    server = create_server(args.host, args.port, args.cache_dir, args.upstream)
+    port = server.server_address[1]
+    log(f"更新中继已启动: http://{args.host}:{port}/ 缓存目录: {args.cache_dir}")
+
+    stop_event = threading.Event()
+    if not args.no_discovery:
+        threading.Thread(
+            target=serve_discovery,
+            args=(port, stop_event, DISCOVERY_PORT, args.host),
+            daemon=True
+        ).start()
+
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        log("正在停止...")
+    finally:
+        stop_event.set()
+        server.server_close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,156 @@
+# -*- coding: utf-8 -*-
+"""
+分批发布与检查时间错峰 - Y2订单处理辅助工具
+1. 每个安装实例有一个固定的安装 ID，由它派生出稳定的分桶值（0~100）
+2. version.json 的 rollout 字段控制发布比例和开始时间，只有分桶值落在比例内的实例才会收到更新
+3. 启动后的自动检查每次启动随机延迟，无人值守下载按安装 ID 错开时间，避免所有客户端同时请求
+
+rollout 字段格式（可写在顶层，也可写在 releases 中对应版本的记录里）：
+
+    "rollout": {
+        "percentage": 20,                        # 发布比例（0~100）
+        "start": "2026-10-20T08:00:00+08:00",    # 开始时间，之前不向任何实例发布
+        "ramp_hours": 24,                        # 可选：从开始时间起在此时长内从 0 线性增加到 percentage
+        "download_spread_seconds": 1800          # 可选：无人值守下载的错峰时间窗口
+    }
+"""
+
+import os
+import math
+import time
+import random
+import hashlib
+
+# 启动后自动检查的基础延迟和随机错峰窗口（秒）
+CHECK_BASE_DELAY = 3
+CHECK_SPREAD = 600
+# 无人值守下载的默认错峰窗口（秒）
+DOWNLOAD_SPREAD = 900
+# 错峰时间中随机部分所占比例（其余部分由安装 ID 固定）
+RANDOM_JITTER_RATIO = 0.1
+
+
+def get_install_id():
+    """
+    返回本机固定的安装 ID（首次调用时生成并保存到状态存储）
+    状态存储不可用时由机器标识和用户目录派生，保证同一机器上稳定不变
+    """
+    import uuid
+    import sqlite3
+
+    try:
+        import update_state
+        return update_state.get_store().get_or_create_meta('install_id', lambda: uuid.uuid4().hex)
+    except (OSError, sqlite3.Error):
+        seed = f"{uuid.getnode()}:{os.path.expanduser('~')}"
+        return hashlib.sha256(seed.encode('utf-8')).hexdigest()[:32]
+
+
+def get_bucket(install_id, salt=''):
+    """由安装 ID 派生的稳定分桶值，范围 [0, 100)"""
+    digest = hashlib.sha256(f"{salt}:{install_id}".encode('utf-8')).digest()
+    return int.from_bytes(digest[:8], 'big') / 2 ** 64 * 100
+
+
+def parse_time(value):
+    """解析 ISO 8601 时间或时间戳，返回 Unix 时间戳；格式无效时抛出 ValueError"""
+    from datetime import datetime
+
+    if value in (None, ''):
+        return None
+    if isinstance(value, (int, float)):
+        return float(value)
+    # 不带时区的时间按本地时间处理
+    return datetime.fromisoformat(str(value).replace('Z', '+00:00')).timestamp()
+
+
+def get_rollout(version_info, version=None):
+    """取得指定版本（默认最新版本）的 rollout 配置，没有配置时返回 None"""
+    import release_index
+
+    version = version or release_index.get_latest_version(version_info)
+    for release in release_index.get_releases(version_info):
+        if version and release_index.compare_versions(release['version'], version) == 0:
+            if release.get('rollout'):
+                return release['rollout']
+            break
+    return version_info.get('rollout')
+
+
+def _parse_number(value):
+    """解析有限数值，无效时返回 None"""
+    try:
+        number = float(value)
+    except (TypeError, ValueError):
+        return None
+    return number if math.isfinite(number) else None
+
+
+def get_rollout_percentage(rollout, now=None):
+    """
+    当前时刻生效的发布比例
+    配置有误时按更保守的方式处理，不会因此扩大发布范围：
+    比例无效时不发布，开始时间或爬升时长无效时忽略该项，直接使用配置的比例
+    """
+    if not rollout:
+        return 100.0
+
+    now = time.time() if now is None else now
+    percentage = _parse_number(rollout.get('percentage', 100))
+    if percentage is None:
+        return 0.0
+    percentage = max(0.0, min(100.0, percentage))
+
+    try:
+        start = parse_time(rollout.get('start'))
+    except (TypeError, ValueError, OverflowError, OSError):
+        start = None
+    if start is None:
+        return percentage
+    if now < start:
+        return 0.0
+
+    ramp_hours = _parse_number(rollout.get('ramp_hours') or 0)
+    if ramp_hours and ramp_hours > 0:
+        progress = min(1.0, (now - start) / (ramp_hours * 3600))
+        return percentage * progress
+    return percentage
+
+
+def is_in_rollout(version_info, version=None, install_id=None, now=None):
+    """本实例是否在指定版本的发布范围内"""
+    rollout = get_rollout(version_info, version)
+    if not rollout:
+        return True
+
+    percentage = get_rollout_percentage(rollout, now)
+    if percentage >= 100:
+        return True
+
+    install_id = install_id or get_install_id()
+    salt = rollout.get('salt') or version or version_info.get('version', '')
+    return get_bucket(install_id, salt) < percentage
+
+
+def _spread_delay(spread, salt, install_id=None):
+    """在 [0, spread) 内按安装 ID 固定错开，再叠加少量随机抖动"""
+    if spread <= 0:
+        return 0.0
+    install_id = install_id or get_install_id()
+    fixed = get_bucket(install_id, salt) / 100 * spread * (1 - RANDOM_JITTER_RATIO)
+    return fixed + random.uniform(0, spread * RANDOM_JITTER_RATIO)
+
+
+def get_check_delay(base=CHECK_BASE_DELAY, spread=CHECK_SPREAD):
+    """
+    启动后自动检查更新前的等待时间（秒）
+    每次启动重新随机：固定的延迟会让延迟较长而每次使用时间较短的实例永远不检查更新
+    """
+    return base + random.uniform(0, max(spread, 0))
+
+
+def get_download_delay(version_info, install_id=None):
+    """无人值守下载前的等待时间（秒），错峰窗口可由 rollout 配置覆盖"""
+    rollout = get_rollout(version_info) or {}
+    spread = float(rollout.get('download_spread_seconds', DOWNLOAD_SPREAD))
+    return _spread_delay(spread, 'download', install_id)
@@ -0,0 +1,374 @@
+# -*- coding: utf-8 -*-
+"""
+本地更新状态存储 - Y2订单处理辅助工具
+使用 SQLite（WAL 模式）保存更新相关的全部本地状态，由 update_module 和 updater 共用：
+- meta:             缓存的版本信息等键值数据
+- skipped_versions: 用户跳过的版本
+- downloads:        进行中 / 已完成的下载
+- history:          已应用的更新记录（保留最近 HISTORY_LIMIT 条）
+- timings:          各阶段耗时记录（每个阶段保留最近 TIMINGS_PER_PHASE 条）
+
+每次写入都在独立事务中完成，多个进程同时访问时由 SQLite 负责加锁。
+插入记录时在同一事务中删除超出保留数量的旧记录，数据库不会无限增长。
+"""
+
+import os
+import json
+import time
+import sqlite3
+import threading
+
+from update_core import CONFIG_DIR
+
+DB_PATH = os.path.join(CONFIG_DIR, 'update_state.db')
+# 旧版本使用的 JSON 配置文件，首次打开数据库时迁移其中的跳过记录
+LEGACY_CONFIG_PATH = os.path.join(CONFIG_DIR, 'update_config.json')
+
+SCHEMA_VERSION = 2
+# 跳过的版本在此时间内不再提示
+SKIP_DURATION = 7 * 24 * 3600
+# 保留的更新记录数和每个阶段保留的耗时记录数
+HISTORY_LIMIT = 100
+TIMINGS_PER_PHASE = 200
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS meta (
+    key        TEXT PRIMARY KEY,
+    value      TEXT NOT NULL,
+    updated_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS skipped_versions (
+    version   TEXT PRIMARY KEY,
+    skip_time REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS downloads (
+    url           TEXT PRIMARY KEY,
+    path          TEXT NOT NULL,
+    version       TEXT,
+    total_size    INTEGER NOT NULL DEFAULT 0,
+    downloaded    INTEGER NOT NULL DEFAULT 0,
+    expected_hash TEXT,
+    status        TEXT NOT NULL,
+    updated_at    REAL NOT NULL,
+    kind          TEXT NOT NULL DEFAULT 'update'
+);
+CREATE INDEX IF NOT EXISTS idx_downloads_status ON downloads(status);
+CREATE TABLE IF NOT EXISTS history (
+    id           INTEGER PRIMARY KEY AUTOINCREMENT,
+    from_version TEXT,
+    to_version   TEXT,
+    package_path TEXT,
+    status       TEXT NOT NULL,
+    started_at   REAL NOT NULL,
+    finished_at  REAL,
+    detail       TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_history_package ON history(package_path, status);
+CREATE TABLE IF NOT EXISTS timings (
+    id          INTEGER PRIMARY KEY AUTOINCREMENT,
+    phase       TEXT NOT NULL,
+    seconds     REAL NOT NULL,
+    version     TEXT,
+    recorded_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_timings_phase ON timings(phase, recorded_at);
+"""
+
+_PRUNE_HISTORY = (
+    'DELETE FROM history WHERE id NOT IN (SELECT id FROM history ORDER BY id DESC LIMIT ?)'
+)
+_PRUNE_TIMINGS = (
+    'DELETE FROM timings WHERE phase = ? AND id NOT IN '
+    '(SELECT id FROM timings WHERE phase = ? ORDER BY id DESC LIMIT ?)'
+)
+
+# 从旧的表结构版本升级到下一版本的语句
+_MIGRATIONS = {
+    # downloads.kind：update（完整更新包）/ part（增量包链中的一环）/ component（可选组件包）
+    2: ["ALTER TABLE downloads ADD COLUMN kind TEXT NOT NULL DEFAULT 'update'"],
+}
+
+
+class UpdateStateStore:
+    """更新状态存储"""
+
+    def __init__(self, path=None):
+        # 调用时才取 DB_PATH，便于测试或中继修改模块级的默认路径
+        self.path = path or DB_PATH
+        self._lock = threading.Lock()
+        self._conn = None
+
+    def _connect(self):
+        """打开数据库连接（首次使用时创建表结构并迁移旧配置）"""
+        if self._conn is not None:
+            return self._conn
+
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        conn = sqlite3.connect(
+            self.path,
+            timeout=10,
+            isolation_level=None,
+            check_same_thread=False
+        )
+        conn.execute('PRAGMA journal_mode=WAL')
+        conn.execute('PRAGMA synchronous=NORMAL')
+        conn.execute('PRAGMA busy_timeout=10000')
+
+        if conn.execute('PRAGMA user_version').fetchone()[0] < SCHEMA_VERSION:
+            conn.execute('BEGIN IMMEDIATE')
+            try:
+                # 另一个进程可能已经完成了初始化
+                version = conn.execute('PRAGMA user_version').fetchone()[0]
+                if version == 0:
+                    for statement in _SCHEMA.split(';'):
+                        if statement.strip():
+                            conn.execute(statement)
+                    self._migrate_legacy_config(conn)
+                else:
+                    for target in range(version + 1, SCHEMA_VERSION + 1):
+                        for statement in _MIGRATIONS.get(target, []):
+                            conn.execute(statement)
+                if version < SCHEMA_VERSION:
+                    conn.execute(f'PRAGMA user_version = {SCHEMA_VERSION}')
+                conn.execute('COMMIT')
+            except BaseException:
+                conn.execute('ROLLBACK')
+                conn.close()
+                raise
+
+        self._conn = conn
+        return conn
+
+    @staticmethod
+    def _migrate_legacy_config(conn):
+        """迁移 update_config.json 中的跳过记录"""
+        try:
+            with open(LEGACY_CONFIG_PATH, 'r', encoding='utf-8') as f:
+                config = json.load(f)
+        except (OSError, ValueError):
+            return
+
+        skipped = config.get('skipped_version')
+        if skipped:
+            conn.execute(
+                'INSERT OR REPLACE INTO skipped_versions (version, skip_time) VALUES (?, ?)',
+                (skipped, float(config.get('skip_time', 0)))
+            )
+
+    def _execute(self, sql, params=(), *more):
+        """
+        在单个事务中执行写语句
+        more: 之后在同一事务中执行的 (sql, params)，如清理旧记录
+        返回: 第一条语句的游标
+        """
+        with self._lock:
+            conn = self._connect()
+            conn.execute('BEGIN IMMEDIATE')
+            try:
+                cursor = conn.execute(sql, params)
+                for extra_sql, extra_params in more:
+                    conn.execute(extra_sql, extra_params)
+                conn.execute('COMMIT')
+                return cursor
+            except BaseException:
+                conn.execute('ROLLBACK')
+                raise
+
+    def _query(self, sql, params=()):
+        """执行只读查询，返回全部结果"""
+        with self._lock:
+            return self._connect().execute(sql, params).fetchall()
+
+    def close(self):
+        """关闭数据库连接"""
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+    # ---------- 键值数据 ----------
+
+    def set_meta(self, key, value):
+        """保存键值数据（value 需可 JSON 序列化）"""
+        self._execute(
+            'INSERT OR REPLACE INTO meta (key, value, updated_at) VALUES (?, ?, ?)',
+            (key, json.dumps(value, ensure_ascii=False), time.time())
+        )
+
+    def get_meta(self, key, default=None, max_age=None):
+        """读取键值数据，max_age（秒）指定时超过该时间的数据视为不存在"""
+        rows = self._query('SELECT value, updated_at FROM meta WHERE key = ?', (key,))
+        if not rows:
+            return default
+        value, updated_at = rows[0]
+        if max_age is not None and time.time() - updated_at > max_age:
+            return default
+        return json.loads(value)
+
+    def get_or_create_meta(self, key, factory):
+        """
+        读取键值数据，不存在时用 factory() 生成并保存
+        在同一事务中完成，多个进程同时调用时得到同一个值
+        """
+        with self._lock:
+            conn = self._connect()
+            conn.execute('BEGIN IMMEDIATE')
+            try:
+                row = conn.execute('SELECT value FROM meta WHERE key = ?', (key,)).fetchone()
+                if row:
+                    value = json.loads(row[0])
+                else:
+                    value = factory()
+                    conn.execute(
+                        'INSERT INTO meta (key, value, updated_at) VALUES (?, ?, ?)',
+                        (key, json.dumps(value, ensure_ascii=False), time.time())
+                    )
+                conn.execute('COMMIT')
+                return value
+            except BaseException:
+                conn.execute('ROLLBACK')
+                raise
+
+    # ---------- 跳过的版本 ----------
+
+    def skip_version(self, version):
+        """记录用户跳过的版本"""
+        self._execute(
+            'INSERT OR REPLACE INTO skipped_versions (version, skip_time) VALUES (?, ?)',
+            (version, time.time())
+        )
+
+    def is_version_skipped(self, version):
+        """用户是否在有效期内跳过了此版本"""
+        rows = self._query(
+            'SELECT 1 FROM skipped_versions WHERE version = ? AND skip_time > ?',
+            (version, time.time() - SKIP_DURATION)
+        )
+        return bool(rows)
+
+    # ---------- 下载 ----------
+
+    def record_download(self, url, path, status, version=None, total_size=0,
+                        downloaded=0, expected_hash=None, kind='update'):
+        """记录下载状态（downloading / completed / failed），kind 见 _MIGRATIONS 中的说明"""
+        self._execute(
+            'INSERT OR REPLACE INTO downloads '
+            '(url, path, version, total_size, downloaded, expected_hash, status, updated_at, kind) '
+            'VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)',
+            (url, path, version, total_size, downloaded, expected_hash, status, time.time(), kind)
+        )
+
+    def get_download(self, url):
+        """返回下载记录 dict，不存在时返回 None"""
+        rows = self._query(
+            'SELECT url, path, version, total_size, downloaded, expected_hash, status, updated_at, kind '
+            'FROM downloads WHERE url = ?',
+            (url,)
+        )
+        if not rows:
+            return None
+        keys = ('url', 'path', 'version', 'total_size', 'downloaded',
+                'expected_hash', 'status', 'updated_at', 'kind')
+        return dict(zip(keys, rows[0]))
+
+    def get_completed_downloads(self, kind='update'):
+        """已完成的指定类型下载（从新到旧），返回 [(path, version, expected_hash)]"""
+        return self._query(
+            "SELECT path, version, expected_hash FROM downloads WHERE status = 'completed' AND kind = ? "
+            'ORDER BY updated_at DESC',
+            (kind,)
+        )
+
+    # ---------- 更新记录 ----------
+
+    def begin_update(self, from_version, to_version, package_path):
+        """记录即将由更新助手应用的更新，返回记录 ID"""
+        cursor = self._execute(
+            'INSERT INTO history (from_version, to_version, package_path, status, started_at) '
+            'VALUES (?, ?, ?, ?, ?)',
+            (from_version, to_version, package_path, 'pending', time.time()),
+            (_PRUNE_HISTORY, (HISTORY_LIMIT,))
+        )
+        return cursor.lastrowid
+
+    def finish_update(self, package_path, status, detail=None):
+        """
+        更新助手完成后记录结果（success / failed）
+        没有对应的待应用记录时新建一条
+        """
+        with self._lock:
+            conn = self._connect()
+            conn.execute('BEGIN IMMEDIATE')
+            try:
+                row = conn.execute(
+                    "SELECT id FROM history WHERE package_path = ? AND status = 'pending' "
+                    'ORDER BY id DESC LIMIT 1',
+                    (package_path,)
+                ).fetchone()
+                now = time.time()
+                if row:
+                    conn.execute(
+                        'UPDATE history SET status = ?, finished_at = ?, detail = ? WHERE id = ?',
+                        (status, now, detail, row[0])
+                    )
+                else:
+                    conn.execute(
+                        'INSERT INTO history (package_path, status, started_at, finished_at, detail) '
+                        'VALUES (?, ?, ?, ?, ?)',
+                        (package_path, status, now, now, detail)
+                    )
+                    conn.execute(_PRUNE_HISTORY, (HISTORY_LIMIT,))
+                conn.execute('COMMIT')
+            except BaseException:
+                conn.execute('ROLLBACK')
+                raise
+
+    def get_history(self, limit=20):
+        """最近的更新记录（从新到旧）"""
+        rows = self._query(
+            'SELECT id, from_version, to_version, package_path, status, started_at, finished_at, detail '
+            'FROM history ORDER BY id DESC LIMIT ?',
+            (limit,)
+        )
+        keys = ('id', 'from_version', 'to_version', 'package_path', 'status',
+                'started_at', 'finished_at', 'detail')
+        return [dict(zip(keys, row)) for row in rows]
+
+    # ---------- 耗时记录 ----------
+
+    def record_timing(self, phase, seconds, version=None):
+        """记录某个阶段的耗时"""
+        self._execute(
+            'INSERT INTO timings (phase, seconds, version, recorded_at) VALUES (?, ?, ?, ?)',
+            (phase, float(seconds), version, time.time()),
+            (_PRUNE_TIMINGS, (phase, phase, TIMINGS_PER_PHASE))
+        )
+
+    def get_timings(self, phase=None, limit=50):
+        """最近的耗时记录"""
+        if phase:
+            rows = self._query(
+                'SELECT phase, seconds, version, recorded_at FROM timings '
+                'WHERE phase = ? ORDER BY recorded_at DESC LIMIT ?',
+                (phase, limit)
+            )
+        else:
+            rows = self._query(
+                'SELECT phase, seconds, version, recorded_at FROM timings '
+                'ORDER BY recorded_at DESC LIMIT ?',
+                (limit,)
+            )
+        return [dict(zip(('phase', 'seconds', 'version', 'recorded_at'), row)) for row in rows]
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_store():
+    """进程内共享的状态存储实例"""
+    global _store
+    with _store_lock:
+        if _store is None:
+            _store = UpdateStateStore()
+        return _store
@@ -14,19 +14,128 @@ import sys
 import time
 import shutil
 import zipfile
+import json
+import atexit
+import threading
 import subprocess
 import tempfile
 from pathlib import Path
 
+from update_profiling import PROFILE_ARG, profiled
+
+# 增量包中记录删除文件列表的清单文件（与 release_index.DELTA_MANIFEST 一致）
+DELTA_MANIFEST = '__delta__.json'
+
+# 日志文件：超过 LOG_MAX_BYTES 时轮转，保留 LOG_BACKUP_COUNT 个旧文件
+LOG_PATH = os.path.join(tempfile.gettempdir(), 'Y2_updater.log')
+LOG_MAX_BYTES = 1024 * 1024
+LOG_BACKUP_COUNT = 3
+# 后台线程写入日志文件的间隔（秒）
+LOG_FLUSH_INTERVAL = 0.5
+# 设置此环境变量为 1 时逐个记录替换的文件，默认只记录汇总
+LOG_FILES_ENV = 'Y2_UPDATER_LOG_FILES'
+
+
+class BufferedLogWriter:
+    """
+    缓冲日志写入器
+    日志先写入内存，由后台线程定期追加到日志文件（每次只打开一次文件）；
+    程序退出或未捕获异常时保证写入剩余日志。
+    """
+
+    def __init__(self, path, max_bytes=LOG_MAX_BYTES, backup_count=LOG_BACKUP_COUNT,
+                 flush_interval=LOG_FLUSH_INTERVAL):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.backup_count = backup_count
+        self.flush_interval = flush_interval
+        self._buffer = []
+        self._lock = threading.Lock()
+        self._write_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def write(self, line):
+        """追加一行日志（不访问磁盘）"""
+        with self._lock:
+            self._buffer.append(line)
+            if self._thread is None and not self._stop.is_set():
+                self._thread = threading.Thread(target=self._run, name='updater-log', daemon=True)
+                self._thread.start()
+
+    def _run(self):
+        while not self._stop.wait(self.flush_interval):
+            self.flush()
+
+    def flush(self):
+        """把缓冲区中的日志写入文件"""
+        with self._write_lock:
+            with self._lock:
+                lines, self._buffer = self._buffer, []
+            if not lines:
+                return
+            try:
+                self._rotate_if_needed()
+                with open(self.path, 'a', encoding='utf-8') as f:
+                    f.write(''.join(lines))
+            except OSError:
+                pass
+
+    def _rotate_if_needed(self):
+        """日志文件超过大小限制时轮转：.log -> .log.1 -> .log.2 ..."""
+        try:
+            if os.path.getsize(self.path) < self.max_bytes:
+                return
+        except OSError:
+            return
+        for i in range(self.backup_count - 1, 0, -1):
+            older = f"{self.path}.{i}"
+            if os.path.exists(older):
+                os.replace(older, f"{self.path}.{i + 1}")
+        if self.backup_count > 0:
+            os.replace(self.path, f"{self.path}.1")
+        else:
+            os.remove(self.path)
+
+    def close(self):
+        """停止后台线程并写入剩余日志"""
+        self._stop.set()
+        thread = self._thread
+        if thread is not None and thread is not threading.current_thread():
+            thread.join(timeout=2)
+        self.flush()
+
+
+_log_writer = BufferedLogWriter(LOG_PATH)
+atexit.register(_log_writer.close)
+
+
+def _log_exception(exc_type, exc_value, exc_traceback):
+    """未捕获异常：写入日志后立即落盘"""
+    import traceback
+
+    log("未捕获的异常:\n" + ''.join(traceback.format_exception(exc_type, exc_value, exc_traceback)))
+    _log_writer.flush()
+
 
 def log(message):
     """记录日志"""
-    log_path = os.path.join(tempfile.gettempdir(), 'Y2_updater.log')
-    with open(log_path, 'a', encoding='utf-8') as f:
-        f.write(f"[{time.strftime('%Y-%m-%d %H:%M:%S')}] {message}\n")
+    _log_writer.write(f"[{time.strftime('%Y-%m-%d %H:%M:%S')}] {message}\n")
     print(message)
 
 
+def record_state(action, *args):
+    """
+    写入本地更新状态存储（更新记录、耗时）
+    action: UpdateStateStore 的方法名；存储不可用时只记录日志，不影响更新
+    """
+    try:
+        import update_state
+        getattr(update_state.get_store(), action)(*args)
+    except Exception as e:
+        log(f"写入更新状态失败: {e}")
+
+
 def wait_for_process_exit(process_path, timeout=30):
     """等待进程退出"""
     import psutil
@@ -107,10 +216,16 @@ def extract_update(zip_path, target_dir):
         with zipfile.ZipFile(zip_path, 'r') as zip_ref:
             # 获取压缩包内的根目录名
             root_dirs = set()
+            has_root_files = False
             for name in zip_ref.namelist():
                 parts = name.split('/')
                 if len(parts) > 1:
                     root_dirs.add(parts[0])
+                else:
+                    has_root_files = True
+            # 根目录下直接有文件（如 exe 与 _internal 同级），说明没有外层目录
+            if has_root_files:
+                root_dirs = set()
             
             # 解压到临时目录
             temp_extract_dir = os.path.join(tempfile.gettempdir(), 'Y2_update_extract')
@@ -129,7 +244,14 @@ def extract_update(zip_path, target_dir):
 
 
 def replace_files(source_dir, target_dir, root_dirs):
-    """替换文件"""
+    """
+    替换文件
+    默认只记录汇总（文件数、改名的占用文件、耗时），设置 Y2_UPDATER_LOG_FILES=1 时逐个记录
+    """
+    log_each_file = os.environ.get(LOG_FILES_ENV) == '1'
+    replaced = 0
+    renamed = []
+    start_time = time.perf_counter()
     try:
         log(f"开始替换文件: {source_dir} -> {target_dir}")
         
@@ -155,6 +277,10 @@ def replace_files(source_dir, target_dir, root_dirs):
                 if file.lower() in ['updater.exe', 'updater.py']:
                     continue
                 
+                # 增量包清单不复制到安装目录
+                if root == source_dir and file == DELTA_MANIFEST:
+                    continue
+                
                 # 如果目标文件存在且正在使用，重命名旧文件
                 if os.path.exists(dst_file):
                     try:
@@ -164,18 +290,59 @@ def replace_files(source_dir, target_dir, root_dirs):
                         if os.path.exists(backup_name):
                             os.remove(backup_name)
                         os.rename(dst_file, backup_name)
+                        renamed.append(dst_file)
+                        # 占用的文件始终单独记录，便于排查残留的 .old 文件
+                        log(f"文件正在使用，旧文件已改名: {backup_name}")
                 
                 shutil.copy2(src_file, dst_file)
-                log(f"已替换: {dst_file}")
+                replaced += 1
+                if log_each_file:
+                    log(f"已替换: {dst_file}")
+        
+        removed = apply_delta_removals(source_dir, target_dir, log_each_file)
         
-        log("文件替换完成")
+        log(f"文件替换完成: 替换 {replaced} 个文件，删除 {removed} 个文件，"
+            f"{len(renamed)} 个文件正在使用，耗时 {time.perf_counter() - start_time:.2f} 秒")
         return True
         
     except Exception as e:
-        log(f"替换文件失败: {e}")
+        log(f"替换文件失败（已替换 {replaced} 个文件）: {e}")
         return False
 
 
+def apply_delta_removals(source_dir, target_dir, log_each_file=True):
+    """
+    增量包：删除新版本中已移除的文件
+    返回: 删除的文件数
+    """
+    manifest_path = os.path.join(source_dir, DELTA_MANIFEST)
+    if not os.path.exists(manifest_path):
+        return 0
+    
+    with open(manifest_path, 'r', encoding='utf-8') as f:
+        manifest = json.load(f)
+    
+    log(f"增量更新: {manifest.get('from')} -> {manifest.get('to')}")
+    target_root = os.path.abspath(target_dir)
+    removed = 0
+    for name in manifest.get('removed', []):
+        dst_file = os.path.abspath(os.path.join(target_dir, name))
+        # 只允许删除安装目录内的文件
+        if os.path.commonpath([target_root, dst_file]) != target_root:
+            continue
+        if os.path.basename(dst_file).lower() in ['updater.exe', 'updater.py']:
+            continue
+        if os.path.isfile(dst_file):
+            try:
+                os.remove(dst_file)
+            except OSError:
+                os.replace(dst_file, f"{dst_file}.old")
+            removed += 1
+            if log_each_file:
+                log(f"已删除: {dst_file}")
+    return removed
+
+
 def restart_application(exe_path):
     """重启应用程序"""
     try:
@@ -229,15 +396,43 @@ def self_delete():
         log(f"自删除失败: {e}")
 
 
+@profiled('updater')
 def main():
-    """主函数"""
-    if len(sys.argv) < 3:
-        log("用法: updater.py <update_zip_path> <target_dir> [main_exe_path]")
+    """
+    主函数
+    运行期间未捕获的异常（包括后台线程中的）写入日志；只在 main 内生效，
+    导入本模块（如基准测试）不会改动进程的异常钩子
+    """
+    previous_thread_hook = threading.excepthook
+
+    def thread_excepthook(args):
+        _log_exception(args.exc_type, args.exc_value, args.exc_traceback)
+        previous_thread_hook(args)
+
+    threading.excepthook = thread_excepthook
+    try:
+        run_update()
+    except Exception:
+        _log_exception(*sys.exc_info())
+        raise
+    finally:
+        threading.excepthook = previous_thread_hook
+
+
+def run_update():
+    """执行更新：等待主程序退出、备份、解压、替换文件、重启"""
+    # --no-restart: 无人值守更新时不重启主程序
+    # --profile: 性能分析（由 update_profiling 在调用 main 时处理）
+    no_restart = '--no-restart' in sys.argv[1:]
+    args = [arg for arg in sys.argv[1:] if arg not in ('--no-restart', PROFILE_ARG)]
+    
+    if len(args) < 2:
+        log("用法: updater.py <update_zip_path> <target_dir> [main_exe_path] [--no-restart] [--profile]")
         sys.exit(1)
     
-    update_zip_path = sys.argv[1]
-    target_dir = sys.argv[2]
-    main_exe_path = sys.argv[3] if len(sys.argv) > 3 else None
+    update_zip_path = args[0]
+    target_dir = args[1]
+    main_exe_path = args[2] if len(args) > 2 else None
     
     log("=" * 50)
     log("更新助手启动")
@@ -245,6 +440,8 @@ def main():
     log(f"目标目录: {target_dir}")
     log(f"主程序: {main_exe_path}")
     
+    start_time = time.perf_counter()
+    
     # 1. 等待主程序退出
     if main_exe_path and os.path.exists(main_exe_path):
         log("等待主程序退出...")
@@ -257,23 +454,31 @@ def main():
     backup_dir = backup_old_version(target_dir)
     
     # 3. 解压更新包
+    phase_start = time.perf_counter()
     extract_dir, root_dirs = extract_update(update_zip_path, target_dir)
     if not extract_dir:
         log("解压失败，更新终止")
         if backup_dir:
             log(f"可以从备份恢复: {backup_dir}")
+        record_state('finish_update', update_zip_path, 'failed', '解压失败')
         sys.exit(1)
+    record_state('record_timing', 'extract', time.perf_counter() - phase_start)
     
     # 4. 替换文件
+    phase_start = time.perf_counter()
     if not replace_files(extract_dir, target_dir, root_dirs):
         log("文件替换失败")
+        record_state('finish_update', update_zip_path, 'failed', '文件替换失败')
         sys.exit(1)
+    record_state('record_timing', 'replace', time.perf_counter() - phase_start)
     
     # 5. 清理临时文件
     cleanup(update_zip_path, extract_dir)
     
     # 6. 重启主程序
-    if main_exe_path:
+    if no_restart:
+        log("跳过重启主程序")
+    elif main_exe_path:
         restart_application(main_exe_path)
     else:
         # 尝试找到主程序
@@ -281,6 +486,9 @@ def main():
         if os.path.exists(possible_exe):
             restart_application(possible_exe)
     
+    record_state('record_timing', 'apply', time.perf_counter() - start_time)
+    record_state('finish_update', update_zip_path, 'success')
+    
     log("更新完成")
     log("=" * 50)
     